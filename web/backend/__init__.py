@@ -11,6 +11,9 @@ def create_app(config_name='default'):
     db.init_app(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
+    # Import the event handlers first: registered before init_app, they are
+    # attached to the Socket.IO server of every app this factory creates
+    from . import socket_events
     socketio.init_app(app, async_mode='threading')
     migrate.init_app(app, db)
     mail.init_app(app)
@@ -76,6 +79,20 @@ def create_app(config_name='default'):
                 return render_template('errors/500.html', 
                                      message="System in stasis for self-repair. Access restricted."), 503
 
+    @app.before_request
+    def recover_resume_analysis_jobs():
+        # Jobs interrupted by a restart are picked up again on the first request
+        from .services.resume_analysis_service import resume_analysis_service
+        resume_analysis_service.recover()
+
+    @app.after_request
+    def flush_ai_metrics(response):
+        # Flushed from request handling so no extra thread is needed
+        from .utils import ai_metrics
+        if ai_metrics.flush_due():
+            ai_metrics.flush()
+        return response
+
     # User loader and context processors
     from .models import User, Notification
     from sqlalchemy import desc
@@ -101,9 +118,5 @@ def create_app(config_name='default'):
     def to_json_filter(value):
         return json.dumps(value)
 
-    # Register SocketIO events
-    with app.app_context():
-        from . import socket_events
-
     return app
 
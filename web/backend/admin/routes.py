@@ -1,4 +1,4 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify, make_response
+from flask import render_template, redirect, url_for, flash, request, jsonify, make_response, current_app
 from flask_login import current_user
 import io
 import csv
@@ -118,8 +118,18 @@ SRA Admin Team"""
 @admin_required
 def controls():
     settings = SystemSetting.query.all()
+    from ..utils import ai_cache, ai_concurrency, ai_metrics, ai_schemas, prompt_budget
+    from ..utils.ai_router import router
+    from ..services.resume_analysis_service import resume_analysis_service
     # Convert list to dict for easier template access if needed, or pass as list
-    return render_template('admin/controls.html', settings=settings)
+    return render_template('admin/controls.html', settings=settings,
+                           cache_stats=ai_cache.get_stats(),
+                           concurrency_stats=ai_concurrency.get_stats(),
+                           routing_stats=router.get_stats(),
+                           parsing_stats=ai_schemas.get_stats(),
+                           prompt_stats=prompt_budget.get_stats(),
+                           dedup_stats=resume_analysis_service.get_dedup_stats(),
+                           ai_call_stats=ai_metrics.get_summary())
 
 @admin.route('/api/update_setting', methods=['POST'])
 @admin_required
@@ -136,43 +146,72 @@ def update_setting():
     else:
         return jsonify({'status': 'error', 'message': 'Setting not found.'}), 404
 
+@admin.route('/api/ai_cache', methods=['GET', 'DELETE'])
+@admin_required
+def ai_cache_stats():
+    from ..utils import ai_cache
+    if request.method == 'DELETE':
+        ai_cache.clear()
+        return jsonify({'status': 'success', 'message': 'AI response cache flushed.'})
+    return jsonify(ai_cache.get_stats())
+
+@admin.route('/api/ai_concurrency')
+@admin_required
+def ai_concurrency_stats():
+    from ..utils import ai_concurrency
+    from ..utils.ai_router import router
+    stats = ai_concurrency.get_stats()
+    stats['routing'] = router.get_stats()
+    return jsonify(stats)
+
+@admin.route('/api/ai_metrics')
+@admin_required
+def ai_metrics_stats():
+    from ..utils import ai_metrics
+    hours = request.args.get('hours', 24, type=int)
+    return jsonify({
+        'features': ai_metrics.get_summary(hours=hours),
+        'recent': ai_metrics.get_recent(),
+    })
+
+@admin.route('/api/ai_parsing')
+@admin_required
+def ai_parsing_stats():
+    from ..utils import ai_schemas
+    return jsonify(ai_schemas.get_stats())
+
+@admin.route('/api/resume_dedup')
+@admin_required
+def resume_dedup_stats():
+    from ..services.resume_analysis_service import resume_analysis_service
+    days = request.args.get('days', 30, type=int)
+    return jsonify(resume_analysis_service.get_dedup_stats(days=days))
+
+@admin.route('/api/ai_prompts')
+@admin_required
+def ai_prompt_stats():
+    from ..utils import prompt_budget
+    return jsonify(prompt_budget.get_stats())
+
 @admin.route('/api/reindex_vectors', methods=['POST'])
 @admin_required
 def reindex_vectors():
     try:
-        from ..utils.vector_utils import add_job_to_vector_db, add_resume_to_vector_db
+        from ..utils.vector_utils import reindex_jobs, reindex_resumes
         
-        # Re-index Jobs
-        jobs = JobPosting.query.all()
-        for job in jobs:
-            add_job_to_vector_db(job.id, job.title, job.description)
-            
-        # Re-index Resumes (Latest for each user)
-        # Group by user to get latest
-        # Simplified: Just iterate all UserData and let Chroma update (last write wins usually, but we want latest by date)
-        # Better: get latest per user
-        latest_data = UserData.query.order_by(UserData.uploaded_at.asc()).all() 
-        # Iterate all, last one overwrites previous in vector db if same ID used
-        for ud in latest_data:
-            if ud.analysis_result:
-                skills = ud.analysis_result.get('actual_skills', [])
-                # Resume text extraction might be slow if we do it here. 
-                # Ideally, store extracted text in DB. 
-                # For this prototype, we'll skip text extraction and just use skills for now 
-                # OR assume we can't fully re-index text without file access. 
-                # Let's just index skills as a placeholder for the "text" field to be safe.
-                # In real app: read file from disk.
-                try:
-                    from ..utils.file_utils import extract_text_from_pdf
-                    import os
-                    path = os.path.join(current_app.config['UPLOAD_FOLDER'], ud.resume_path)
-                    if os.path.exists(path):
-                        text = extract_text_from_pdf(path)
-                        add_resume_to_vector_db(ud.user_id, text, skills)
-                except:
-                    pass
+        # Streamed from SQL and upserted in batches, one embedding pass each.
+        # Resumes: the latest upload of each user, text read from the
+        # resume_documents table instead of the PDFs
+        # Unchanged documents are skipped; ?force=1 rewrites everything
+        force = request.args.get('force') == '1'
+        jobs = reindex_jobs(force=force)
+        resumes = reindex_resumes(force=force)
         
-        return jsonify({'status': 'success', 'message': 'Vector DB re-indexed.'})
+        return jsonify({'status': 'success',
+                        'message': f"Vector DB re-indexed: {jobs['count']} jobs ({jobs['per_second']}/s), "
+                                   f"{resumes['count']} resumes ({resumes['per_second']}/s); "
+                                   f"{jobs['skipped'] + resumes['skipped']} unchanged.",
+                        'jobs': jobs, 'resumes': resumes})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -203,16 +242,15 @@ def market_intelligence():
     jobs = JobPosting.query.order_by(JobPosting.created_at.desc()).limit(50).all()
     job_text = "\n".join([f"- {j.title}: {j.description[:200]}..." for j in jobs])
     
-    # 2. Aggregate User Data (Supply)
+    # 2. Aggregate User Data (Supply), counted by canonical skill id
+    from ..utils.skill_registry import get_registry, user_skill_ids
+    registry = get_registry()
     all_users_data = UserData.query.all()
-    from collections import Counter
-    all_skills = []
-    for ud in all_users_data:
-        if ud.analysis_result:
-            all_skills.extend(ud.analysis_result.get('actual_skills', []))
-    
-    skill_counts = Counter(all_skills).most_common(50)
+    skill_counts = registry.count((user_skill_ids(ud) for ud in all_users_data), 50)
     skills_summary = ", ".join([f"{s[0]} ({s[1]} users)" for s in skill_counts])
+    demand_counts = registry.count((j.skill_ids for j in jobs), 30)
+    if demand_counts:
+        job_text += "\n\nSkills most often required: " + ", ".join(f"{s[0]} ({s[1]} jobs)" for s in demand_counts)
     
     # 3. AI Analysis
     # In a real app, cache this result as it's expensive
@@ -254,23 +292,23 @@ def dashboard():
     # --- Analytics Logic ---
     from collections import Counter
     
+    from ..utils.skill_registry import get_registry, user_skill_ids
+    
     fields = []
     levels = []
-    all_skills = []
+    all_skill_ids = []
     
     for entry in user_data:
         res = entry.analysis_result
         if res:
             fields.append(res.get('predicted_field', 'Unknown'))
             levels.append(res.get('experience_level', 'Unknown'))
-            skills = res.get('actual_skills', [])
-            if isinstance(skills, list):
-                all_skills.extend([s.lower() for s in skills])
+            all_skill_ids.append(user_skill_ids(entry))
 
     # Counter objects
     field_counts = dict(Counter(fields))
     level_counts = dict(Counter(levels))
-    skill_counts = dict(Counter(all_skills).most_common(10)) # Top 10 skills
+    skill_counts = dict(get_registry().count(all_skill_ids, 10)) # Top 10 skills
 
     # Activity Timeline
     from sqlalchemy import func
@@ -442,20 +480,27 @@ def export_data():
 def create_job():
     form = JobPostingForm()
     if form.validate_on_submit():
-        job = JobPosting(title=form.title.data, description=form.description.data, created_by=current_user.id)
+        from ..utils.skill_registry import job_skill_ids
+        job = JobPosting(title=form.title.data, description=form.description.data, created_by=current_user.id,
+                         skill_ids=job_skill_ids(form.title.data, form.description.data))
         db.session.add(job)
         db.session.commit()
+        from ..utils import keyword_index
+        keyword_index.update_job(job.id, job.title, job.description, job.requirements)
         # Add to Vector DB (non-blocking to avoid UI "stuck" if Chroma is slow/locked)
-        def _index_job(job_id, title, description):
+        def _index_job(app, job_id, title, description, filters):
             try:
                 from ..utils.vector_utils import add_job_to_vector_db
-                add_job_to_vector_db(job_id, title, description)
+                # App context so unchanged postings are recognised and skipped
+                with app.app_context():
+                    add_job_to_vector_db(job_id, title, description, filters)
             except Exception as e:
                 print(f"Background indexing failed for job {job_id}: {e}")
 
+        from ..utils.vector_utils import job_filters
         threading.Thread(
             target=_index_job,
-            args=(job.id, job.title, job.description),
+            args=(current_app._get_current_object(), job.id, job.title, job.description, job_filters(job)),
             daemon=True
         ).start()
         
@@ -469,21 +514,29 @@ def edit_job(job_id):
     form = JobPostingForm(obj=job)
     
     if form.validate_on_submit():
+        from ..utils.skill_registry import job_skill_ids
+        skill_ids = job_skill_ids(form.title.data, form.description.data, job.requirements)
         job.title = form.title.data
         job.description = form.description.data
+        job.skill_ids = skill_ids
         db.session.commit()
+        from ..utils import keyword_index
+        keyword_index.update_job(job.id, job.title, job.description, job.requirements)
         
         # Update Vector DB (non-blocking)
-        def _index_job(job_id, title, description):
+        def _index_job(app, job_id, title, description, filters):
             try:
                 from ..utils.vector_utils import add_job_to_vector_db
-                add_job_to_vector_db(job_id, title, description)
+                # App context so unchanged postings are recognised and skipped
+                with app.app_context():
+                    add_job_to_vector_db(job_id, title, description, filters)
             except Exception as e:
                 print(f"Background indexing failed for job {job_id}: {e}")
 
+        from ..utils.vector_utils import job_filters
         threading.Thread(
             target=_index_job,
-            args=(job.id, job.title, job.description),
+            args=(current_app._get_current_object(), job.id, job.title, job.description, job_filters(job)),
             daemon=True
         ).start()
         
@@ -515,6 +568,10 @@ def delete_job(job_id):
     # SQLAlchemy cascade might handle this if configured, else manual delete
     db.session.delete(job)
     db.session.commit()
+    from ..utils.vector_utils import remove_job_from_vector_db
+    from ..utils import keyword_index
+    remove_job_from_vector_db(job_id)
+    keyword_index.remove_job(job_id)
     flash('Job posting deleted.', 'success')
     return redirect(url_for('admin.interview_funnel'))
 
@@ -40,11 +40,91 @@ class UserData(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     resume_path = db.Column(db.String(255))
     analysis_result = db.Column(db.JSON)
+    resume_digest = db.Column(db.JSON)  # see utils/resume_digest.py
+    document_sha256 = db.Column(db.String(64), index=True)  # ResumeDocument.sha256 of the uploaded file
+    analysis_key = db.Column(db.String(64), index=True)  # (file, job description, prompt version) hash
+    reused_from_id = db.Column(db.Integer)  # UserData whose analysis was reused for an identical upload
+    skill_ids = db.Column(db.JSON)  # Skill ids of analysis_result['actual_skills'] (see utils/skill_registry.py)
+    embedding = db.Column(db.LargeBinary)  # float32 resume embedding (see utils/recommendations.py)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship('User', backref=db.backref(
         'user_data', lazy=True, cascade='all, delete-orphan'))
 
 
+class Skill(db.Model):
+    """Canonical skill; aggregations and matching work on its id (see utils/skill_registry.py)."""
+    __tablename__ = 'skills'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SkillAlias(db.Model):
+    """Normalized spelling (lowercase, single spaces) of a skill, including its own name."""
+    __tablename__ = 'skill_aliases'
+    id = db.Column(db.Integer, primary_key=True)
+    alias = db.Column(db.String(100), unique=True, index=True, nullable=False)
+    skill_id = db.Column(db.Integer, db.ForeignKey('skills.id'), nullable=False)
+
+
+class VectorIndexEntry(db.Model):
+    """Content hash of a document as last written to the vector index (see utils/vector_utils.py)."""
+    __tablename__ = 'vector_index_entries'
+    __table_args__ = (db.UniqueConstraint('collection', 'doc_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    collection = db.Column(db.String(50), nullable=False)
+    doc_id = db.Column(db.String(64), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    indexed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class JobRecommendation(db.Model):
+    """One of a user's top recommended jobs, by resume/job embedding similarity (see utils/recommendations.py)."""
+    __tablename__ = 'job_recommendations'
+    __table_args__ = (db.UniqueConstraint('user_id', 'job_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True, nullable=False)
+    job_id = db.Column(db.Integer, db.ForeignKey('job_postings.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user = db.relationship('User', backref=db.backref(
+        'job_recommendations', lazy=True, cascade='all, delete-orphan'))
+    job = db.relationship('JobPosting', backref=db.backref(
+        'recommendations', lazy=True, cascade='all, delete-orphan'))
+
+
+class ResumeDocument(db.Model):
+    """Text extracted from an uploaded resume, keyed by the file's SHA-256 (see utils/resume_store.py)."""
+    __tablename__ = 'resume_documents'
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, index=True, nullable=False)
+    text = db.Column(db.Text)
+    page_count = db.Column(db.Integer, default=0)
+    layout = db.Column(db.JSON)  # per-page stats from file_utils.parse_pdf
+    parser_version = db.Column(db.Integer, default=0)
+    extracted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ResumeAnalysisJob(db.Model):
+    """A resume upload being analyzed in the background (see services/resume_analysis_service.py)."""
+    __tablename__ = 'resume_analysis_jobs'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, handed to the client
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    resume_path = db.Column(db.String(255))
+    document_sha256 = db.Column(db.String(64))  # hashed while the upload was saved
+    job_description = db.Column(db.Text)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, done, failed
+    stage = db.Column(db.String(20), default='extract')  # next stage to run
+    attempts = db.Column(db.Integer, default=0)
+    owner = db.Column(db.String(64))  # worker process holding the job's lease
+    heartbeat = db.Column(db.DateTime)  # renewed by the owner after every stage
+    user_data_id = db.Column(db.Integer, db.ForeignKey('user_data.id'))
+    message = db.Column(db.String(255))
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class JobPosting(db.Model):
     __tablename__ = 'job_postings'
     id = db.Column(db.Integer, primary_key=True)
@@ -54,6 +134,7 @@ class JobPosting(db.Model):
     salary_range = db.Column(db.String(100))
     requirements = db.Column(db.Text)
     description = db.Column(db.Text)
+    skill_ids = db.Column(db.JSON)  # Skill ids mentioned in title, requirements and description
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=True)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -157,6 +238,30 @@ class SystemMetric(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class AICallStat(db.Model):
+    """Aggregated AI call metrics for one flush window (see utils/ai_metrics.py)."""
+    __tablename__ = 'ai_call_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    feature = db.Column(db.String(100), index=True)  # e.g. 'analyze_resume'
+    provider = db.Column(db.String(50))
+    model = db.Column(db.String(100))
+    calls = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Integer, default=0)
+    cache_hits = db.Column(db.Integer, default=0)
+    coalesced = db.Column(db.Integer, default=0)
+    attempts = db.Column(db.Integer, default=0)
+    fallbacks = db.Column(db.Integer, default=0)
+    prompt_chars = db.Column(db.Integer, default=0)
+    response_chars = db.Column(db.Integer, default=0)
+    prompt_tokens = db.Column(db.Integer, default=0)
+    response_tokens = db.Column(db.Integer, default=0)
+    total_latency_ms = db.Column(db.Float, default=0.0)
+    max_latency_ms = db.Column(db.Float, default=0.0)
+    latency_buckets = db.Column(db.JSON)  # counts per ai_metrics.LATENCY_BUCKETS_MS bucket
+    cost_usd = db.Column(db.Float, default=0.0)
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
 class Quest(db.Model):
     __tablename__ = 'quests'
     id = db.Column(db.Integer, primary_key=True)
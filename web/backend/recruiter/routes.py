@@ -52,9 +52,11 @@ def manage_jobs():
 def create_job():
     form = JobPostingForm()
     if form.validate_on_submit():
+        from ..utils.skill_registry import job_skill_ids
         job = JobPosting(
             title=form.title.data, 
             description=form.description.data, 
+            skill_ids=job_skill_ids(form.title.data, form.description.data),
             created_by=current_user.id,
             is_ai_round_enabled=form.is_ai_round_enabled.data,
             ai_interviewer_name=form.ai_interviewer_name.data,
@@ -64,11 +66,13 @@ def create_job():
         )
         db.session.add(job)
         db.session.commit()
+        from ..utils import keyword_index
+        keyword_index.update_job(job.id, job.title, job.description, job.requirements)
         
         # Add to Vector DB
         try:
-            from ..utils.vector_utils import add_job_to_vector_db
-            add_job_to_vector_db(job.id, job.title, job.description)
+            from ..utils.vector_utils import add_job_to_vector_db, job_filters
+            add_job_to_vector_db(job.id, job.title, job.description, job_filters(job))
         except Exception as e:
             print(f"Vector DB Error: {e}")
             
@@ -87,17 +91,22 @@ def edit_job(job_id):
         
     form = JobPostingForm(obj=job)
     if form.validate_on_submit():
+        from ..utils.skill_registry import job_skill_ids
+        skill_ids = job_skill_ids(form.title.data, form.description.data, job.requirements)
         job.title = form.title.data
         job.description = form.description.data
+        job.skill_ids = skill_ids
         job.is_ai_round_enabled = form.is_ai_round_enabled.data
         job.ai_interviewer_name = form.ai_interviewer_name.data
         job.ai_interview_tone = form.ai_interview_tone.data
         db.session.commit()
+        from ..utils import keyword_index
+        keyword_index.update_job(job.id, job.title, job.description, job.requirements)
         
         # Update Vector DB
         try:
-            from ..utils.vector_utils import add_job_to_vector_db
-            add_job_to_vector_db(job.id, job.title, job.description)
+            from ..utils.vector_utils import add_job_to_vector_db, job_filters
+            add_job_to_vector_db(job.id, job.title, job.description, job_filters(job))
         except Exception as e:
             print(f"Vector DB Error: {e}")
             
@@ -115,6 +124,10 @@ def delete_job(job_id):
         
     db.session.delete(job)
     db.session.commit()
+    from ..utils.vector_utils import remove_job_from_vector_db
+    from ..utils import keyword_index
+    remove_job_from_vector_db(job_id)
+    keyword_index.remove_job(job_id)
     flash('Job posting deleted.', 'info')
     return redirect(url_for('recruiter.manage_jobs'))
 
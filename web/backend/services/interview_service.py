@@ -1,7 +1,21 @@
 from flask import current_app
 import json
 from backend.models import UserData, MockInterview, db
-from backend.utils.ai_utils import get_interview_question, generate_interview_report, _call_ai
+from backend.utils.ai_utils import (
+    get_interview_question, stream_interview_question, generate_interview_report, _call_ai
+)
+
+# Feedback shown when an answer could not be scored
+ANALYSIS_FALLBACK = {
+    "score": 0,
+    "sentiment": "error",
+    "feedback": "Could not analyze response.",
+    "improvement_tip": "AI Service unavailable",
+    "keywords_detected": [],
+    "star_adherence": 0,
+    "star_feedback": "N/A"
+}
+
 
 class InterviewService:
     def __init__(self):
@@ -33,6 +47,20 @@ class InterviewService:
             conversation_history=conversation_history
         )
 
+    def stream_next_question(self, last_answer, stage="continue", context=None,
+                             interview_type="mixed", difficulty="medium", agent="aura",
+                             round_number=1, conversation_history=None):
+        """Like get_next_question, but returns a generator of text chunks."""
+        return stream_interview_question(
+            last_answer, stage,
+            resume_context=context,
+            interview_type=interview_type,
+            difficulty=difficulty,
+            agent=agent,
+            round_number=round_number,
+            conversation_history=conversation_history
+        )
+
     def analyze_response(self, question, answer, interview_type="mixed"):
         """
         Analyzes a candidate's answer to a specific question (Real-time feedback).
@@ -62,15 +90,7 @@ class InterviewService:
         """
         result = _call_ai(prompt, response_mime_type='application/json')
         if not result:
-            return {
-                "score": 0,
-                "sentiment": "error",
-                "feedback": "Could not analyze response.",
-                "improvement_tip": "AI Service unavailable",
-                "keywords_detected": [],
-                "star_adherence": 0,
-                "star_feedback": "N/A"
-            }
+            return dict(ANALYSIS_FALLBACK)
         return result
 
     def finalize_interview(self, user, transcript_list, interview_type="mixed", difficulty="medium"):
@@ -0,0 +1,296 @@
+import os
+import copy
+import uuid
+import socket
+import hashlib
+from datetime import datetime, timedelta
+
+from flask import current_app, url_for
+from backend.extensions import db, socketio
+from backend.models import ResumeAnalysisJob, User, UserData
+
+# Stages run in this order. A job's stage column holds the next stage to
+# run and is committed after each one, so a job interrupted by a restart
+# picks up where it stopped instead of starting over.
+STAGES = ['extract', 'analyze', 'persist', 'index', 'gamify']
+
+# Progress (percent) reported when a stage starts
+STAGE_PROGRESS = {'extract': 5, 'analyze': 20, 'persist': 70, 'index': 80, 'gamify': 90}
+
+MAX_ATTEMPTS = 3
+
+# A job belongs to the worker that claimed it until its heartbeat is older
+# than this (seconds); only then may another worker's recover() take it
+# over. Keep it well above the slowest stage (the AI call).
+LEASE_SECONDS = int(os.environ.get("RESUME_JOB_LEASE", 300))
+
+
+def user_room(user_id):
+    """Socket.IO room every connection of a logged-in user joins."""
+    return f"user_{user_id}"
+
+
+def analysis_key(document_sha256, job_description):
+    """
+    Identifies an analysis by what it was computed from: the file contents,
+    the job description (whitespace-insensitive) and the prompt version.
+    """
+    from backend.utils.ai_utils import ANALYZE_RESUME_PROMPT_VERSION
+    jd = " ".join((job_description or "").split())
+    jd_sha256 = hashlib.sha256(jd.encode("utf-8")).hexdigest()
+    key = f"{document_sha256}:{jd_sha256}:{ANALYZE_RESUME_PROMPT_VERSION}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class ResumeAnalysisService:
+    def __init__(self):
+        self._recovered = False
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def submit(self, user_id, resume_path, job_description, document_sha256=None):
+        """
+        Queues an uploaded resume (already saved under UPLOAD_FOLDER) for
+        analysis and starts working on it in the background.
+        """
+        job = ResumeAnalysisJob(id=uuid.uuid4().hex, user_id=user_id, resume_path=resume_path,
+                                document_sha256=document_sha256, job_description=job_description,
+                                owner=self.worker_id, heartbeat=datetime.utcnow())
+        db.session.add(job)
+        db.session.commit()
+        self._start(job.id)
+        return job
+
+    def status(self, job):
+        """JSON-ready state of a job, as also sent in the progress events."""
+        data = {
+            'job_id': job.id,
+            'status': job.status,
+            'stage': job.stage,
+            'progress': 100 if job.status == 'done' else STAGE_PROGRESS.get(job.stage, 0),
+        }
+        if job.status == 'done':
+            data['redirect_url'] = url_for('user.resume_analysis_result', user_data_id=job.user_data_id)
+            data['message'] = job.message
+        elif job.status == 'failed':
+            data['error'] = job.error
+        return data
+
+    def recover(self):
+        """
+        Restarts jobs left queued or running by a worker that stopped
+        renewing their lease (crashed or restarted). Jobs other live
+        workers are running are left alone.
+        Runs once per process, from the first request.
+        """
+        if self._recovered:
+            return
+        self._recovered = True
+        try:
+            pending = ResumeAnalysisJob.query.filter(
+                ResumeAnalysisJob.status.in_(['queued', 'running']), self._expired()).all()
+        except Exception as e:
+            print(f"Could not load pending resume analysis jobs: {e}")
+            return
+        for job in pending:
+            # Several workers can start at once: only the one whose claim lands runs the job
+            if self._claim(job.id):
+                print(f"DEBUG: Resuming resume analysis job {job.id} at stage '{job.stage}'.", flush=True)
+                self._start(job.id)
+
+    def _expired(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=LEASE_SECONDS)
+        return db.or_(ResumeAnalysisJob.heartbeat.is_(None), ResumeAnalysisJob.heartbeat < cutoff)
+
+    def _claim(self, job_id):
+        """
+        Takes (or renews) the lease on an unfinished job with a single
+        conditional UPDATE, so two workers never both get it. Succeeds if
+        this worker already owns the job or its lease has expired.
+        """
+        claimed = ResumeAnalysisJob.query.filter(
+            ResumeAnalysisJob.id == job_id,
+            ResumeAnalysisJob.status.in_(['queued', 'running']),
+            db.or_(ResumeAnalysisJob.owner == self.worker_id, self._expired()),
+        ).update({'owner': self.worker_id, 'heartbeat': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _start(self, job_id):
+        app = current_app._get_current_object()
+        # A green thread under eventlet, a regular thread otherwise
+        socketio.start_background_task(self._run, app, job_id)
+
+    def _emit(self, job, event='resume_analysis_progress'):
+        socketio.emit(event, self.status(job), to=user_room(job.user_id))
+
+    def _run(self, app, job_id):
+        with app.app_context(), app.test_request_context():
+            if not self._claim(job_id):
+                # Finished, or taken over by another worker
+                return
+            job = ResumeAnalysisJob.query.get(job_id)
+            job.status = 'running'
+            job.attempts = (job.attempts or 0) + 1
+            db.session.commit()
+
+            state = {}
+            try:
+                for stage in STAGES[STAGES.index(job.stage):]:
+                    job.stage = stage
+                    self._emit(job)
+                    getattr(self, f"_{stage}")(job, state)
+                    job.stage = STAGES[STAGES.index(stage) + 1] if stage != STAGES[-1] else 'done'
+                    job.heartbeat = datetime.utcnow()
+                    db.session.commit()
+                job.status = 'done'
+                db.session.commit()
+                self._emit(job, 'resume_analysis_done')
+            except Exception as e:
+                db.session.rollback()
+                job = ResumeAnalysisJob.query.get(job_id)
+                print(f"Resume analysis job {job_id} failed at '{job.stage}': {e}", flush=True)
+                if job.attempts < MAX_ATTEMPTS and not isinstance(e, ValueError):
+                    # Transient failure (provider down, DB locked): try again later
+                    job.status = 'queued'
+                    db.session.commit()
+                    socketio.sleep(2 ** job.attempts)
+                    self._start(job_id)
+                    return
+                job.status = 'failed'
+                job.error = str(e)[:255] if isinstance(e, ValueError) else "An internal error occurred during analysis."
+                db.session.commit()
+                self._emit(job, 'resume_analysis_failed')
+
+    # --- Stages ---
+    # Each stage reads what earlier stages stored, never in-memory state
+    # alone, so it can run in a different process from the one before.
+
+    def _document(self, job, state):
+        from backend.utils.file_utils import SCANNED_PDF_MESSAGE
+        if 'document' not in state:
+            from backend.utils.resume_store import get_document
+            path = os.path.join(current_app.config['UPLOAD_FOLDER'], job.resume_path)
+            state['document'] = get_document(path, job.document_sha256)
+        if state['document'] is None:
+            raise ValueError("The uploaded resume could not be found.")
+        text = (state['document'].text or "").strip()
+        if not text or text == SCANNED_PDF_MESSAGE:
+            # Nothing to analyze: don't spend an AI call on it
+            raise ValueError("Could not read any text from the resume. "
+                             "Please upload a text-based PDF.")
+        return state['document']
+
+    def _extract(self, job, state):
+        self._document(job, state)
+
+    def _analyze(self, job, state):
+        from backend.utils.ai_utils import analyze_resume
+        document = self._document(job, state)
+        state['analysis_key'] = analysis_key(document.sha256, job.job_description)
+
+        # Same file, same job description: reuse the earlier analysis
+        previous = UserData.query.filter_by(analysis_key=state['analysis_key']) \
+            .order_by(UserData.uploaded_at.desc()).first()
+        if previous is not None and previous.analysis_result and not previous.analysis_result.get('analysis_error'):
+            print(f"DEBUG: Reusing analysis of upload {previous.id} for job {job.id}.", flush=True)
+            state['analysis_result'] = copy.deepcopy(previous.analysis_result)
+            state['reused_from_id'] = previous.id
+            return
+
+        analysis_result = analyze_resume(document.text, job.job_description)
+        if not analysis_result:
+            raise ValueError("Could not analyze the resume.")
+        if analysis_result.get('analysis_error'):
+            # The provider failed: show the placeholder, but never reuse it
+            state['analysis_key'] = None
+        analysis_result['page_count'] = document.page_count
+        state['analysis_result'] = analysis_result
+
+    def _persist(self, job, state):
+        from backend.utils.resume_digest import build_digest
+        from backend.utils.skill_registry import get_registry
+        if 'analysis_result' not in state:
+            # Restarted between analyze and persist
+            self._analyze(job, state)
+        document = self._document(job, state)
+        analysis_result = state['analysis_result']
+        skills = analysis_result.get('actual_skills') or []
+        # Before adding the row: registering a new skill commits the session
+        skill_ids = get_registry().skill_ids(skills if isinstance(skills, list) else [])
+        user_data = UserData(user_id=job.user_id,
+                             resume_path=job.resume_path,
+                             analysis_result=analysis_result,
+                             skill_ids=skill_ids,
+                             resume_digest=build_digest(document.text, analysis_result),
+                             document_sha256=document.sha256,
+                             analysis_key=state['analysis_key'],
+                             reused_from_id=state.get('reused_from_id'))
+        db.session.add(user_data)
+        db.session.flush()
+        job.user_data_id = user_data.id
+
+    def _index(self, job, state):
+        from backend.utils.recommendations import refresh_user
+        from backend.utils.vector_utils import add_resume_to_vector_db
+        user_data = UserData.query.get(job.user_data_id)
+        text = self._document(job, state).text
+        try:
+            # Embeds the resume once for this upload and stores its top jobs
+            refresh_user(user_data, text)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Recommendation Error: {e}")
+
+        previous = UserData.query.filter(UserData.user_id == job.user_id, UserData.id != user_data.id) \
+            .order_by(UserData.uploaded_at.desc()).first()
+        if previous is not None and previous.document_sha256 == user_data.document_sha256:
+            # The user's index entry already holds this exact resume
+            return
+        try:
+            skills = user_data.analysis_result.get('actual_skills', [])
+            add_resume_to_vector_db(job.user_id, text, skills)
+        except Exception as e:
+            # Search indexing is best effort; the analysis is already saved
+            current_app.logger.error(f"Vector Indexing Error: {e}")
+
+    def _gamify(self, job, state):
+        from backend.utils.gamification import award_xp, check_quest_progress
+        user_data = UserData.query.get(job.user_data_id)
+        user = User.query.get(job.user_id)
+
+        # Check for improvement over earlier uploads before awarding XP
+        max_prev_score = 0
+        for pb in UserData.query.filter(UserData.user_id == job.user_id, UserData.id != user_data.id).all():
+            try:
+                s = int(pb.analysis_result.get('resume_score', 0))
+                if s > max_prev_score: max_prev_score = s
+            except (TypeError, ValueError, AttributeError): continue
+
+        new_score = int(user_data.analysis_result.get('resume_score', 0))
+        if new_score > max_prev_score:
+            improvement = new_score - max_prev_score
+            award_xp(user, 50 + (improvement * 2), f"improving resume score to {new_score}")
+            check_quest_progress(user, "resume_analysis")
+        else:
+            job.message = "Note: No score improvement detected. Keep optimizing to earn more XP!"
+
+
+    def get_dedup_stats(self, days=30):
+        """
+        Uploads analyzed in the last `days` days and how many of them reused
+        an earlier analysis of an identical upload.
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        recent = UserData.query.filter(UserData.uploaded_at >= since, UserData.analysis_key.isnot(None))
+        uploads = recent.count()
+        hits = recent.filter(UserData.reused_from_id.isnot(None)).count()
+        return {
+            'days': days,
+            'uploads': uploads,
+            'hits': hits,
+            'hit_rate': round(hits / uploads, 3) if uploads else 0.0,
+        }
+
+
+# Singleton instance
+resume_analysis_service = ResumeAnalysisService()
@@ -1,19 +1,82 @@
-from flask_socketio import emit
+from flask_socketio import emit, join_room
 from backend.extensions import socketio, db
-from flask import request
+from flask import request, session, url_for
 from flask_login import current_user
-from backend.services.interview_service import interview_service
+from backend.services.interview_service import interview_service, ANALYSIS_FALLBACK
 from backend.services.skillfit_service import skillfit_service
+from backend.services.resume_analysis_service import user_room
+from backend.utils.ai_utils import INTERVIEW_QUESTION_FALLBACK
 import json
+import threading
+
+# Cancellation flags for question streams in progress, keyed by socket id.
+# Set on disconnect (or when a newer answer supersedes the stream) so the
+# provider stops generating text nobody will read.
+_active_streams = {}
+
+
+def _stream_question(sid, round_number, **kwargs):
+    """
+    Streams the next question to the client as interview_question_chunk
+    events and returns the full text, or None if the client went away.
+    """
+    previous = _active_streams.get(sid)
+    if previous is not None:
+        previous.set()
+    cancel = threading.Event()
+    _active_streams[sid] = cancel
+
+    parts = []
+    stream = interview_service.stream_next_question(round_number=round_number, **kwargs)
+    try:
+        for chunk in stream:
+            if cancel.is_set():
+                break
+            parts.append(chunk)
+            emit('interview_question_chunk', {'chunk': chunk, 'round': round_number})
+            # Let the server flush the chunk before the next one arrives
+            socketio.sleep(0)
+    finally:
+        stream.close()
+        if _active_streams.get(sid) is cancel:
+            _active_streams.pop(sid, None)
+
+    if cancel.is_set():
+        print(f"DEBUG: Question stream cancelled for SID: {sid}")
+        return None
+    return "".join(parts).strip() or INTERVIEW_QUESTION_FALLBACK
+
+def _emit_analysis(sid, question, answer, interview_type, round_number):
+    """
+    Background task: scores an answer and pushes the result to the client
+    while the next question is being generated.
+    """
+    try:
+        analysis = interview_service.analyze_response(
+            question, answer, interview_type=interview_type
+        )
+    except Exception as e:
+        # Nothing else would tell the client; it would wait on "Analyzing..."
+        print(f"Error analyzing answer for SID {sid}: {e}")
+        analysis = dict(ANALYSIS_FALLBACK)
+    analysis['round'] = round_number
+    socketio.emit('sentiment_feedback', analysis, to=sid)
+
 
 @socketio.on('connect')
 def handle_connect():
     print(f"Client connected: {request.sid}")
+    if current_user.is_authenticated:
+        # Per-user room for background job progress (e.g. resume analysis)
+        join_room(user_room(current_user.id))
     emit('status', {'msg': 'Connected to AI Interview Coach'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print(f"Client disconnected: {request.sid}")
+    cancel = _active_streams.pop(request.sid, None)
+    if cancel is not None:
+        cancel.set()
 
 # --- AI SkillFit Core Events ---
 
@@ -72,13 +135,15 @@ def handle_start_interview(data):
         session['interview_context'] = None
             
     # Generate First Question
-    question = interview_service.get_next_question(
-        "Tell me about yourself.", "start",
+    question = _stream_question(
+        request.sid, 1,
+        last_answer="Tell me about yourself.", stage="start",
         interview_type=interview_type,
         difficulty=difficulty,
-        agent=agent,
-        round_number=1
+        agent=agent
     )
+    if question is None:
+        return
     
     # Record first question
     session['interview_transcript'].append(f"AI: {question}")
@@ -112,12 +177,12 @@ def handle_send_answer(data):
     
     transcript.append(f"User: {answer}")
     
-    # 1. Real-time Sentiment & STAR Analysis
-    analysis = interview_service.analyze_response(
-        last_ai_question, answer, interview_type=interview_type
+    # 1. Real-time Sentiment & STAR Analysis, in parallel with the next question.
+    # start_background_task picks a green thread under eventlet.
+    socketio.start_background_task(
+        _emit_analysis, request.sid, last_ai_question, answer,
+        interview_type, round_number
     )
-    analysis['round'] = round_number
-    emit('sentiment_feedback', analysis)
     
     context_json = session.get('interview_context')
     context = json.loads(context_json) if context_json else None
@@ -126,16 +191,18 @@ def handle_send_answer(data):
     round_number += 1
     session['interview_round'] = round_number
     
-    # 2. Get Next Question via Service with full context
-    question = interview_service.get_next_question(
-        answer, "continue",
+    # 2. Stream Next Question via Service with full context
+    question = _stream_question(
+        request.sid, round_number,
+        last_answer=answer, stage="continue",
         context=context,
         interview_type=interview_type,
         difficulty=difficulty,
         agent=agent,
-        round_number=round_number,
         conversation_history=transcript[-6:]  # Last 3 Q&A pairs
     )
+    if question is None:
+        return
     
     transcript.append(f"AI: {question}")
     session['interview_transcript'] = transcript
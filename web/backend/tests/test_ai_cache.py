@@ -0,0 +1,124 @@
+import pytest
+from unittest.mock import patch
+from backend.utils import ai_cache
+from backend.utils import ai_utils
+
+
+@pytest.fixture
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('AI_CACHE_DB_PATH', str(tmp_path / 'ai_cache.db'))
+    monkeypatch.setenv('AI_CACHE_ENABLED', 'true')
+    monkeypatch.setattr(ai_cache, '_disk_conn', None)
+    ai_cache._memory.clear()
+    for k in ai_cache._stats:
+        ai_cache._stats[k] = 0
+    yield ai_cache
+    ai_cache._memory.clear()
+
+
+def test_key_depends_on_every_component():
+    base = ai_cache.make_key('gemini', 'm1', 'application/json', 'prompt')
+    assert base == ai_cache.make_key('gemini', 'm1', 'application/json', 'prompt')
+    assert base != ai_cache.make_key('ollama', 'm1', 'application/json', 'prompt')
+    assert base != ai_cache.make_key('gemini', 'm2', 'application/json', 'prompt')
+    assert base != ai_cache.make_key('gemini', 'm1', None, 'prompt')
+    assert base != ai_cache.make_key('gemini', 'm1', 'application/json', 'prompt ')
+
+
+def test_memory_then_disk_hit(fresh_cache):
+    key = ai_cache.make_key('gemini', 'm', None, 'hello')
+    assert ai_cache.get(key) is None
+    ai_cache.put(key, {'score': 90}, ttl=60)
+
+    assert ai_cache.get(key) == {'score': 90}
+    assert ai_cache._stats['memory_hits'] == 1
+
+    # Simulate a fresh worker: memory empty, disk still populated
+    ai_cache._memory.clear()
+    assert ai_cache.get(key) == {'score': 90}
+    assert ai_cache._stats['disk_hits'] == 1
+    assert ai_cache.get_stats()['misses'] == 1
+
+
+def test_returned_values_are_copies(fresh_cache):
+    key = ai_cache.make_key('gemini', 'm', None, 'copy')
+    ai_cache.put(key, {'resume_score': 70}, ttl=60)
+    first = ai_cache.get(key)
+    first['page_count'] = 2
+    assert 'page_count' not in ai_cache.get(key)
+
+
+def test_lru_eviction(fresh_cache, monkeypatch):
+    monkeypatch.setenv('AI_CACHE_MAX_ENTRIES', '2')
+    monkeypatch.setenv('AI_CACHE_DISK', 'false')
+    monkeypatch.setattr(ai_cache, '_disk_conn', None)
+    for i in range(3):
+        ai_cache.put(f'k{i}', f'v{i}', ttl=60)
+    assert ai_cache.get('k0') is None
+    assert ai_cache.get('k2') == 'v2'
+    assert ai_cache._stats['evictions'] == 1
+
+
+def test_expired_entries_miss(fresh_cache):
+    ai_cache.put('old', 'value', ttl=60)
+    with patch('backend.utils.ai_cache.time.time', return_value=10**12):
+        assert ai_cache.get('old') is None
+
+
+def test_call_ai_uses_cache_per_feature(fresh_cache):
+    with patch.object(ai_utils.router, 'call') as mock_gen:
+        mock_gen.return_value = '{"structural_score": 80}'
+        first = ai_utils._call_ai("same prompt", 'application/json', feature='simulate_ats_parsing')
+        second = ai_utils._call_ai("same prompt", 'application/json', feature='simulate_ats_parsing')
+        assert first == second == {"structural_score": 80}
+        assert mock_gen.call_count == 1
+
+        # Features with a zero TTL always go to the provider
+        ai_utils._call_ai("same prompt", 'application/json', feature='generate_mock_test')
+        ai_utils._call_ai("same prompt", 'application/json', feature='generate_mock_test')
+        assert mock_gen.call_count == 3
+
+
+def test_failed_responses_are_not_cached(fresh_cache):
+    with patch.object(ai_utils.router, 'call') as mock_gen:
+        mock_gen.return_value = None
+        ai_utils._call_ai("flaky", feature='analyze_resume')
+        ai_utils._call_ai("flaky", feature='analyze_resume')
+        assert mock_gen.call_count == 2
+
+
+def test_fallback_answers_are_not_cached(fresh_cache, monkeypatch):
+    from backend.utils import ai_metrics
+    monkeypatch.setenv('AI_PROVIDER', 'gemini')
+
+    def ollama_answers(prompt, mime=None, deadline=None):
+        ai_metrics.note_attempt('ollama', fallback=True)
+        return "local answer"
+
+    with patch.object(ai_utils.router, 'call', side_effect=ollama_answers) as mock_gen:
+        ai_utils._call_ai("prompt", feature='analyze_resume')
+        ai_utils._call_ai("prompt", feature='analyze_resume')
+        assert mock_gen.call_count == 2
+
+
+def test_caller_name_is_inferred():
+    def analyze_dream_job():
+        return ai_utils._call_gemini("p")
+
+    with patch('backend.utils.ai_utils.ai_cache.ttl_for', return_value=0) as mock_ttl, \
+         patch.object(ai_utils.router, 'call', return_value="ok"):
+        analyze_dream_job()
+        mock_ttl.assert_called_once_with('analyze_dream_job')
+
+
+def test_stream_ai_caches_completed_streams(fresh_cache):
+    def chunks(prompt, deadline=None):
+        yield "Why "
+        yield "this role?"
+
+    with patch.object(ai_utils.router, 'stream', side_effect=chunks) as mock_stream:
+        first = list(ai_utils._stream_ai("question prompt", feature='get_interview_question'))
+        second = list(ai_utils._stream_ai("question prompt", feature='get_interview_question'))
+    assert first == ["Why ", "this role?"]
+    assert second == ["Why this role?"]
+    assert mock_stream.call_count == 1
@@ -0,0 +1,78 @@
+import threading
+import time
+import pytest
+from backend.utils.ai_concurrency import SingleFlight, ProviderLimiter, AIQueueTimeout
+
+
+def test_single_flight_coalesces_identical_calls():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow_call():
+        calls.append(1)
+        release.wait(2)
+        return {"question": "Tell me about yourself."}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('same', slow_call)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    # Give the followers time to queue up behind the leader
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert all(r == {"question": "Tell me about yourself."} for r in results)
+    assert flight.coalesced == 4
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    def boom():
+        raise ValueError("provider down")
+
+    with pytest.raises(ValueError):
+        flight.do('k', boom)
+    # Key is released so the next caller retries
+    assert flight.do('k', lambda: "ok") == "ok"
+
+
+def test_waiters_give_up_on_a_hung_leader():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do('k', lambda: release.wait(5) and "late"))
+    leader.start()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    with pytest.raises(AIQueueTimeout):
+        flight.do('k', lambda: "unused", timeout=0.1)
+    assert time.monotonic() - start < 1
+    release.set()
+    leader.join()
+    assert flight.in_flight() == 0
+
+
+def test_limiter_times_out_when_full(monkeypatch):
+    monkeypatch.setenv('AI_MAX_CONCURRENCY_GEMINI', '1')
+    limiter = ProviderLimiter()
+
+    with limiter.slot('gemini'):
+        with pytest.raises(AIQueueTimeout):
+            with limiter.slot('gemini', timeout=0.05):
+                pass
+
+    stats = limiter.get_stats()['gemini']
+    assert stats['limit'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['acquired'] == 1
+    assert stats['active'] == 0
+    assert stats['queued'] == 0
+    assert stats['max_queued'] == 1
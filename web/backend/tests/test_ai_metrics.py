@@ -0,0 +1,93 @@
+import pytest
+from backend.utils import ai_metrics
+from backend.utils.ai_router import ProviderRouter
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(ai_metrics, '_pending', {})
+    monkeypatch.setenv('AI_METRICS_ENABLED', 'true')
+
+
+def test_router_attempts_and_usage_are_recorded(monkeypatch):
+    monkeypatch.setenv('AI_PROVIDER', 'gemini')
+    router = ProviderRouter()
+
+    def gemini(prompt, mime, timeout):
+        raise RuntimeError("quota exceeded")
+
+    def ollama(prompt, mime, timeout):
+        ai_metrics.note_usage(prompt_tokens=12, response_tokens=30)
+        return "local answer"
+
+    router.register('gemini', gemini)
+    router.register('ollama', ollama)
+
+    record = ai_metrics.start('analyze_dream_job', "x" * 40)
+    with ai_metrics.bound(record):
+        result = router.call("prompt")
+    ai_metrics.finish(record, True, len(result), model='llama3.2')
+
+    assert record.attempts == 2
+    assert record.fallback is True
+    agg = ai_metrics._pending[('analyze_dream_job', 'ollama', 'llama3.2')]
+    assert agg['calls'] == 1
+    assert agg['fallbacks'] == 1
+    assert agg['prompt_tokens'] == 12
+    assert agg['response_tokens'] == 30
+    assert agg['cost_usd'] == 0.0
+
+
+def test_tokens_are_estimated_and_priced():
+    record = ai_metrics.start('analyze_resume', "x" * 4000)
+    with ai_metrics.bound(record):
+        ai_metrics.note_attempt('gemini')
+    ai_metrics.finish(record, True, 400, model='gemini-2.0-flash-lite')
+
+    agg = ai_metrics._pending[('analyze_resume', 'gemini', 'gemini-2.0-flash-lite')]
+    assert agg['prompt_tokens'] == 1000
+    assert agg['response_tokens'] == 100
+    assert agg['cost_usd'] == pytest.approx((1000 * 0.075 + 100 * 0.30) / 1_000_000)
+
+
+def test_cache_hits_cost_nothing():
+    record = ai_metrics.start('simulate_ats_parsing', "x" * 4000)
+    record.cache = 'hit'
+    ai_metrics.finish(record, True, 400)
+    agg = ai_metrics._pending[('simulate_ats_parsing', 'cache', 'cache')]
+    assert agg['cache_hits'] == 1
+    assert agg['prompt_tokens'] == 0
+    assert agg['cost_usd'] == 0.0
+
+
+def test_aggregate_is_bounded(monkeypatch):
+    monkeypatch.setenv('AI_METRICS_MAX_KEYS', '2')
+    for feature in ('a', 'b', 'c', 'd'):
+        ai_metrics.finish(ai_metrics.start(feature, "p"), True)
+    assert len(ai_metrics._pending) == 3
+    assert ai_metrics._pending[ai_metrics.OVERFLOW_KEY]['calls'] == 2
+
+
+def test_percentile_from_buckets():
+    buckets = [0] * (len(ai_metrics.LATENCY_BUCKETS_MS) + 1)
+    buckets[ai_metrics._bucket(80)] = 90
+    buckets[ai_metrics._bucket(4000)] = 10
+    assert ai_metrics.percentile_from_buckets(buckets, 50) == 100
+    assert ai_metrics.percentile_from_buckets(buckets, 95) == 5000
+    assert ai_metrics.percentile_from_buckets([0] * len(buckets), 95) is None
+
+
+def test_streamed_calls_are_recorded_under_the_calling_feature(monkeypatch):
+    from backend.utils import ai_cache, ai_utils
+    monkeypatch.setattr(ai_cache, 'ttl_for', lambda feature: 0)
+    monkeypatch.setattr(ai_utils.router, 'stream', lambda prompt, expires: (c for c in ["a", "b"]))
+    features = []
+    start = ai_metrics.start
+    monkeypatch.setattr(ai_metrics, 'start', lambda feature, prompt: features.append(feature) or start(feature, prompt))
+
+    def suggest_questions():
+        return ai_utils._stream_ai("prompt")
+
+    stream = suggest_questions()
+    assert list(stream) == ["a", "b"]
+    assert features == ['suggest_questions']
@@ -0,0 +1,81 @@
+import json
+import msgspec
+import random
+import time
+import pytest
+from backend.utils import ai_offline, ai_schemas, ai_utils
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    monkeypatch.setenv('AI_PROVIDER', 'offline')
+    monkeypatch.setenv('AI_OFFLINE_MODE', 'synthetic')
+    monkeypatch.setenv('AI_OFFLINE_LATENCY', 'none')
+    monkeypatch.setenv('AI_OFFLINE_CASSETTE', str(tmp_path / 'cassette.jsonl'))
+    monkeypatch.setenv('AI_CACHE_ENABLED', 'false')
+    ai_offline.reset()
+    yield ai_offline
+    ai_offline.reset()
+
+
+@pytest.mark.parametrize("feature, schema", list(ai_offline.SCHEMAS.items()))
+def test_synthetic_json_matches_schema(feature, schema):
+    raw = ai_offline.synthetic_response("prompt", 'application/json', feature)
+    # Strict decoding: every field present with the right type
+    value = msgspec.json.decode(raw, type=schema)
+    assert value is not None
+    assert raw == ai_offline.synthetic_response("prompt", 'application/json', feature)
+    assert raw != ai_offline.synthetic_response("other prompt", 'application/json', feature)
+
+
+def test_synthetic_answers_through_call_ai(offline):
+    report = ai_utils.generate_interview_report("AI: Hi\nUser: Hello")
+    assert 55 <= report['overall_score'] <= 92
+    assert len(report['question_breakdown']) == 3
+    assert ai_utils.generate_mock_test("SQL")['questions'][0]['options']
+    assert ai_utils.get_interview_question("answer", round_number=3).endswith("?")
+
+
+def test_latency_specs():
+    rng = random.Random(1)
+    assert ai_offline.parse_latency("fixed:250")(rng) == 250
+    assert 100 <= ai_offline.parse_latency("uniform:100:200")(rng) <= 200
+    assert ai_offline.parse_latency("lognormal:800:0.5")(rng) > 0
+    assert ai_offline.parse_latency("none")(rng) == 0
+
+
+def test_latency_beyond_timeout_fails(offline, monkeypatch):
+    monkeypatch.setenv('AI_OFFLINE_LATENCY', 'fixed:5000')
+    with pytest.raises(TimeoutError):
+        ai_offline.call("prompt", timeout=0.01)
+
+
+def test_record_then_replay(offline, monkeypatch, tmp_path):
+    calls = []
+
+    def upstream(prompt, mime, timeout):
+        calls.append(prompt)
+        time.sleep(0.05)
+        return '{"score": 9, "reason": "recorded"}'
+
+    monkeypatch.setitem(ai_utils.router._providers, 'fake', upstream)
+    monkeypatch.setitem(ai_utils.router._streamers, 'fake', lambda p, t: iter(["Tell ", "me more."]))
+    monkeypatch.setenv('AI_OFFLINE_UPSTREAM', 'fake')
+
+    monkeypatch.setenv('AI_OFFLINE_MODE', 'record')
+    assert ai_utils._call_ai("match prompt", 'application/json', feature='calculate_match')['score'] == 9
+    assert list(ai_utils._stream_ai("question prompt", feature='get_interview_question')) == ["Tell ", "me more."]
+    entries = [json.loads(line) for line in (tmp_path / 'cassette.jsonl').read_text().splitlines()]
+    assert entries[0]['latency_ms'] >= 50
+    assert entries[1]['chunks'][1][1] == "me more."
+
+    monkeypatch.setenv('AI_OFFLINE_MODE', 'replay')
+    monkeypatch.setenv('AI_OFFLINE_REPLAY_MISS', 'error')
+    ai_offline.reset()
+    start = time.monotonic()
+    assert ai_utils._call_ai("match prompt", 'application/json', feature='calculate_match')['reason'] == "recorded"
+    assert time.monotonic() - start >= 0.05
+    assert list(ai_utils._stream_ai("question prompt", feature='get_interview_question')) == ["Tell ", "me more."]
+    assert calls == ["match prompt"]
+    with pytest.raises(LookupError):
+        ai_offline.call("never recorded")
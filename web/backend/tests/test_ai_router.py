@@ -0,0 +1,210 @@
+import time
+import pytest
+from backend.utils.ai_router import ProviderRouter, CLOSED, OPEN, HALF_OPEN
+
+
+@pytest.fixture
+def gemini_router(monkeypatch):
+    monkeypatch.setenv('AI_PROVIDER', 'gemini')
+    monkeypatch.setenv('AI_BREAKER_FAILURES', '2')
+    monkeypatch.setenv('AI_BREAKER_COOLDOWN', '30')
+    return ProviderRouter()
+
+
+def test_falls_back_to_ollama_without_retry_sleeps(gemini_router):
+    calls = []
+
+    def gemini(prompt, mime, timeout):
+        calls.append('gemini')
+        raise RuntimeError("quota exceeded")
+
+    def ollama(prompt, mime, timeout):
+        calls.append('ollama')
+        return "local answer"
+
+    gemini_router.register('gemini', gemini)
+    gemini_router.register('ollama', ollama)
+
+    start = time.monotonic()
+    assert gemini_router.call("prompt") == "local answer"
+    assert time.monotonic() - start < 1
+    assert calls == ['gemini', 'ollama']
+    assert gemini_router.get_active_provider() == 'ollama'
+
+
+def test_breaker_opens_and_skips_failing_provider(gemini_router):
+    calls = []
+
+    def gemini(prompt, mime, timeout):
+        calls.append('gemini')
+        raise RuntimeError("503")
+
+    gemini_router.register('gemini', gemini)
+    gemini_router.register('ollama', lambda p, m, t: "ok")
+
+    gemini_router.call("a")
+    gemini_router.call("b")
+    assert gemini_router.get_stats()['gemini']['state'] == OPEN
+
+    gemini_router.call("c")
+    assert calls == ['gemini', 'gemini']
+    assert gemini_router.candidates() == ['ollama']
+
+
+def test_half_open_probe_closes_breaker(gemini_router, monkeypatch):
+    healthy = {'gemini': False}
+
+    def gemini(prompt, mime, timeout):
+        if not healthy['gemini']:
+            raise RuntimeError("down")
+        return "cloud answer"
+
+    gemini_router.register('gemini', gemini)
+    gemini_router.register('ollama', lambda p, m, t: "local answer")
+    gemini_router.call("a")
+    gemini_router.call("b")
+
+    breaker = gemini_router._health['gemini'].breaker
+    breaker.opened_at -= 31  # cooldown elapsed
+    assert breaker.available(time.monotonic())
+    assert breaker.state == HALF_OPEN
+
+    healthy['gemini'] = True
+    assert gemini_router.call("c") == "cloud answer"
+    assert breaker.state == CLOSED
+
+
+def test_unscored_provider_recovers_after_an_outage(gemini_router):
+    healthy = {'gemini': False}
+    calls = []
+
+    def gemini(prompt, mime, timeout):
+        calls.append('gemini')
+        if not healthy['gemini']:
+            raise RuntimeError("down")
+        return "cloud answer"
+
+    gemini_router.register('gemini', gemini)
+    gemini_router.register('ollama', lambda p, m, t: "local answer")
+    for _ in range(10):
+        assert gemini_router.call("prompt") == "local answer"
+    assert gemini_router._health['ollama'].score() is not None
+    assert gemini_router._health['gemini'].score() is None
+
+    healthy['gemini'] = True
+    gemini_router._health['gemini'].breaker.opened_at -= 31  # cooldown elapsed
+    assert gemini_router.candidates() == ['gemini', 'ollama']  # the probe goes first
+    for _ in range(3):
+        assert gemini_router.call("prompt") == "cloud answer"
+    assert gemini_router.get_stats()['gemini']['state'] == CLOSED
+    assert calls.count('gemini') == 5
+
+
+def test_prefers_lower_latency_provider(gemini_router):
+    gemini_router.register('gemini', lambda p, m, t: "g")
+    gemini_router.register('ollama', lambda p, m, t: "o")
+
+    for _ in range(5):
+        gemini_router._record('gemini', True, 2000.0)
+        gemini_router._record('ollama', True, 300.0)
+
+    assert gemini_router.candidates() == ['ollama', 'gemini']
+    stats = gemini_router.get_stats()
+    assert stats['gemini']['p50_ms'] == 2000.0
+    assert stats['ollama']['p95_ms'] == 300.0
+
+
+def test_deadline_stops_further_attempts(gemini_router):
+    calls = []
+
+    def slow_gemini(prompt, mime, timeout):
+        calls.append(timeout)
+        time.sleep(0.05)
+        raise TimeoutError()
+
+    gemini_router.register('gemini', slow_gemini)
+    gemini_router.register('ollama', lambda p, m, t: calls.append('ollama') or "late")
+
+    assert gemini_router.call("p", deadline=time.monotonic() + 0.01) is None
+    assert len(calls) == 1
+    assert calls[0] <= 0.01
+
+
+def test_ollama_provider_has_no_fallback(monkeypatch):
+    monkeypatch.setenv('AI_PROVIDER', 'ollama')
+    router = ProviderRouter()
+    router.register('gemini', lambda p, m, t: "g")
+    router.register('ollama', lambda p, m, t: "o")
+    assert router.candidates() == ['ollama']
+
+
+def test_stream_falls_back_before_first_chunk(gemini_router):
+    def gemini_stream(prompt, timeout):
+        raise RuntimeError("quota exceeded")
+        yield  # pragma: no cover
+
+    gemini_router.register('gemini', lambda p, m, t: None, gemini_stream)
+    gemini_router.register('ollama', lambda p, m, t: None,
+                           lambda p, t: iter(["Tell me ", "about ", "yourself."]))
+
+    assert list(gemini_router.stream("prompt")) == ["Tell me ", "about ", "yourself."]
+    assert gemini_router.get_active_provider() == 'ollama'
+    assert gemini_router.get_stats()['gemini']['failures'] == 1
+
+
+def test_stream_close_stops_upstream(gemini_router):
+    produced = []
+    closed = []
+
+    def gemini_stream(prompt, timeout):
+        try:
+            for i in range(100):
+                produced.append(i)
+                yield f"chunk{i} "
+        finally:
+            closed.append(True)
+
+    gemini_router.register('gemini', lambda p, m, t: None, gemini_stream)
+    stream = gemini_router.stream("prompt")
+    assert next(stream) == "chunk0 "
+    stream.close()
+
+    assert closed == [True]
+    assert len(produced) == 1
+    # A stream cut short by the consumer still counts as a healthy provider
+    assert gemini_router.get_stats()['gemini']['failures'] == 0
+
+
+def test_stream_error_after_first_chunk_is_raised(gemini_router):
+    def gemini_stream(prompt, timeout):
+        yield "partial"
+        raise RuntimeError("connection reset")
+
+    gemini_router.register('gemini', lambda p, m, t: None, gemini_stream)
+    gemini_router.register('ollama', lambda p, m, t: None, lambda p, t: iter(["other"]))
+
+    stream = gemini_router.stream("prompt")
+    assert next(stream) == "partial"
+    with pytest.raises(RuntimeError):
+        next(stream)
+
+
+def test_queue_timeouts_do_not_count_as_failures(gemini_router):
+    from backend.utils.ai_concurrency import AIQueueTimeout
+
+    def busy(*args):
+        raise AIQueueTimeout("No gemini slot available")
+
+    def busy_stream(prompt, timeout):
+        raise AIQueueTimeout("No gemini slot available")
+        yield
+
+    gemini_router.register('gemini', busy, busy_stream)
+    gemini_router.register('ollama', lambda p, m, t: "ok", lambda p, t: iter(["local"]))
+    for _ in range(5):
+        assert gemini_router.call("prompt") == "ok"
+        assert list(gemini_router.stream("prompt")) == ["local"]
+
+    stats = gemini_router.get_stats()['gemini']
+    assert stats['state'] == CLOSED
+    assert gemini_router._health['gemini'].failures == 0
@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import patch
+from backend.utils import ai_schemas
+from backend.utils import ai_utils
+from backend.utils.ai_schemas import repair_json, decode, AtsResult, InterviewReport
+
+
+@pytest.fixture(autouse=True)
+def reset_stats(monkeypatch):
+    monkeypatch.setattr(ai_schemas, '_stats', {})
+    monkeypatch.setenv('AI_CACHE_ENABLED', 'false')
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ('```json\n{"a": 1,}\n```', '{"a": 1}'),
+    ('Here you go: {"a": [1, 2', '{"a": [1, 2]}'),
+    ('{"a": "cut off mid-sent', '{"a": "cut off mid-sent"}'),
+    ('{"a": 1, "b"', '{"a": 1}'),
+    ('{"a": 1, "b": ', '{"a": 1}'),
+    ('{"a": {"c": 12', '{"a": {"c": 12}}'),
+    ('{"a": 1} Let me know if you need more.', '{"a": 1}'),
+])
+def test_repair_json(raw, expected):
+    assert repair_json(raw) == expected
+
+
+def test_decode_fills_defaults_and_coerces():
+    result = decode('{"structural_score": "72", "top_keywords": ["Python"]}', AtsResult)
+    assert result['structural_score'] == 72
+    assert result['top_keywords'] == ["Python"]
+    assert result['potential_issues'] == []
+    assert ai_schemas.get_stats()['AtsResult']['decoded'] == 1
+
+
+def test_decode_repairs_truncated_output():
+    raw = '```json\n{"overall_score": 80, "strengths": ["Clear", "Calm"], "weaknesses": ["Rambl'
+    result = decode(raw, InterviewReport)
+    assert result['overall_score'] == 80
+    assert result['weaknesses'] == ["Rambl"]
+    assert ai_schemas.get_stats()['InterviewReport']['repaired'] == 1
+
+
+def test_decode_salvages_bad_fields():
+    raw = '{"overall_score": 85.5, "strengths": "Good listener", "confidence_trend": "rising"}'
+    result = decode(raw, InterviewReport)
+    assert result['overall_score'] == 86
+    assert result['strengths'] == ["Good listener"]
+    assert result['confidence_trend'] == []
+    assert ai_schemas.get_stats()['InterviewReport']['salvaged'] == 1
+
+
+def test_decode_failure_is_counted():
+    assert decode("I cannot help with that.", AtsResult) is None
+    stats = ai_schemas.get_stats()['AtsResult']
+    assert stats['failed'] == 1
+    assert stats['failure_rate'] == 1.0
+
+
+def test_call_ai_repairs_instead_of_calling_again():
+    with patch.object(ai_utils.router, 'call', return_value='```json\n{"structural_score": 64,') as mock_call:
+        result = ai_utils.simulate_ats_parsing("resume text")
+    assert mock_call.call_count == 1
+    assert result['structural_score'] == 64
+    assert ai_schemas.get_stats()['AtsResult']['repaired'] == 1
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+import pytest
+from backend.utils import embeddings
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    calls = []
+
+    def compute(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 0.5, -1.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setenv('EMBEDDING_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(embeddings, '_compute', compute)
+    for name, value in (('_index', {}), ('_segments', []), ('_loaded', set())):
+        monkeypatch.setattr(embeddings, name, value)
+    return calls
+
+
+def test_texts_are_embedded_once(model):
+    first = embeddings.embed(["python dev", "go dev", "python dev"])
+    assert model == [["python dev", "go dev"]]
+    assert first.dtype == np.float32 and first.shape == (3, 3)
+    assert np.array_equal(first[0], first[2])
+
+    second = embeddings.embed(["go dev", "rust dev"])
+    assert model[1] == ["rust dev"]
+    assert np.allclose(second[0], first[1])
+
+
+def test_cache_is_shared_through_disk(model, tmp_path):
+    embeddings.embed(["python dev"])
+    files = sorted(os.listdir(tmp_path))
+    assert [f.split('.', 1)[1] for f in files] == ['keys.npy', 'vec.npy']
+    assert np.load(tmp_path / files[1]).dtype == np.float16
+
+    # A fresh worker maps the segment instead of running the model
+    embeddings._index.clear()
+    embeddings._segments.clear()
+    embeddings._loaded.clear()
+    vectors = embeddings.embed(["python dev"])
+    assert len(model) == 1 and vectors[0][0] == len("python dev")
+
+
+def test_segments_are_merged(model, tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, 'MAX_SEGMENTS', 3)
+    for i in range(5):
+        embeddings.embed([f"text {i}"])
+    assert len(embeddings._segments) <= 3
+    assert len(embeddings._index) == 5
+    assert np.allclose(embeddings.embed(["text 0", "text 4"])[:, 0], [6, 6])
+    assert len(model) == 5
+
+
+def test_model_is_part_of_the_key():
+    assert embeddings.make_key("x") != embeddings.make_key("x", model="other-model")
@@ -123,3 +123,13 @@ def test_analyze_response_fallback(app):
             assert result['score'] == 0
             assert result['sentiment'] == "error"
             assert result['star_adherence'] == 0
+
+
+def test_answer_analysis_errors_still_reach_the_client():
+    from backend import socket_events
+    with patch.object(interview_service, 'analyze_response', side_effect=RuntimeError("provider down")), \
+         patch.object(socket_events.socketio, 'emit') as mock_emit:
+        socket_events._emit_analysis('sid-1', "Q?", "A.", "mixed", 2)
+    event, payload = mock_emit.call_args.args
+    assert event == 'sentiment_feedback' and mock_emit.call_args.kwargs == {'to': 'sid-1'}
+    assert payload['sentiment'] == 'error' and payload['round'] == 2
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from backend import create_app, db
+from backend.models import JobPosting, User
+from backend.utils import keyword_index, vector_utils
+from backend.utils.keyword_index import BM25Index, tokenize
+
+
+@pytest.fixture
+def app():
+    keyword_index.reset()
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    keyword_index.reset()
+
+
+def test_tokenize_keeps_technical_terms():
+    assert tokenize("C++, C# and Node.js for CI/CD.") == ['c++', 'c#', 'node.js', 'ci/cd']
+
+
+def test_bm25_ranks_rare_terms_higher():
+    index = BM25Index()
+    index.add(1, "python developer building python services")
+    index.add(2, "java developer")
+    index.add(3, "developer with terraform and kubernetes")
+    # The shorter of two postings with the same term counts ranks higher
+    assert [doc for doc, _ in index.search("terraform developer")] == [3, 2, 1]
+    assert index.search("python")[0][0] == 1
+    assert index.search("haskell") == []
+
+
+def test_documents_are_replaced_and_removed():
+    index = BM25Index()
+    index.add(1, "python")
+    index.add(1, "golang")
+    assert index.search("python") == [] and index.search("golang")[0][0] == 1
+    index.remove(1)
+    index.remove(1)
+    assert len(index) == 0 and index.search("golang") == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = vector_utils.reciprocal_rank_fusion([[1, 2, 3], [3, 4]])
+    assert fused[0] == 3 and set(fused) == {1, 2, 3, 4}
+    assert vector_utils.reciprocal_rank_fusion([]) == []
+
+
+def test_hybrid_search_finds_exact_terms(app, monkeypatch):
+    user = User(username='r', email='r@test.com', role='recruiter')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    for title, description in (("Platform Engineer", "Terraform and AWS"), ("Backend Engineer", "Python APIs"),
+                               ("Frontend Engineer", "React")):
+        db.session.add(JobPosting(title=title, description=description, created_by=user.id))
+    db.session.commit()
+
+    # The dense ranking misses the Terraform posting entirely
+    monkeypatch.setattr(vector_utils, '_search', lambda kind, text, n: [
+        ('2', 0.9, {'job_id': 2}), ('3', 0.8, {'job_id': 3})])
+    assert 1 in vector_utils.search_jobs("terraform", n_results=2)
+
+    # Changes are applied to the built index without a rebuild
+    keyword_index.update_job(3, "Frontend Engineer", "React and Terraform")
+    keyword_index.remove_job(1)
+    assert [job_id for job_id, _ in keyword_index.search_jobs("terraform")] == [3]
+
+
+def test_search_survives_vector_errors(app, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("no backend")
+    monkeypatch.setattr(vector_utils, '_search', broken)
+    assert vector_utils.search_jobs("anything") == []
+
+
+def test_search_accepts_a_filter():
+    index = BM25Index()
+    for doc in range(1, 6):
+        index.add(doc, "python developer" if doc != 1 else "python python python")
+    assert [doc for doc, _ in index.search("python", 2, accept=lambda doc: doc != 1)] == [2, 3]
@@ -0,0 +1,73 @@
+import pytest
+from backend import create_app, db
+from backend.models import JobPosting, User, UserData
+from backend.utils import ai_utils, skill_registry
+from backend.utils.match_scoring import score_jobs
+
+
+def test_scores_all_jobs_at_once():
+    jobs = [(1, [10, 11]), (2, [10, 11, 12, 13]), (3, [20]), (4, []), (5, None)]
+    results = score_jobs([10, 11, 12], jobs)
+    assert results[1]['coverage'] == 1.0 and results[1]['jaccard'] == round(2 / 3, 3)
+    assert results[1]['score'] > results[2]['score'] > results[3]['score'] == 0
+    assert results[2]['matched'] and results[2]['missing'] == [13]
+    assert results[4]['score'] is None and results[5]['score'] is None
+
+
+def test_rare_skills_weigh_more():
+    # Everyone asks for 1; only job 3 asks for 2 and 3
+    jobs = [(1, [1, 2]), (2, [1, 3]), (3, [1, 4]), (4, [1])]
+    common = score_jobs([1], jobs)[1]
+    rare = score_jobs([2], jobs)[1]
+    assert rare['coverage'] > 0.5 > common['coverage']
+
+
+def test_no_jobs_or_skills():
+    assert score_jobs([], []) == {}
+    assert score_jobs([], [(1, [5])])[1]['score'] == 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app = create_app('testing')
+    skill_registry.reset()
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            user = User(username='u', email='u@test.com', role='user', is_verified=True)
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
+            registry = skill_registry.get_registry()
+            db.session.add(UserData(user_id=user.id, analysis_result={'actual_skills': ['Python', 'SQL']},
+                                    skill_ids=registry.skill_ids(['Python', 'SQL'])))
+            db.session.add(JobPosting(title="Data Engineer", description="Python, SQL and Airflow",
+                                      created_by=user.id))
+            db.session.add(JobPosting(title="Designer", description="Figma", created_by=user.id))
+            db.session.commit()
+            client.post('/auth/login', data={'email': 'u@test.com', 'password': 'password'})
+            yield client
+            db.session.remove()
+            db.drop_all()
+    skill_registry.reset()
+
+
+def test_jobs_page_renders_scores_without_ai(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("no AI call expected")
+    monkeypatch.setattr(ai_utils, '_call_gemini', fail)
+
+    response = client.get('/user/jobs')
+    assert response.status_code == 200
+    assert b'You have 2 of 3 key skills; missing Airflow.' in response.data
+    assert b'You have 0 of 1 key skills; missing Figma.' in response.data
+
+    data = client.post('/user/api/calculate_match', json={'job_id': 1}).get_json()
+    assert data['score'] > 50 and 'Airflow' in data['reason']
+
+
+def test_explanation_uses_ai(client, monkeypatch):
+    monkeypatch.setattr(ai_utils, '_call_gemini',
+                        lambda prompt, **kwargs: {'reason': 'Strong data background.'})
+    data = client.post('/user/api/calculate_match', json={'job_id': 1, 'explain': True}).get_json()
+    assert data['reason'] == 'Strong data background.' and data['score'] > 50
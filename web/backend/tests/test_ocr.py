@@ -0,0 +1,65 @@
+import time
+import pytest
+from backend.utils import file_utils, ocr
+
+
+def fake_ocr_page(pdf_path, page_number, dpi, max_width, deadline):
+    # Runs in the pool process; page 3 takes longer than the budget
+    if page_number == 3:
+        time.sleep(3)
+    return f"Scanned page {page_number} text with enough characters to count as a resume"
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    monkeypatch.setattr(ocr, 'available', lambda: True)
+    monkeypatch.setattr(ocr, '_ocr_page', fake_ocr_page)
+    # Start the pool processes up front so their startup is not timed
+    warm = [ocr._get_pool().submit(fake_ocr_page, "", 1, 0, 0, 0) for _ in range(ocr.OCR_WORKERS)]
+    for future in warm:
+        future.result()
+
+
+def test_pages_run_in_parallel_within_budget(fake_ocr):
+    result = ocr.ocr_pdf("scan.pdf", page_count=4, max_pages=3, timeout=1.5)
+    assert result['pages'] == 2
+    assert result['truncated'] and not result['complete']
+    assert result['text'].startswith("Scanned page 1 text")
+    assert "Scanned page 2" in result['text']
+    assert result['seconds'] < 3
+
+
+def test_scanned_pdf_falls_back_to_ocr(fake_ocr):
+    parsed = {'text': "\f", 'page_count': 1, 'pages': [], 'truncated': False}
+    text = file_utils.resume_text_from(parsed, "scan.pdf")
+    assert text.startswith("Scanned page 1 text")
+    assert parsed['ocr']['pages'] == 1
+
+
+def test_scanned_pdf_without_ocr_keeps_error_message(monkeypatch):
+    monkeypatch.setattr(ocr, 'available', lambda: False)
+    parsed = {'text': "", 'page_count': 1, 'pages': [], 'truncated': False}
+    assert file_utils.resume_text_from(parsed, "scan.pdf") == file_utils.SCANNED_PDF_MESSAGE
+
+
+def test_page_tools_are_bounded_by_the_deadline(monkeypatch):
+    timeouts = []
+
+    class FakeTesseract:
+        @staticmethod
+        def image_to_string(image, timeout=0):
+            timeouts.append(timeout)
+            return "text"
+
+    def fake_convert(pdf_path, timeout=0, **kwargs):
+        timeouts.append(timeout)
+        return ["image"]
+
+    monkeypatch.setattr(ocr, 'convert_from_path', fake_convert)
+    monkeypatch.setattr(ocr, 'pytesseract', FakeTesseract)
+    assert ocr._ocr_page("scan.pdf", 1, 200, 1700, time.time() + 5) == "text"
+    assert all(0 < t <= 5 for t in timeouts) and len(timeouts) == 2
+
+    with pytest.raises(TimeoutError):
+        ocr._ocr_page("scan.pdf", 1, 200, 1700, time.time() - 1)
+    assert len(timeouts) == 2
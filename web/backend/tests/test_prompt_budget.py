@@ -0,0 +1,54 @@
+from backend.utils import prompt_budget
+from backend.utils.prompt_budget import Section, estimate_tokens, fit, trim
+
+
+def test_short_sections_are_untouched():
+    parts = fit('test_untouched', [Section('resume', "Python developer", budget=100)])
+    assert parts['resume'] == "Python developer"
+    assert prompt_budget.get_stats()['test_untouched']['trimmed'] == 0
+
+
+def test_head_and_tail_trimming():
+    text = "\n".join(f"line {i} " + "x" * 40 for i in range(100))
+    head = trim(text, 100, keep='head')
+    tail = trim(text, 100, keep='tail')
+    assert estimate_tokens(head) <= 100 and head.startswith("line 0 ")
+    assert estimate_tokens(tail) <= 100 and tail.rstrip().endswith("line 99 " + "x" * 40)
+
+
+def test_transcript_keeps_every_turn():
+    turns = []
+    for i in range(30):
+        turns += [f"AI: Question {i}?", f"User: " + "long answer " * 60]
+    text = trim("\n".join(turns), 2000, keep='lines')
+    assert estimate_tokens(text) <= 2000
+    assert all(f"AI: Question {i}?" in text for i in range(30))
+
+
+def test_lowest_priority_is_trimmed_first():
+    parts = fit('test_priority', [
+        Section('message', "m " * 200, priority=2),
+        Section('history', "\n".join(f"turn {i} " * 20 for i in range(50)), priority=0, keep='tail'),
+    ], max_tokens=300)
+    assert parts['message'] == "m " * 200
+    assert estimate_tokens(parts['message']) + estimate_tokens(parts['history']) <= 300
+    assert "turn 49" in parts['history']
+
+    stats = prompt_budget.get_stats()['test_priority']
+    assert stats['trimmed'] == 1
+    assert stats['sections'].keys() == {'history'}
+
+
+def test_ats_and_tailoring_see_the_extracted_resume(monkeypatch):
+    from backend.utils import ai_utils
+    prompts = []
+    monkeypatch.setattr(ai_utils, '_call_gemini', lambda prompt, **kwargs: prompts.append(prompt) or {})
+    resume = "EXPERIENCE\nEngineer, Acme\n- Cut build times by 40%\n" + "- more bullets\n" * 2000
+    layout = {'pages': [{'columns': 2, 'text_boxes': 9, 'lines': 40, 'images': 1, 'figures': 0}],
+              'truncated': False, 'ocr': None}
+
+    ai_utils.simulate_ats_parsing(resume, layout)
+    ai_utils.tailor_resume_to_job(resume, "Platform engineer")
+    assert all("- Cut build times by 40%" in p for p in prompts)
+    assert "Page 1: 2 column(s), 9 text boxes" in prompts[0]
+    assert all(estimate_tokens(p) < 4500 for p in prompts)
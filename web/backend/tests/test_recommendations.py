@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+from backend import create_app, db, socketio
+from backend.models import JobApplication, JobPosting, JobRecommendation, ResumeDocument, User, UserData
+from backend.utils import embeddings, recommendations, vector_backends, vector_utils
+from backend.utils.vector_backends import NumpyBackend
+
+WORDS = ['python', 'java', 'design', 'sql']
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    computed = []
+
+    def compute(texts):
+        computed.extend(texts)
+        return np.array([[float(w in t.lower()) for w in WORDS] + [0.1] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(vector_backends, '_backend', NumpyBackend(str(tmp_path / 'index')))
+    monkeypatch.setenv('EMBEDDING_CACHE', 'false')
+    monkeypatch.setattr(embeddings, '_compute', compute)
+    monkeypatch.setattr(recommendations, 'TOP_K', 2)
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        app.computed = computed
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _user(name, resume_text):
+    user = User(username=name, email=f'{name}@test.com', role='user')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.add(ResumeDocument(sha256=name * 64, text=resume_text, page_count=1, parser_version=1))
+    db.session.commit()
+    user_data = UserData(user_id=user.id, document_sha256=name * 64, analysis_result={'actual_skills': []})
+    db.session.add(user_data)
+    db.session.commit()
+    return user, user_data
+
+
+def _job(title, description):
+    job = JobPosting(title=title, description=description)
+    db.session.add(job)
+    db.session.commit()
+    vector_utils.add_job_to_vector_db(job.id, title, description)
+    return job
+
+
+def _stored(user):
+    return [job.title for job in recommendations.get_recommendations(user.id, limit=10)]
+
+
+def test_resume_is_embedded_once_and_top_jobs_stored(app):
+    for title, description in (("Backend", "Python services"), ("Android", "Java apps"),
+                               ("Data", "Python and SQL"), ("UX", "Design")):
+        _job(title, description)
+    user, user_data = _user('a', "Python and SQL developer")
+
+    assert len(recommendations.refresh_user(user_data)) == 2
+    assert _stored(user) == ["Data", "Backend"]
+    assert user_data.embedding is not None
+
+    computed = len(app.computed)
+    recommendations.refresh_user(user_data)
+    assert len(app.computed) == computed
+
+
+def test_indexed_jobs_update_stored_lists(app):
+    _job("Backend", "Python services")
+    _job("UX", "Design")
+    user, user_data = _user('a', "Python and SQL developer")
+    other, other_data = _user('b', "Product design")
+    recommendations.refresh_user(user_data)
+    recommendations.refresh_user(other_data)
+    assert _stored(user) == ["Backend", "UX"]
+
+    # A better match replaces the weakest entry; a worse one is not listed
+    data_job = _job("Data", "Python and SQL")
+    assert _stored(user) == ["Data", "Backend"]
+    _job("Android", "Java apps")
+    assert _stored(user) == ["Data", "Backend"]
+    assert _stored(other)[0] == "UX"
+
+    # Edited postings are rescored; deleted ones disappear with the posting
+    vector_utils.add_job_to_vector_db(data_job.id, "Data", "Java reporting")
+    assert _stored(user) == ["Backend", "Data"]
+    db.session.delete(data_job)
+    db.session.commit()
+    assert _stored(user) == ["Backend"]
+    assert JobRecommendation.query.filter_by(job_id=data_job.id).count() == 0
+
+
+def test_embeddings_of_another_size_are_skipped(app):
+    user, user_data = _user('a', "Python")
+    user_data.embedding = np.ones(3, dtype=np.float32).tobytes()
+    db.session.commit()
+    _job("Backend", "Python services")
+    assert _stored(user) == []
+
+
+def test_applied_jobs_are_not_recommended(app):
+    backend_job = _job("Backend", "Python services")
+    _job("UX", "Design")
+    user, user_data = _user('a', "Python and SQL developer")
+    db.session.add(JobApplication(user_id=user.id, job_id=backend_job.id))
+    db.session.commit()
+
+    recommendations.refresh_user(user_data)
+    assert _stored(user) == ["UX"]
+    vector_utils.add_job_to_vector_db(backend_job.id, "Backend", "Python and SQL services")
+    assert _stored(user) == ["UX"]
+    data_job = _job("Data", "Python and SQL")
+    assert _stored(user) == ["Data", "UX"]
+
+    # Applying after the list was stored hides the job too
+    db.session.add(JobApplication(user_id=user.id, job_id=data_job.id))
+    db.session.commit()
+    assert _stored(user) == ["UX"]
+
+
+def test_jobs_indexed_during_a_request_update_lists_in_the_background(app, monkeypatch):
+    _job("UX", "Design")
+    user, user_data = _user('a', "Python and SQL developer")
+    recommendations.refresh_user(user_data)
+    tasks = []
+    monkeypatch.setattr(socketio, 'start_background_task', lambda fn, *args: tasks.append((fn, args)))
+
+    with app.test_request_context():
+        _job("Backend", "Python services")
+    assert _stored(user) == ["UX"] and len(tasks) == 1
+
+    fn, args = tasks[0]
+    fn(*args)
+    assert _stored(user) == ["Backend", "UX"]
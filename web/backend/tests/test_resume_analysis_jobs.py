@@ -0,0 +1,170 @@
+import io
+from datetime import datetime, timedelta
+import pytest
+from backend import create_app, db, socketio
+from backend.models import ResumeAnalysisJob, User, UserData
+from backend.services import resume_analysis_service as service_module
+from backend.services.resume_analysis_service import ResumeAnalysisService, resume_analysis_service
+from backend.utils import ai_utils, file_utils, skill_registry
+
+RESUME_TEXT = "Jane Doe\nSKILLS\nPython, SQL, Docker, Kubernetes, Terraform, AWS, Linux\f"
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = create_app('testing')
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    analyzed = []
+
+    def fake_analyze(resume_text, job_description):
+        analyzed.append(resume_text)
+        return {'resume_score': 70, 'actual_skills': ['Python', 'SQL']}
+
+    monkeypatch.setattr(file_utils, 'parse_pdf', lambda path, max_pages=None: {
+        'text': RESUME_TEXT, 'page_count': 1, 'truncated': False, 'pages': []})
+    monkeypatch.setattr(ai_utils, 'analyze_resume', fake_analyze)
+    # Run jobs inline instead of on a background thread
+    monkeypatch.setattr(resume_analysis_service, '_start', lambda job_id: resume_analysis_service._run(app, job_id))
+    monkeypatch.setattr(resume_analysis_service, '_recovered', False)
+    skill_registry.reset()
+    app.analyzed = analyzed
+    with app.app_context():
+        db.create_all()
+        user = User(username='u', email='u@test.com', role='user', is_verified=True)
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_upload_returns_job_and_streams_progress(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'u@test.com', 'password': 'password'})
+    sock = socketio.test_client(app, flask_test_client=client)
+    sock.get_received()
+
+    response = client.post('/user/resume_analysis', data={'resume': (io.BytesIO(b"%PDF-1.4"), 'cv.pdf')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    events = sock.get_received()
+    stages = [e['args'][0]['stage'] for e in events if e['name'] == 'resume_analysis_progress']
+    assert stages == service_module.STAGES
+    done = [e['args'][0] for e in events if e['name'] == 'resume_analysis_done']
+    assert done[0]['redirect_url'] == f"/user/resume_analysis_result/{UserData.query.one().id}"
+
+    status = client.get(f'/user/api/resume_analysis/{job_id}').get_json()
+    assert status['status'] == 'done' and status['progress'] == 100
+
+
+def test_interrupted_job_resumes_at_its_stage(app):
+    user_data = UserData(user_id=1, resume_path="1_cv.pdf", analysis_result={'resume_score': 70})
+    db.session.add(user_data)
+    db.session.commit()
+    with open(f"{app.config['UPLOAD_FOLDER']}/1_cv.pdf", 'wb') as f:
+        f.write(b"%PDF-1.4")
+    job = ResumeAnalysisJob(id='a' * 32, user_id=1, resume_path="1_cv.pdf", status='running',
+                            stage='index', user_data_id=user_data.id)
+    db.session.add(job)
+    db.session.commit()
+
+    with app.test_request_context():
+        resume_analysis_service.recover()
+    db.session.expire_all()  # the job ran in its own app context and session
+    job = ResumeAnalysisJob.query.get('a' * 32)
+    assert job.status == 'done'
+    assert app.analyzed == []  # analysis was not repeated
+    assert UserData.query.count() == 1
+
+
+def test_recover_skips_jobs_with_a_live_lease(app):
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=service_module.LEASE_SECONDS + 1)
+    for job_id, heartbeat in (('a' * 32, now), ('b' * 32, stale)):
+        db.session.add(ResumeAnalysisJob(id=job_id, user_id=1, resume_path="1_missing.pdf", status='running',
+                                         owner='other-worker', heartbeat=heartbeat))
+    db.session.commit()
+
+    with app.test_request_context():
+        resume_analysis_service.recover()
+    db.session.expire_all()
+    live, crashed = ResumeAnalysisJob.query.get('a' * 32), ResumeAnalysisJob.query.get('b' * 32)
+    assert live.status == 'running' and live.owner == 'other-worker' and live.attempts == 0
+    assert crashed.status == 'failed' and crashed.owner == resume_analysis_service.worker_id
+
+
+def test_only_one_worker_claims_an_expired_job(app):
+    db.session.add(ResumeAnalysisJob(id='a' * 32, user_id=1, resume_path="1_cv.pdf", status='running'))
+    db.session.commit()
+    first, second = ResumeAnalysisService(), ResumeAnalysisService()
+    assert first._claim('a' * 32)
+    assert not second._claim('a' * 32)
+    assert first._claim('a' * 32)  # renewing its own lease
+
+
+def test_missing_file_fails_without_retry(app):
+    with app.test_request_context():
+        job = resume_analysis_service.submit(1, "1_missing.pdf", "")
+    db.session.expire_all()
+    job = ResumeAnalysisJob.query.get(job.id)
+    assert job.status == 'failed' and job.attempts == 1
+    assert job.error == "The uploaded resume could not be found."
+
+
+def test_unreadable_file_fails_without_analysis(app, monkeypatch):
+    def broken(path, max_pages=None):
+        raise ValueError("not a PDF")
+    monkeypatch.setattr(file_utils, 'parse_pdf', broken)
+    with open(f"{app.config['UPLOAD_FOLDER']}/1_cv.pdf", 'wb') as f:
+        f.write(b"garbage")
+    with app.test_request_context():
+        job = resume_analysis_service.submit(1, "1_cv.pdf", "")
+    db.session.expire_all()
+    job = ResumeAnalysisJob.query.get(job.id)
+    assert job.status == 'failed' and job.attempts == 1
+    assert job.error.startswith("Could not read the resume")
+    assert app.analyzed == [] and UserData.query.count() == 0
+
+
+def test_identical_upload_reuses_analysis(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'u@test.com', 'password': 'password'})
+    for job_description in ("Data engineer", "  Data   engineer ", "ML engineer"):
+        response = client.post('/user/resume_analysis',
+                               data={'resume': (io.BytesIO(b"%PDF-1.4 same"), 'cv.pdf'),
+                                     'job_description': job_description},
+                               content_type='multipart/form-data')
+        assert response.status_code == 202
+
+    db.session.expire_all()
+    rows = UserData.query.order_by(UserData.id).all()
+    assert len(app.analyzed) == 2  # the whitespace-only JD change reused the first analysis
+    assert rows[1].reused_from_id == rows[0].id and rows[2].reused_from_id is None
+    assert rows[1].analysis_result == rows[0].analysis_result
+    assert resume_analysis_service.get_dedup_stats()['hits'] == 1
+
+
+def test_failed_analysis_is_not_reused(app, monkeypatch):
+    results = [{'analysis_error': True, 'resume_score': 0, 'actual_skills': []},
+               {'resume_score': 70, 'actual_skills': ['Python']}]
+
+    def flaky_analyze(resume_text, job_description):
+        app.analyzed.append(resume_text)
+        return results.pop(0)
+    monkeypatch.setattr(ai_utils, 'analyze_resume', flaky_analyze)
+
+    client = app.test_client()
+    client.post('/auth/login', data={'email': 'u@test.com', 'password': 'password'})
+    for _ in range(3):
+        client.post('/user/resume_analysis', data={'resume': (io.BytesIO(b"%PDF-1.4 same"), 'cv.pdf')},
+                    content_type='multipart/form-data')
+
+    db.session.expire_all()
+    failed, retried, reused = UserData.query.order_by(UserData.id).all()
+    assert len(app.analyzed) == 2
+    assert failed.analysis_key is None and retried.analysis_key is not None
+    assert retried.reused_from_id is None and retried.analysis_result['resume_score'] == 70
+    assert reused.reused_from_id == retried.id
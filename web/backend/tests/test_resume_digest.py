@@ -0,0 +1,54 @@
+from backend.utils.resume_digest import build_digest, render_digest, DIGEST_VERSION
+
+RESUME = """Priya Sharma
+priya.sharma@example.com | +91 98765 43210
+PROFESSIONAL SUMMARY
+Data engineer with 5 years of experience building batch and streaming pipelines.
+WORK EXPERIENCE
+Senior Data Engineer, Flipkart    Mar 2021 - Present
+• Cut pipeline runtime by 60% by moving to Spark structured streaming
+• Mentored 3 junior engineers
+Data Engineer, Infosys
+Jul 2018 – Feb 2021
+• Migrated 120 Hive tables to Delta Lake
+EDUCATION
+B.E. Information Science, RV College of Engineering, 2014 - 2018
+TECHNICAL SKILLS
+Languages: Python, Scala, SQL
+Platforms: Spark, Kafka | Airflow
+"""
+
+
+def test_digest_extracts_structure():
+    digest = build_digest(RESUME)
+    assert digest['version'] == DIGEST_VERSION
+    assert digest['name'] == "Priya Sharma"
+    assert digest['email'] == "priya.sharma@example.com"
+    assert digest['skills'] == ["Python", "Scala", "SQL", "Spark", "Kafka", "Airflow"]
+    assert digest['roles'] == [
+        {'title': "Senior Data Engineer, Flipkart", 'dates': "Mar 2021 - Present"},
+        {'title': "Data Engineer, Infosys", 'dates': "Jul 2018 – Feb 2021"},
+    ]
+    assert any("60%" in m for m in digest['metrics'])
+    assert digest['sections'] == ['education', 'experience', 'skills', 'summary']
+
+
+def test_analysis_skills_take_precedence():
+    digest = build_digest(RESUME, {'actual_skills': ["PySpark", "dbt"], 'name': "N/A",
+                                   'predicted_field': "Data Engineering"})
+    assert digest['skills'] == ["PySpark", "dbt"]
+    assert digest['name'] == "Priya Sharma"
+    assert "Field: Data Engineering" in render_digest(digest)
+
+
+def test_render_respects_budget():
+    digest = build_digest(RESUME * 20)
+    text = render_digest(digest, max_chars=300)
+    assert len(text) <= 300
+    assert text.startswith("Candidate: Priya Sharma")
+
+
+def test_scanned_pdf_sentinel_gives_empty_digest():
+    digest = build_digest("Error: This PDF appears to be a scanned image. Please upload a text-based PDF.")
+    assert digest['skills'] == []
+    assert render_digest(digest) == ""
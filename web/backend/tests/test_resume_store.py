@@ -0,0 +1,122 @@
+import pytest
+from backend import create_app, db
+from backend.models import ResumeDocument, User, UserData
+from backend.utils import file_utils, ocr, resume_store
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = create_app('testing')
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    calls = []
+
+    def fake_parse(path, max_pages=None):
+        calls.append(path)
+        text = "Jane Doe\nSKILLS\nPython, SQL, Docker, Kubernetes, Terraform, AWS, Linux\f"
+        return {'text': text, 'page_count': 1, 'truncated': False,
+                'pages': [{'text': text, 'chars': len(text), 'columns': 1}]}
+
+    monkeypatch.setattr(file_utils, 'parse_pdf', fake_parse)
+    app.extraction_calls = calls
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _upload(app, name, content=b"%PDF-1.4 resume"):
+    path = f"{app.config['UPLOAD_FOLDER']}/{name}"
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+
+def test_same_file_is_extracted_once(app):
+    first = resume_store.get_document(_upload(app, "1_cv.pdf"))
+    second = resume_store.get_document(_upload(app, "2_cv.pdf"))
+    assert first.sha256 == second.sha256
+    assert second.text.startswith("Jane Doe\nSKILLS\nPython, SQL")
+    assert second.layout['pages'][0]['columns'] == 1
+    assert len(app.extraction_calls) == 1
+    assert ResumeDocument.query.count() == 1
+
+
+def test_parser_version_change_reextracts(app, monkeypatch):
+    path = _upload(app, "1_cv.pdf")
+    resume_store.get_document(path)
+    monkeypatch.setattr(resume_store, 'PARSER_VERSION', resume_store.PARSER_VERSION + 1)
+    document = resume_store.get_document(path)
+    assert document.parser_version == resume_store.PARSER_VERSION
+    assert len(app.extraction_calls) == 2
+
+
+def test_failed_or_partial_ocr_is_retried(app, monkeypatch):
+    scan = {'text': "\f", 'page_count': 2, 'truncated': False, 'pages': []}
+    monkeypatch.setattr(file_utils, 'parse_pdf', lambda path, max_pages=None: dict(scan))
+    results = [None,
+               {'text': "Scanned page 1 " * 10, 'pages': 1, 'truncated': True, 'complete': False, 'seconds': 30},
+               {'text': "Scanned pages " * 10, 'pages': 2, 'truncated': False, 'complete': True, 'seconds': 4}]
+    ocr_calls = []
+    monkeypatch.setattr(ocr, 'ocr_pdf', lambda path, page_count: ocr_calls.append(path) or results.pop(0))
+    path = _upload(app, "1_cv.pdf")
+
+    document = resume_store.get_document(path)  # OCR unavailable
+    assert document.text == file_utils.SCANNED_PDF_MESSAGE
+    assert document.parser_version == resume_store.RETRY_VERSION
+    document = resume_store.get_document(path)  # ran out of time after one page
+    assert document.text.startswith("Scanned page 1")
+    assert document.parser_version == resume_store.RETRY_VERSION
+    document = resume_store.get_document(path)
+    assert document.text.startswith("Scanned pages")
+    assert document.parser_version == resume_store.PARSER_VERSION
+    resume_store.get_document(path)
+    assert len(ocr_calls) == 3 and ResumeDocument.query.count() == 1
+
+
+def test_old_rows_are_linked_on_first_read(app):
+    _upload(app, "1_cv.pdf")
+    user = User(username='u', email='u@test.com', role='user')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    user_data = UserData(user_id=user.id, resume_path="1_cv.pdf", analysis_result={})
+    db.session.add(user_data)
+    db.session.commit()
+
+    assert resume_store.get_resume_text(user_data).startswith("Jane Doe")
+    assert user_data.document_sha256 == ResumeDocument.query.one().sha256
+    resume_store.get_resume_text(user_data)
+    assert len(app.extraction_calls) == 1
+
+
+def test_parse_pdf_counts_all_pages_but_lays_out_max_pages(tmp_path):
+    # Three pages sharing one content stream
+    content = b"BT /F1 11 Tf 50 780 Td (Page text for a resume parsing test) Tj ET"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 3 >>",
+    ] + [
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 6 0 R "
+        b"/Resources << /Font << /F1 7 0 R >> >> >>"
+    ] * 3 + [
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    data, offsets = b"%PDF-1.4\n", []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path = tmp_path / "three_pages.pdf"
+    path.write_bytes(data)
+
+    parsed = file_utils.parse_pdf(str(path), max_pages=2)
+    assert parsed['page_count'] == 3
+    assert len(parsed['pages']) == 2 and parsed['truncated']
+    assert parsed['pages'][0]['text'].startswith("Page text for a resume parsing test")
+    assert parsed['pages'][0]['columns'] == 1
+    assert file_utils.get_pdf_page_count(str(path)) == 3
@@ -0,0 +1,41 @@
+from backend.utils.skill_extractor import SkillMatcher, get_matcher, load_taxonomy
+
+TAXONOMY = {
+    "JavaScript": ["js", "javascript"],
+    "Java": [],
+    "React": ["react.js", "reactjs"],
+    "React Native": [],
+    "Go": ["golang"],
+    "C": [],
+    "C++": ["cpp"],
+    "Kubernetes": ["k8s"],
+    "Machine Learning": ["ml"],
+}
+
+
+def test_aliases_map_to_canonical_names():
+    matcher = SkillMatcher(TAXONOMY, case_sensitive=["Go", "C", "React"])
+    text = "Built ML services in golang and JS on K8S.\nUsed Machine\n  Learning daily."
+    assert matcher.extract(text) == ["Machine Learning", "Go", "JavaScript", "Kubernetes"]
+    assert matcher.normalize("  Reactjs ") == "React"
+    assert matcher.normalize("Haskell") is None
+
+
+def test_word_boundaries_and_longest_match():
+    matcher = SkillMatcher(TAXONOMY, case_sensitive=["Go", "C", "React"])
+    assert matcher.extract("JavaScript, C++ and React Native") == ["JavaScript", "C++", "React Native"]
+    assert matcher.extract("Java; C; React.js") == ["Java", "C", "React"]
+
+
+def test_case_sensitive_names_skip_plain_words():
+    matcher = SkillMatcher(TAXONOMY, case_sensitive=["Go", "C", "React"])
+    assert matcher.extract("Ready to go and react to feedback, grade c") == []
+    assert matcher.extract("Go, React") == ["Go", "React"]
+
+
+def test_config_taxonomy_compiles():
+    taxonomy, case_sensitive = load_taxonomy()
+    assert "Python" in taxonomy and "Go" in case_sensitive
+    matcher = get_matcher()
+    assert matcher.extract("Deployed Flask apps with Docker on AWS using GitHub Actions") == \
+        ["Flask", "Docker", "AWS", "GitHub Actions"]
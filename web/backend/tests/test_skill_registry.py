@@ -0,0 +1,83 @@
+import pytest
+from backend import create_app, db
+from backend.models import JobPosting, Skill, SkillAlias, User, UserData
+from backend.utils import skill_registry
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    skill_registry.reset()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    skill_registry.reset()
+
+
+def _user():
+    user = User(username='u', email='u@test.com', role='user')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_aliases_share_one_id(app):
+    registry = skill_registry.get_registry()
+    js = registry.skill_id("JavaScript")
+    assert registry.skill_id("JS") == js
+    assert registry.skill_id("  javascript ") == js
+    assert registry.skill_id("ML") == registry.skill_id("Machine Learning")
+    assert registry.name(js) == "JavaScript"
+    assert registry.skill_ids(["js", "Python", "JavaScript"]) == [js, registry.skill_id("Python")]
+
+
+def test_unknown_skills_are_registered_once(app):
+    registry = skill_registry.get_registry()
+    count = Skill.query.count()
+    assert registry.skill_id("Stakeholder Management", create=False) is None
+    skill_id = registry.skill_id("Stakeholder  Management")
+    assert registry.skill_id("stakeholder management") == skill_id
+    assert Skill.query.count() == count + 1
+    assert registry.name(skill_id) == "Stakeholder Management"
+
+    # Another worker loading later sees it
+    skill_registry.reset()
+    assert skill_registry.get_registry().skill_id("STAKEHOLDER MANAGEMENT", create=False) == skill_id
+    assert Skill.query.count() == count + 1
+
+
+def test_seeding_is_idempotent(app):
+    skill_registry.get_registry()
+    skills, aliases = Skill.query.count(), SkillAlias.query.count()
+    skill_registry.reset()
+    skill_registry.get_registry()
+    assert (Skill.query.count(), SkillAlias.query.count()) == (skills, aliases)
+
+
+def test_counts_merge_spellings(app):
+    user = _user()
+    for skills in (["JS", "Python"], ["JavaScript"], ["javascript", "ML"]):
+        db.session.add(UserData(user_id=user.id, analysis_result={'actual_skills': skills}))
+    db.session.commit()
+
+    registry = skill_registry.get_registry()
+    counts = registry.count(skill_registry.user_skill_ids(ud) for ud in UserData.query.all())
+    assert counts[0] == ("JavaScript", 3)
+    assert dict(counts) == {"JavaScript": 3, "Python": 1, "Machine Learning": 1}
+
+
+def test_backfill_fills_rows_stored_before(app):
+    user = _user()
+    db.session.add(UserData(user_id=user.id, analysis_result={'actual_skills': ["k8s", "Docker"]}))
+    db.session.add(JobPosting(title="Platform Engineer", description="Kubernetes and Terraform on AWS",
+                              created_by=user.id))
+    db.session.commit()
+
+    assert skill_registry.backfill() == 2
+    registry = skill_registry.get_registry()
+    assert registry.names(UserData.query.one().skill_ids) == ["Kubernetes", "Docker"]
+    assert registry.names(JobPosting.query.one().skill_ids) == ["Kubernetes", "Terraform", "AWS"]
+    assert skill_registry.backfill() == 0
@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pytest
+from backend.utils import embeddings, vector_backends, vector_utils
+from backend.utils.vector_backends import NumpyBackend, NumpyIndex
+
+
+def _vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_top_k_by_cosine(tmp_path):
+    index = NumpyIndex(str(tmp_path))
+    index.upsert(['a', 'b', 'c'], np.stack([_vec(1, 0, 0), _vec(0, 1, 0), _vec(1, 1, 0)]),
+                 [{'n': 1}, {'n': 2}, {'n': 3}])
+    hits = index.query(_vec(2, 0.1, 0), 2)
+    assert [h[0] for h in hits] == ['a', 'c'] and hits[0][2] == {'n': 1}
+    assert hits[0][1] == pytest.approx(0.9988, abs=1e-3)
+    assert len(index.query(_vec(1, 0, 0), 10)) == 3
+
+
+def test_updates_and_deletes_tombstone_rows(tmp_path):
+    index = NumpyIndex(str(tmp_path))
+    index.upsert(['a', 'b'], np.stack([_vec(1, 0), _vec(0, 1)]), [{'v': 1}, {'v': 1}])
+    index.upsert(['a'], np.stack([_vec(0, 1)]), [{'v': 2}])
+    assert index.count() == 2
+    assert {h[0]: h[2] for h in index.query(_vec(0, 1), 5)} == {'a': {'v': 2}, 'b': {'v': 1}}
+
+    index.delete(['b', 'missing'])
+    assert [h[0] for h in index.query(_vec(0, 1), 5)] == ['a']
+
+
+def test_other_workers_see_writes(tmp_path):
+    writer, reader = NumpyIndex(str(tmp_path)), NumpyIndex(str(tmp_path))
+    writer.upsert(['a'], np.stack([_vec(1, 0)]), [{}])
+    assert [h[0] for h in reader.query(_vec(1, 0), 1)] == ['a']
+    writer.upsert(['b'], np.stack([_vec(0, 1)]), [{}])
+    assert [h[0] for h in reader.query(_vec(0, 1), 1)] == ['b']
+
+
+def test_growth_and_compaction_rewrite_the_file(tmp_path, monkeypatch):
+    index = NumpyIndex(str(tmp_path))
+    rng = np.random.default_rng(0)
+    ids = [str(i) for i in range(1500)]
+    index.upsert(ids[:600], rng.normal(size=(600, 8)), [{}] * 600)  # room for 1200
+    first = index._file
+    index.upsert(ids[600:], rng.normal(size=(900, 8)), [{}] * 900)
+    assert index._file != first and index.count() == 1500
+    assert [f for f in os.listdir(tmp_path) if f.startswith('vectors-')] == [index._file]
+
+    # A few updates are appended; once tombstones pile up the file is compacted
+    index.upsert(ids[:10], rng.normal(size=(10, 8)), [{}] * 10)
+    assert len(index._ids) == 1510
+    vectors = rng.normal(size=(600, 8))
+    index.upsert(ids[:600], vectors, [{'v': 2}] * 600)
+    assert len(index._ids) == 1500 and index.count() == 1500
+    assert index.query(vectors[5], 1)[0][0] == '5'
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    index = NumpyIndex(str(tmp_path))
+    index.upsert(['a'], np.stack([_vec(1, 0)]), [{}])
+    with pytest.raises(ValueError):
+        index.upsert(['b'], np.stack([_vec(1, 0, 0)]), [{}])
+
+
+def test_search_through_numpy_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_backends, '_backend', NumpyBackend(str(tmp_path / 'index')))
+    monkeypatch.setenv('EMBEDDING_CACHE', 'false')
+    words = ['python', 'java', 'design']
+    monkeypatch.setattr(embeddings, '_compute', lambda texts: np.array(
+        [[float(w in t.lower()) for w in words] for t in texts], dtype=np.float32))
+
+    vector_utils.upsert_jobs([(1, "Backend", "Python APIs", {'location': "Remote"}),
+                              (2, "Android", "Java apps", {'location': "Pune"}),
+                              (3, "UX", "Design", {'location': None})])
+    assert vector_utils.search_jobs_by_resume("Five years of Java", n_results=1) == [2]
+    assert vector_utils.search_jobs_by_resume("Five years of Java", n_results=1, exclude_ids=[2]) != [2]
+    assert vector_utils.search_jobs_by_resume("Java", n_results=3, where={'location': "Remote"}) == [1]
+    with pytest.raises(ValueError):
+        vector_utils.search_jobs("Java", where={'salary': 1})
+    assert vector_utils.remove_job_from_vector_db(2)
+    assert 2 not in vector_utils.search_jobs_by_resume("Five years of Java", n_results=3)
+
+
+def test_filters_are_applied_inside_the_index(tmp_path):
+    index = NumpyIndex(str(tmp_path))
+    index.upsert(['a', 'b', 'c', 'd'], np.stack([_vec(1, 0), _vec(1, 0.1), _vec(1, 0.2), _vec(0, 1)]),
+                 [{'org': 1, 'ai': True}, {'org': 2}, {'org': 1}, {'org': 1, 'ai': True}])
+    # The nearest rows fail the filters, yet n_results valid rows come back
+    assert [h[0] for h in index.query(_vec(1, 0), 2, where={'org': 1}, exclude_ids=['a'])] == ['c', 'd']
+    assert [h[0] for h in index.query(_vec(1, 0), 5, where={'org': [2, 3]})] == ['b']
+    assert [h[0] for h in index.query(_vec(1, 0), 5, where={'org': 1, 'ai': True})] == ['a', 'd']
+    index.upsert(['d'], np.stack([_vec(0, 1)]), [{'org': 2}])
+    assert [h[0] for h in index.query(_vec(1, 0), 5, where={'org': 2})] == ['b', 'd']
+
+
+def test_chroma_where_clauses():
+    assert vector_backends._chroma_where({'org': 1}) == {'org': 1}
+    assert vector_backends._chroma_where({'org': [2, 1], 'ai': True}) == {
+        '$and': [{'org': {'$in': [1, 2]}}, {'ai': True}]}
@@ -0,0 +1,179 @@
+import numpy as np
+import pytest
+from backend import create_app, db
+from backend.models import JobPosting, ResumeDocument, User, UserData
+from backend.utils import embeddings, vector_utils
+
+
+class FakeCollection:
+    def __init__(self):
+        self.calls = []
+        self.docs = {}
+        self.metadatas = {}
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        assert len(embeddings) == len(ids)
+        self.calls.append(list(ids))
+        self.docs.update(zip(ids, documents))
+        self.metadatas.update(zip(ids, metadatas))
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+
+
+class FakeBackend:
+    name = 'fake'
+
+    def __init__(self):
+        self.collections = {'job_postings': FakeCollection(), 'resumes': FakeCollection()}
+
+    def upsert(self, collection, ids, embeddings, metadatas, documents):
+        self.collections[collection].upsert(ids, embeddings, metadatas, documents)
+
+    def delete(self, collection, ids):
+        self.collections[collection].delete(ids)
+
+
+@pytest.fixture(autouse=True)
+def fake_model(tmp_path, monkeypatch):
+    embedded = []
+
+    def compute(texts):
+        embedded.extend(texts)
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setenv('EMBEDDING_CACHE_DIR', str(tmp_path / 'embeddings'))
+    monkeypatch.setattr(embeddings, '_compute', compute)
+    for name, value in (('_index', {}), ('_segments', []), ('_loaded', set())):
+        monkeypatch.setattr(embeddings, name, value)
+    return embedded
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(vector_utils, 'get_backend', lambda: backend)
+    return backend.collections['job_postings'], backend.collections['resumes']
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_upserts_are_batched(collections):
+    jobs, _ = collections
+    stats = vector_utils.upsert_jobs(((i, f"Job {i}", "Desc") for i in range(1, 11)), batch_size=4)
+    assert [len(c) for c in jobs.calls] == [4, 4, 2]
+    assert stats['count'] == 10 and stats['batches'] == 3 and stats['failed'] == 0
+    assert jobs.docs['7'] == "Job 7. Desc"
+
+
+def test_single_document_helpers_upsert(collections):
+    jobs, resumes = collections
+    assert vector_utils.add_job_to_vector_db(3, "Dev", "Python")
+    assert vector_utils.add_resume_to_vector_db(5, "resume text", ["Python"])
+    assert vector_utils.add_resume_to_vector_db(5, "new resume text", ["Python"])
+    assert jobs.calls == [['3']] and resumes.calls == [['5:0'], ['5:0']]
+    assert resumes.docs['5:0'] == "Skills: Python. Resume Content: new resume text"
+
+
+def test_failed_batches_are_counted(monkeypatch):
+    class Broken(FakeBackend):
+        def upsert(self, *args):
+            raise RuntimeError("locked")
+    backend = Broken()
+    monkeypatch.setattr(vector_utils, 'get_backend', lambda: backend)
+    stats = vector_utils.upsert_jobs([(1, "a", "b"), (2, "c", "d")], batch_size=1)
+    assert stats['count'] == 0 and stats['failed'] == 2
+    assert not vector_utils.add_job_to_vector_db(1, "a", "b")
+
+
+def test_reindex_streams_jobs_and_latest_resumes(app, collections):
+    jobs, resumes = collections
+    user = User(username='u', email='u@test.com', role='user')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    for i in range(5):
+        db.session.add(JobPosting(title=f"Job {i}", description="Desc", created_by=user.id))
+    db.session.add(ResumeDocument(sha256='a' * 64, text="old resume", page_count=1, parser_version=1))
+    db.session.add(ResumeDocument(sha256='b' * 64, text="new resume", page_count=1, parser_version=1))
+    db.session.add(UserData(user_id=user.id, document_sha256='a' * 64, analysis_result={'actual_skills': ['SQL']}))
+    db.session.add(UserData(user_id=user.id, document_sha256='b' * 64, analysis_result={'actual_skills': ['Go']}))
+    db.session.commit()
+
+    assert vector_utils.reindex_jobs(batch_size=2)['count'] == 5
+    assert [len(c) for c in jobs.calls] == [2, 2, 1]
+    assert jobs.metadatas['1'] == {'job_id': 1, 'title': "Job 0", 'is_ai_round_enabled': False}
+    assert vector_utils.reindex_resumes()['count'] == 1
+    assert resumes.docs[f"{user.id}:0"] == "Skills: Go. Resume Content: new resume"
+
+
+def test_unchanged_documents_are_skipped(app, collections, fake_model):
+    jobs, _ = collections
+    vector_utils.add_job_to_vector_db(1, "Dev", "Python")
+    vector_utils.add_job_to_vector_db(1, "Dev", "Python")
+    assert jobs.calls == [['1']]
+
+    vector_utils.add_job_to_vector_db(1, "Dev", "Python and Go")
+    assert jobs.calls == [['1'], ['1']]
+    stats = vector_utils.upsert_jobs([(1, "Dev", "Python and Go"), (2, "QA", "Testing")])
+    assert stats['count'] == 1 and stats['skipped'] == 1
+
+    # Forced re-index writes again but embeds nothing new
+    embedded = len(fake_model)
+    assert vector_utils.upsert_jobs([(1, "Dev", "Python and Go")], force=True)['count'] == 1
+    assert len(fake_model) == embedded
+
+
+RESUME = "\n".join(
+    ["Jane Doe", "jane@example.com", "Summary", "Backend engineer. " * 30,
+     "Experience"] + [f"Built service {i} handling payments at scale with Python and Kafka." for i in range(40)] +
+    ["Education", "B.Tech Computer Science", "Certifications", "CKA - Kubernetes administrator"])
+
+
+def test_long_resumes_are_indexed_in_chunks(collections):
+    _, resumes = collections
+    assert vector_utils.add_resume_to_vector_db(7, RESUME, ["Python"])
+    chunks = sorted(resumes.docs, key=lambda doc_id: int(doc_id.split(':')[1]))
+    assert chunks[0] == '7:0' and 3 <= len(chunks) <= vector_utils.MAX_RESUME_CHUNKS
+    assert all(len(resumes.docs[c]) <= vector_utils.CHUNK_CHARS for c in chunks[1:])
+    # Text past the first page is searchable now
+    assert any("Kubernetes" in resumes.docs[c] for c in chunks)
+    assert resumes.metadatas['7:1'] == {'user_id': 7, 'chunk': 1}
+
+    # A shorter resume leaves no stale chunks behind
+    vector_utils.add_resume_to_vector_db(7, "Short resume", ["Python"])
+    assert list(resumes.docs) == ['7:0']
+
+
+def test_chunks_are_capped(collections, monkeypatch):
+    _, resumes = collections
+    monkeypatch.setattr(vector_utils, 'MAX_RESUME_CHUNKS', 2)
+    vector_utils.add_resume_to_vector_db(7, RESUME, [])
+    assert sorted(resumes.docs) == ['7:0', '7:1']
+
+
+def test_users_are_ranked_by_their_best_chunks():
+    hits = [('1:3', 0.9, {'user_id': 1}), ('2:0', 0.8, {'user_id': 2}), ('2:1', 0.75, {'user_id': 2}),
+            ('1:0', 0.1, {'user_id': 1}), ('3:0', 0.5, {'user_id': 3})]
+    assert vector_utils.aggregate_by_user(hits) == [1, 2, 3]
+    assert vector_utils.aggregate_by_user(hits, top_m=2) == [2, 1, 3]
+
+
+def test_resume_search_returns_distinct_users(monkeypatch):
+    calls = []
+
+    def search(kind, text, n):
+        calls.append(n)
+        return [(f"1:{i}", 0.9 - i / 100, {'user_id': 1}) for i in range(8)] + [('2:0', 0.5, {'user_id': 2})]
+    monkeypatch.setattr(vector_utils, '_search', search)
+    assert vector_utils.search_resumes_by_job_description("Python", n_results=2) == [1, 2]
+    assert calls == [2 * vector_utils.MAX_RESUME_CHUNKS]
@@ -8,7 +8,8 @@ from werkzeug.utils import secure_filename
 from . import user
 from .forms import ResumeAnalysisForm, MockTestForm, ResumeBuilderForm, LinkedInBuilderForm, ProfileForm, ChangePasswordForm
 from ..extensions import db, socketio, csrf
-from ..models import UserData, MockTest, JobPosting, JobApplication, Notification, MockInterview, User, ExternalApplication, UserXP, CareerForecast, EmotionalState, SkillFitAssessment
+from ..models import UserData, MockTest, JobPosting, JobApplication, Notification, MockInterview, User, ExternalApplication, UserXP, CareerForecast, EmotionalState, SkillFitAssessment, ResumeAnalysisJob
+from ..services.resume_analysis_service import resume_analysis_service
 
 @user.route('/assessment_report/<int:assessment_id>')
 @login_required
@@ -62,10 +63,10 @@ from ..utils.ai_utils import (
     tailor_resume_to_job,
     simulate_ats_parsing
 )
-from ..utils.file_utils import extract_text_from_pdf, get_pdf_page_count
+from ..utils.resume_digest import get_resume_digest
+from ..utils.resume_store import get_resume_text, get_user_document, save_upload
 from ..utils.report_utils import generate_resume_pdf, generate_pdf_report, generate_docx_report, generate_resume_pdf_from_profile
 from ..utils.github_utils import analyze_github_profile
-from ..utils.vector_utils import search_jobs_by_resume, add_resume_to_vector_db
 from ..utils.gamification import award_xp, check_quest_progress
 from ..models import GitHubProfile, UserXP, Quest, UserQuest
 from flask_socketio import emit
@@ -138,9 +139,8 @@ def tailor_resume(job_id):
         return redirect(url_for('user.resume_analysis'))
 
     try:
-        # Extract text from the existing PDF
-        resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-        resume_text = extract_text_from_pdf(resume_path)
+        # Full text of the existing resume: the digest has no experience bullets
+        resume_text = get_resume_text(latest_resume)
         
         # Call AI to tailor it
         tailored_data = tailor_resume_to_job(resume_text, job.description)
@@ -353,14 +353,13 @@ def add_external_app():
         latest_resume = UserData.query.filter_by(user_id=current_user.id).order_by(UserData.uploaded_at.desc()).first()
         if latest_resume:
             try:
-                resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-                resume_text = extract_text_from_pdf(resume_path)
+                resume_text = get_resume_digest(latest_resume)
                 
                 from ..utils.ai_utils import _call_gemini
                 prompt = f"""Rate the match between this resume and job description from 0 to 100.
                 Return ONLY a JSON object: {{"score": 85, "reason": "short explanation"}}
                 
-                Resume: {resume_text[:2000]}
+                Resume: {resume_text}
                 Job: {jd[:1000]}"""
                 
                 result = _call_gemini(prompt, response_mime_type='application/json')
@@ -440,53 +439,14 @@ def resume_analysis():
             if not os.path.exists(upload_folder):
                 os.makedirs(upload_folder)
             resume_path = os.path.join(upload_folder, filename)
-            resume_file.save(resume_path)
+            sha256 = save_upload(resume_file, resume_path)
             print(f"DEBUG: File saved to {resume_path}", flush=True)
 
-            resume_text = extract_text_from_pdf(resume_path)
-            page_count = get_pdf_page_count(resume_path)
-            analysis_result = analyze_resume(resume_text, job_description)
-
-            if not analysis_result:
-                return jsonify({'error': 'Could not analyze the resume.'}), 500
-
-            analysis_result['page_count'] = page_count
-
-            # Check for improvement before awarding XP
-            previous_best = UserData.query.filter_by(user_id=current_user.id).all()
-            max_prev_score = 0
-            for pb in previous_best:
-                try:
-                    s = int(pb.analysis_result.get('resume_score', 0))
-                    if s > max_prev_score: max_prev_score = s
-                except: continue
-
-            new_score = int(analysis_result.get('resume_score', 0))
-
-            user_data = UserData(user_id=current_user.id,
-                                 resume_path=filename,
-                                 analysis_result=analysis_result)
-            db.session.add(user_data)
-            db.session.commit()
-
-            # Index for Recruiter Search
-            try:
-                skills = analysis_result.get('actual_skills', [])
-                add_resume_to_vector_db(current_user.id, resume_text, skills)
-            except Exception as e:
-                current_app.logger.error(f"Vector Indexing Error: {e}")
-
-            # Gamification: Award XP only if improvement found
-            if new_score > max_prev_score:
-                improvement = new_score - max_prev_score
-                award_xp(current_user, 50 + (improvement * 2), f"improving resume score to {new_score}")
-                check_quest_progress(current_user, "resume_analysis")
-            else:
-                flash("Note: No score improvement detected. Keep optimizing to earn more XP!", "info")
-
-            redirect_url = url_for(
-                'user.resume_analysis_result', user_data_id=user_data.id)
-            return jsonify({'redirect_url': redirect_url})
+            # Extraction, analysis, indexing and XP run in the background;
+            # progress goes to the user's Socket.IO room
+            job = resume_analysis_service.submit(current_user.id, filename, job_description, sha256)
+            return jsonify({'job_id': job.id,
+                            'status_url': url_for('user.resume_analysis_status', job_id=job.id)}), 202
 
         except Exception as e:
             return jsonify({'error': 'An internal error occurred during analysis.'}), 500
@@ -494,6 +454,15 @@ def resume_analysis():
     return render_template('user/resume_analysis.html', form=form)
 
 
+@user.route('/api/resume_analysis/<job_id>')
+@login_required
+def resume_analysis_status(job_id):
+    job = ResumeAnalysisJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        abort(403)
+    return jsonify(resume_analysis_service.status(job))
+
+
 @user.route('/resume_analysis_result/<int:user_data_id>')
 @login_required
 def resume_analysis_result(user_data_id):
@@ -773,48 +742,69 @@ def jobs():
     # Pagination for jobs
     page = request.args.get('page', 1, type=int)
     per_page = 9
-    jobs_pagination = JobPosting.query.order_by(JobPosting.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    all_jobs = jobs_pagination.items
+    query = request.args.get('q', '').strip()
+    # Optional filters: ?organization_id=3&location=Remote&ai_round=1
+    filters = {}
+    if request.args.get('organization_id', type=int):
+        filters['organization_id'] = request.args.get('organization_id', type=int)
+    if request.args.get('location', '').strip():
+        filters['location'] = request.args.get('location').strip()
+    if request.args.get('ai_round') == '1':
+        filters['is_ai_round_enabled'] = True
+
+    from ..utils.vector_utils import filter_jobs, search_jobs
+    if query:
+        # Keyword + semantic search over all postings, best matches first
+        ranked_ids = search_jobs(query, n_results=30, where=filters)
+        by_id = {j.id: j for j in JobPosting.query.filter(JobPosting.id.in_(ranked_ids)).all()}
+        all_jobs = [by_id[job_id] for job_id in ranked_ids if job_id in by_id]
+        jobs_pagination = None
+    else:
+        jobs_pagination = filter_jobs(JobPosting.query, filters).order_by(JobPosting.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        all_jobs = jobs_pagination.items
     
     applied_job_ids = [app.job_id for app in current_user.applications]
     
-    # Check if user has a resume for UI logic, but don't parse it here
+    # Match scores for every card come from the stored skill ids; the
+    # resume itself is not parsed here
     latest_resume = UserData.query.filter_by(user_id=current_user.id).order_by(UserData.uploaded_at.desc()).first()
+    match_scores = {}
+    if latest_resume:
+        try:
+            from ..utils.match_scoring import user_match_scores
+            match_scores = user_match_scores(latest_resume, [j.id for j in all_jobs])
+        except Exception as e:
+            current_app.logger.error(f"Match scoring failed: {e}")
 
     return render_template('user/jobs.html', 
                            jobs=all_jobs, 
                            pagination=jobs_pagination,
                            recommended_jobs=[], # Loaded async
                            applied_job_ids=applied_job_ids, 
+                           match_scores=match_scores,
+                           query=query,
+                           filter_args={key: request.args[key] for key in ('organization_id', 'location', 'ai_round')
+                                        if request.args.get(key)},
                            has_resume=bool(latest_resume))
 
 
 @user.route('/partials/recommended_jobs')
 @login_required
 def load_recommended_jobs():
-    latest_resume = UserData.query.filter_by(user_id=current_user.id).order_by(UserData.uploaded_at.desc()).first()
+    from ..utils.recommendations import get_recommendations, refresh_user
     applied_job_ids = [app.job_id for app in current_user.applications]
-    recommended_jobs = []
-    
-    if latest_resume:
-        try:
-            resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-            # This is the slow part, now async
-            resume_text = extract_text_from_pdf(resume_path)
-            
-            # Vector Search
-            # We fetch all jobs ID to check against, or just let vector search return IDs
-            all_job_ids = [j.id for j in JobPosting.query.with_entities(JobPosting.id).all()]
-            
-            # Pass only extract logic if needed, but vector search handles embedding
-            recommended_ids = search_jobs_by_resume(resume_text, n_results=3)
-            
-            if recommended_ids:
-                recommended_jobs = JobPosting.query.filter(JobPosting.id.in_(recommended_ids)).all()
-                
-        except Exception as e:
-            current_app.logger.error(f"Vector search failed: {e}")
-            pass
+    recommended_jobs = get_recommendations(current_user.id)
+
+    if not recommended_jobs:
+        # Nothing stored yet for uploads from before recommendations were kept
+        latest_resume = UserData.query.filter_by(user_id=current_user.id).order_by(UserData.uploaded_at.desc()).first()
+        if latest_resume and latest_resume.embedding is None:
+            try:
+                refresh_user(latest_resume)
+                recommended_jobs = get_recommendations(current_user.id)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Vector search failed: {e}")
 
     return render_template('user/partials/recommended_jobs.html', 
                            recommended_jobs=recommended_jobs, 
@@ -859,18 +849,25 @@ def calculate_match():
         return jsonify({'error': 'No resume found'}), 400
         
     try:
-        resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-        resume_text = extract_text_from_pdf(resume_path)
-        
-        # Simple AI prompt for match score
+        # Scored locally from skill ids; the AI only explains on request
+        from ..utils.match_scoring import user_match_scores
+        match = user_match_scores(latest_resume, [job.id])[job.id]
+        result = {'score': match['score'] or 0, 'reason': match['reason']}
+        if not data.get('explain'):
+            return jsonify(result)
+
+        resume_text = get_resume_digest(latest_resume)
         from ..utils.ai_utils import _call_gemini
-        prompt = f"""Rate the match between this resume and job description from 0 to 100.
-        Return ONLY a JSON object: {{"score": 85, "reason": "short explanation"}}
+        prompt = f"""A resume scored {result['score']}/100 against this job on skill overlap ({match['reason']})
+        Explain in two or three sentences how well the candidate fits and what would improve the match.
+        Return ONLY a JSON object: {{"reason": "short explanation"}}
         
-        Resume: {resume_text[:2000]}
+        Resume: {resume_text}
         Job: {job.description[:1000]}"""
         
-        result = _call_gemini(prompt, response_mime_type='application/json')
+        explanation = _call_gemini(prompt, response_mime_type='application/json')
+        if isinstance(explanation, dict) and explanation.get('reason'):
+            result['reason'] = explanation['reason']
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -896,8 +893,7 @@ def api_generate_cover_letter():
         return jsonify({'error': 'Please upload a resume first.'}), 400
         
     try:
-        resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-        resume_text = extract_text_from_pdf(resume_path)
+        resume_text = get_resume_digest(latest_resume)
         
         result = generate_cover_letter(resume_text, job.description)
         return jsonify(result)
@@ -1178,9 +1174,10 @@ def api_ats_simulator():
         return jsonify({'error': 'No resume found'}), 404
         
     try:
-        resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-        resume_text = extract_text_from_pdf(resume_path)
-        analysis = simulate_ats_parsing(resume_text)
+        document = get_user_document(latest_resume)
+        if document is None:
+            return jsonify({'error': 'Resume file not found'}), 404
+        analysis = simulate_ats_parsing(document.text, document.layout)
         return jsonify(analysis)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1215,10 +1212,14 @@ def ats_simulator():
         return redirect(url_for('user.resume_analysis'))
         
     try:
-        resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-        resume_text = extract_text_from_pdf(resume_path)
+        # The text as extracted from the PDF, with its layout: the digest
+        # would hide the parsing problems being checked for
+        document = get_user_document(latest_resume)
+        if document is None:
+            flash('Your resume file could not be found. Please upload it again.', 'warning')
+            return redirect(url_for('user.resume_analysis'))
         
-        analysis = simulate_ats_parsing(resume_text)
+        analysis = simulate_ats_parsing(document.text, document.layout)
         if not analysis:
             flash('Failed to simulate ATS parsing. Please try again.', 'danger')
             return redirect(url_for('user.dashboard'))
@@ -1247,7 +1248,7 @@ def dream_job():
             flash('Please upload a resume first.', 'warning')
             return redirect(url_for('user.resume_analysis'))
             
-        resume_text = extract_text_from_pdf(os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path))
+        resume_text = get_resume_digest(latest_resume)
         from ..utils.ai_utils import analyze_dream_job
         analysis = analyze_dream_job(resume_text, target_role)
         
@@ -1303,8 +1304,7 @@ def api_generate_reachout():
     resume_text = ""
     if latest_resume:
         try:
-            resume_path = os.path.join(current_app.config['UPLOAD_FOLDER'], latest_resume.resume_path)
-            resume_text = extract_text_from_pdf(resume_path)
+            resume_text = get_resume_digest(latest_resume)
         except:
             pass
             
@@ -1312,7 +1312,7 @@ def api_generate_reachout():
     prompt = f"""You are a professional networking expert. Generate a highly personalized and professional {platform} message to a Recruiter at {company} for the position of {role}.
     
     Context:
-    Resume: {resume_text[:2000]}
+    Resume: {resume_text}
     
     The message should be concise, highlight 1-2 relevant points from the resume, and have a clear call to action.
     Return ONLY a JSON object: {{"message": "the message text"}}"""
@@ -1,5 +1,6 @@
 from ..models import UserData, JobPosting, MockInterview
 from .ai_utils import _call_gemini
+from .prompt_budget import Section, fit
 import json
 
 class CareerAgent:
@@ -97,6 +98,14 @@ class CareerAgent:
                 role = "User" if msg.get('role') == 'user' else "Assistant"
                 history_str += f"{role}: {msg.get('content')}\n"
 
+        # The user's message matters most; older turns go first
+        parts = fit('agent_chat', [
+            Section('message', user_message, budget=500, priority=3),
+            Section('resume_summary', context['resume_summary'], budget=150, priority=2),
+            Section('interview_history', interview_history, budget=300, priority=1),
+            Section('history', history_str, budget=1200, keep='tail'),
+        ], max_tokens=1800)
+
         # System Prompt construction
         system_prompt = f"""
         You are a helpful and intelligent Career Assistant with 'Sentiment Awareness'. 
@@ -109,13 +118,13 @@ class CareerAgent:
         - Field: {context['predicted_field']}
         - Experience Level: {context['experience_level']}
         - Key Skills: {', '.join(context['top_skills'])}
-        - Resume Summary: {context['resume_summary'][:500]}...
+        - Resume Summary: {parts['resume_summary']}
         
         Interview Performance History:
-        {interview_history}
+        {parts['interview_history']}
         
         Conversation History:
-        {history_str}
+        {parts['history']}
         
         Guidelines:
         1. Be professional, warm, and encouraging.
@@ -125,7 +134,7 @@ class CareerAgent:
         5. Keep responses concise (max 3-4 sentences unless a deep explanation is requested).
         6. If asked to find jobs, you can simulate a search or tell them to check the 'Jobs' tab.
         
-        User: {user_message}
+        User: {parts['message']}
         Assistant:"""
 
         
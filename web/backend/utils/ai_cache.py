@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Two-tier response cache for _call_ai:
+#   1. In-process LRU (fast, per worker)
+#   2. SQLite file on disk (shared between workers and restarts)
+# Entries are keyed by hash(provider, model, response_mime_type, prompt).
+
+DEFAULT_TTL = 3600
+
+# Per-feature TTLs in seconds, keyed by the ai_utils function (or route) that
+# issued the prompt. A TTL of 0 disables caching for that feature.
+FEATURE_TTLS = {
+    'analyze_resume': 24 * 3600,
+    'simulate_ats_parsing': 24 * 3600,
+    'tailor_resume_to_job': 24 * 3600,
+    'generate_cover_letter': 24 * 3600,
+    'analyze_dream_job': 24 * 3600,
+    'generate_interview_report': 24 * 3600,
+    'generate_job_description': 7 * 24 * 3600,
+    'generate_professional_summary': 7 * 24 * 3600,
+    'refine_experience_points': 7 * 24 * 3600,
+    'generate_linkedin_content': 7 * 24 * 3600,
+    'optimize_linkedin_profile': 24 * 3600,
+    'analyze_market_trends': 6 * 3600,
+    'analyze_github_profile': 6 * 3600,
+    'calculate_match': 24 * 3600,
+    'add_external_app': 24 * 3600,
+    'get_candidate_insight': 24 * 3600,
+    'get_interview_question': 300,
+    'analyze_response': 3600,
+    'chat': 300,
+    # Users expect a fresh test every time they ask for one.
+    'generate_mock_test': 0,
+    'generate_next_assessment_question': 0,
+}
+
+_lock = threading.Lock()
+# key -> (expires_at, serialized value). Values are kept serialized so callers
+# that mutate a returned dict (e.g. adding page_count) never corrupt the cache.
+_memory = OrderedDict()
+_disk_conn = None
+_disk_writes = 0
+
+_stats = {
+    'memory_hits': 0,
+    'disk_hits': 0,
+    'misses': 0,
+    'sets': 0,
+    'evictions': 0,
+}
+
+
+def _enabled():
+    return os.environ.get("AI_CACHE_ENABLED", "true").lower() in ('true', 'on', '1')
+
+
+def _memory_max_entries():
+    return int(os.environ.get("AI_CACHE_MAX_ENTRIES", 512))
+
+
+def _disk_max_entries():
+    return int(os.environ.get("AI_CACHE_DISK_MAX_ENTRIES", 20000))
+
+
+def _get_db_path():
+    default = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'ai_cache.db')
+    return os.environ.get("AI_CACHE_DB_PATH", default)
+
+
+def _get_disk():
+    """
+    Lazily opens the SQLite tier. Returns None if the disk tier is disabled
+    or cannot be opened, in which case only the memory tier is used.
+    """
+    global _disk_conn
+    if _disk_conn is not None:
+        return _disk_conn
+    if os.environ.get("AI_CACHE_DISK", "true").lower() not in ('true', 'on', '1'):
+        return None
+    try:
+        path = _get_db_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_cache_accessed ON ai_cache (accessed_at)")
+        conn.commit()
+        _disk_conn = conn
+    except Exception as e:
+        print(f"AI cache: disk tier unavailable ({e}). Using memory only.")
+        return None
+    return _disk_conn
+
+
+def make_key(provider, model, response_mime_type, prompt):
+    """
+    Content-addressed key for a prompt sent to a specific provider/model.
+    """
+    h = hashlib.sha256()
+    for part in (provider, model, response_mime_type or '', prompt):
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def ttl_for(feature):
+    return FEATURE_TTLS.get(feature, DEFAULT_TTL)
+
+
+def _memory_put(key, expires_at, raw):
+    _memory[key] = (expires_at, raw)
+    _memory.move_to_end(key)
+    while len(_memory) > _memory_max_entries():
+        _memory.popitem(last=False)
+        _stats['evictions'] += 1
+
+
+def get(key):
+    """
+    Returns the cached response for key, or None on a miss.
+    """
+    if not _enabled():
+        return None
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            expires_at, raw = entry
+            if expires_at > now:
+                _memory.move_to_end(key)
+                _stats['memory_hits'] += 1
+                return json.loads(raw)
+            del _memory[key]
+
+        conn = _get_disk()
+        if conn is not None:
+            try:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM ai_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    conn.execute("UPDATE ai_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                    _memory_put(key, row[1], row[0])
+                    _stats['disk_hits'] += 1
+                    return json.loads(row[0])
+            except Exception as e:
+                print(f"AI cache read error: {e}")
+
+        _stats['misses'] += 1
+        return None
+
+
+def put(key, value, ttl):
+    """
+    Stores a response in both tiers. Empty/failed responses are never cached.
+    """
+    global _disk_writes
+    if not _enabled() or not ttl or not value:
+        return
+    now = time.time()
+    expires_at = now + ttl
+    raw = json.dumps(value)
+    with _lock:
+        _memory_put(key, expires_at, raw)
+        _stats['sets'] += 1
+
+        conn = _get_disk()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, raw, expires_at, now)
+            )
+            _disk_writes += 1
+            # Evict expired and least-recently-used rows every 100 writes
+            # rather than on every insert.
+            if _disk_writes % 100 == 0:
+                _evict_disk(conn, now)
+            conn.commit()
+        except Exception as e:
+            print(f"AI cache write error: {e}")
+
+
+def _evict_disk(conn, now):
+    conn.execute("DELETE FROM ai_cache WHERE expires_at <= ?", (now,))
+    overflow = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0] - _disk_max_entries()
+    if overflow > 0:
+        conn.execute(
+            "DELETE FROM ai_cache WHERE key IN "
+            "(SELECT key FROM ai_cache ORDER BY accessed_at ASC LIMIT ?)",
+            (overflow,)
+        )
+        _stats['evictions'] += overflow
+
+
+def clear():
+    """
+    Drops every cached response (both tiers).
+    """
+    with _lock:
+        _memory.clear()
+        conn = _get_disk()
+        if conn is not None:
+            try:
+                conn.execute("DELETE FROM ai_cache")
+                conn.commit()
+            except Exception as e:
+                print(f"AI cache clear error: {e}")
+
+
+def get_stats():
+    """
+    Returns hit/miss counters for the admin dashboard.
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats['memory_entries'] = len(_memory)
+    hits = stats['memory_hits'] + stats['disk_hits']
+    total = hits + stats['misses']
+    stats['hit_rate'] = round(hits / total, 3) if total else 0.0
+    return stats
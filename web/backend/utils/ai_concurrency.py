@@ -0,0 +1,165 @@
+import os
+import copy
+import time
+import threading
+from contextlib import contextmanager
+
+# Request coalescing and per-provider concurrency limits for AI calls.
+# Both rely only on threading primitives, which eventlet monkey-patches into
+# green equivalents when running under the gunicorn eventlet worker.
+
+DEFAULT_LIMITS = {
+    'gemini': 8,
+    'ollama': 2,
+}
+
+
+class AIQueueTimeout(Exception):
+    """
+    Raised when no provider slot frees up within the queue timeout, or a
+    coalesced call does not finish within the caller's deadline.
+    """
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one fn per key at a time. Concurrent callers with the same
+    key block until the leader finishes (or their own timeout, in seconds,
+    passes) and receive its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            # A hung leader must not hold waiters past their own deadline
+            if not call.done.wait(timeout):
+                raise AIQueueTimeout(f"Coalesced call did not finish within {timeout}s")
+            if call.error is not None:
+                raise call.error
+            # Each waiter gets its own copy so callers can mutate the result
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class ProviderLimiter:
+    """
+    Bounded semaphore per provider with a wait queue and timeout.
+    Limits come from AI_MAX_CONCURRENCY_<PROVIDER>, the queue timeout from
+    AI_QUEUE_TIMEOUT (seconds).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._stats = {}
+
+    def _limit(self, provider):
+        env_key = f"AI_MAX_CONCURRENCY_{provider.upper()}"
+        return int(os.environ.get(env_key, DEFAULT_LIMITS.get(provider, 4)))
+
+    def _get(self, provider):
+        with self._lock:
+            if provider not in self._semaphores:
+                limit = self._limit(provider)
+                self._semaphores[provider] = threading.BoundedSemaphore(limit)
+                self._stats[provider] = {
+                    'limit': limit,
+                    'active': 0,
+                    'queued': 0,
+                    'max_queued': 0,
+                    'acquired': 0,
+                    'timeouts': 0,
+                    'total_wait_ms': 0.0,
+                    'max_wait_ms': 0.0,
+                }
+            return self._semaphores[provider], self._stats[provider]
+
+    @contextmanager
+    def slot(self, provider, timeout=None):
+        if timeout is None:
+            timeout = float(os.environ.get("AI_QUEUE_TIMEOUT", 30))
+        semaphore, stats = self._get(provider)
+
+        with self._lock:
+            stats['queued'] += 1
+            stats['max_queued'] = max(stats['max_queued'], stats['queued'])
+        start = time.monotonic()
+        acquired = semaphore.acquire(timeout=timeout)
+        waited_ms = (time.monotonic() - start) * 1000
+        with self._lock:
+            stats['queued'] -= 1
+            if not acquired:
+                stats['timeouts'] += 1
+            else:
+                stats['active'] += 1
+                stats['acquired'] += 1
+                stats['total_wait_ms'] += waited_ms
+                stats['max_wait_ms'] = max(stats['max_wait_ms'], waited_ms)
+        if not acquired:
+            raise AIQueueTimeout(f"No {provider} slot available after {timeout}s")
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                stats['active'] -= 1
+            semaphore.release()
+
+    def get_stats(self):
+        with self._lock:
+            snapshot = {p: dict(s) for p, s in self._stats.items()}
+        for s in snapshot.values():
+            s['avg_wait_ms'] = round(s['total_wait_ms'] / s['acquired'], 1) if s['acquired'] else 0.0
+            s['total_wait_ms'] = round(s['total_wait_ms'], 1)
+            s['max_wait_ms'] = round(s['max_wait_ms'], 1)
+        return snapshot
+
+
+single_flight = SingleFlight()
+provider_limiter = ProviderLimiter()
+
+
+def get_stats():
+    """
+    Queue depth and wait-time metrics for sizing the concurrency limits.
+    """
+    return {
+        'in_flight': single_flight.in_flight(),
+        'coalesced': single_flight.coalesced,
+        'providers': provider_limiter.get_stats(),
+    }
@@ -0,0 +1,286 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Per-call instrumentation for AI requests.
+# _call_ai/_stream_ai open a CallRecord for every request; the router and the
+# provider functions annotate the record bound to the current thread (green
+# thread under eventlet) with attempts and token usage. Finished records are
+# folded into a bounded in-memory aggregate keyed by (feature, provider,
+# model), which flush() periodically writes to the ai_call_stats table.
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open.
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+# USD per million (prompt, response) tokens. Local models cost nothing.
+MODEL_PRICES = {
+    'gemini-2.0-flash-lite': (0.075, 0.30),
+    'gemini-2.0-flash': (0.10, 0.40),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-pro': (1.25, 10.00),
+}
+
+OVERFLOW_KEY = ('other', 'other', 'other')
+
+_local = threading.local()
+_lock = threading.Lock()
+_pending = {}
+_recent = deque(maxlen=50)
+_last_flush = time.monotonic()
+
+
+class CallRecord:
+    def __init__(self, feature, prompt):
+        self.feature = feature or 'unknown'
+        self.provider = None
+        self.model = None
+        self.prompt_chars = len(prompt or "")
+        self.response_chars = 0
+        self.prompt_tokens = None
+        self.response_tokens = None
+        self.attempts = 0
+        self.fallback = False
+        self.cache = 'miss'  # 'hit', 'miss', 'coalesced' or 'bypass' (TTL 0)
+        self.ok = False
+        self.started = time.monotonic()
+        self.latency_ms = 0.0
+
+
+def start(feature, prompt):
+    return CallRecord(feature, prompt)
+
+
+def current():
+    return getattr(_local, 'record', None)
+
+
+@contextmanager
+def bound(record):
+    """
+    Makes record the target of note_attempt/note_usage in this thread.
+    """
+    previous = current()
+    _local.record = record
+    try:
+        yield record
+    finally:
+        _local.record = previous
+
+
+def note_attempt(provider, fallback=False):
+    record = current()
+    if record is not None:
+        record.attempts += 1
+        record.provider = provider
+        record.fallback = fallback
+
+
+def note_usage(prompt_tokens=None, response_tokens=None):
+    record = current()
+    if record is not None:
+        if prompt_tokens is not None:
+            record.prompt_tokens = prompt_tokens
+        if response_tokens is not None:
+            record.response_tokens = response_tokens
+
+
+def _bucket(latency_ms):
+    for i, bound_ms in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound_ms:
+            return i
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _cost(model, prompt_tokens, response_tokens):
+    prompt_price, response_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + response_tokens * response_price) / 1_000_000
+
+
+def _new_aggregate():
+    return {
+        'calls': 0,
+        'errors': 0,
+        'cache_hits': 0,
+        'coalesced': 0,
+        'attempts': 0,
+        'fallbacks': 0,
+        'prompt_chars': 0,
+        'response_chars': 0,
+        'prompt_tokens': 0,
+        'response_tokens': 0,
+        'total_latency_ms': 0.0,
+        'max_latency_ms': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        'cost_usd': 0.0,
+    }
+
+
+def finish(record, ok, response_chars=0, model=None):
+    """
+    Closes a record and folds it into the in-memory aggregate.
+    Token counts not reported by the provider are estimated at 4 chars each.
+    """
+    if os.environ.get("AI_METRICS_ENABLED", "true").lower() == "false":
+        return
+    record.ok = ok
+    record.response_chars = response_chars
+    record.latency_ms = (time.monotonic() - record.started) * 1000
+    if record.cache == 'hit':
+        provider, model = 'cache', 'cache'
+    else:
+        provider = record.provider or 'none'
+        model = model or 'none'
+    record.model = model
+    prompt_tokens = record.prompt_tokens if record.prompt_tokens is not None else record.prompt_chars // 4
+    response_tokens = record.response_tokens if record.response_tokens is not None else response_chars // 4
+    if record.cache in ('hit', 'coalesced'):
+        # Nothing was sent upstream for this call
+        prompt_tokens = response_tokens = 0
+
+    key = (record.feature, provider, model)
+    max_keys = int(os.environ.get("AI_METRICS_MAX_KEYS", 200))
+    with _lock:
+        if key not in _pending and len(_pending) >= max_keys:
+            key = OVERFLOW_KEY
+        agg = _pending.setdefault(key, _new_aggregate())
+        agg['calls'] += 1
+        agg['errors'] += 0 if ok else 1
+        agg['cache_hits'] += 1 if record.cache == 'hit' else 0
+        agg['coalesced'] += 1 if record.cache == 'coalesced' else 0
+        agg['attempts'] += record.attempts
+        agg['fallbacks'] += 1 if record.fallback else 0
+        agg['prompt_chars'] += record.prompt_chars
+        agg['response_chars'] += response_chars
+        agg['prompt_tokens'] += prompt_tokens
+        agg['response_tokens'] += response_tokens
+        agg['total_latency_ms'] += record.latency_ms
+        agg['max_latency_ms'] = max(agg['max_latency_ms'], record.latency_ms)
+        agg['latency_buckets'][_bucket(record.latency_ms)] += 1
+        agg['cost_usd'] += _cost(model, prompt_tokens, response_tokens)
+        _recent.append({
+            'feature': record.feature,
+            'provider': provider,
+            'model': model,
+            'cache': record.cache,
+            'ok': ok,
+            'attempts': record.attempts,
+            'latency_ms': round(record.latency_ms, 1),
+            'prompt_chars': record.prompt_chars,
+            'response_chars': response_chars,
+        })
+
+
+def percentile_from_buckets(buckets, pct):
+    """
+    Upper bound of the histogram bucket holding the pct-th percentile.
+    """
+    total = sum(buckets)
+    if not total:
+        return None
+    target = pct / 100.0 * total
+    running = 0
+    for i, count in enumerate(buckets):
+        running += count
+        if running >= target:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else LATENCY_BUCKETS_MS[-1]
+    return LATENCY_BUCKETS_MS[-1]
+
+
+def flush_due():
+    interval = float(os.environ.get("AI_METRICS_FLUSH_INTERVAL", 60))
+    return time.monotonic() - _last_flush >= interval
+
+
+def flush():
+    """
+    Writes the aggregate collected since the last flush to ai_call_stats and
+    starts a new window. Needs an application context.
+    """
+    global _last_flush
+    from backend.models import db, AICallStat
+
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    now = datetime.utcnow()
+    try:
+        for (feature, provider, model), agg in pending.items():
+            db.session.add(AICallStat(
+                feature=feature,
+                provider=provider,
+                model=model,
+                recorded_at=now,
+                **agg
+            ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to flush AI call metrics: {e}")
+        return 0
+    return len(pending)
+
+
+def _merge(into, agg):
+    for field, value in agg.items():
+        if field == 'latency_buckets':
+            into[field] = [a + b for a, b in zip(into[field], value or [])] if value else into[field]
+        elif field == 'max_latency_ms':
+            into[field] = max(into[field], value or 0.0)
+        else:
+            into[field] += value or 0
+
+
+def get_summary(hours=24):
+    """
+    Per-feature totals for the last `hours` hours (flushed rows plus the
+    window not yet flushed), most expensive by total latency first.
+    Needs an application context.
+    """
+    from datetime import timedelta
+    from backend.models import AICallStat
+
+    by_feature = {}
+    since = datetime.utcnow() - timedelta(hours=hours)
+    try:
+        rows = AICallStat.query.filter(AICallStat.recorded_at >= since).all()
+    except Exception as e:
+        print(f"Failed to load AI call metrics: {e}")
+        rows = []
+    for row in rows:
+        agg = {field: getattr(row, field) for field in _new_aggregate()}
+        _merge(by_feature.setdefault(row.feature, _new_aggregate()), agg)
+    with _lock:
+        for (feature, _, _), agg in _pending.items():
+            _merge(by_feature.setdefault(feature, _new_aggregate()), agg)
+
+    summary = []
+    for feature, agg in by_feature.items():
+        calls = agg['calls']
+        summary.append({
+            'feature': feature,
+            'calls': calls,
+            'error_rate': round(agg['errors'] / calls, 3) if calls else 0.0,
+            'cache_hit_rate': round((agg['cache_hits'] + agg['coalesced']) / calls, 3) if calls else 0.0,
+            'fallbacks': agg['fallbacks'],
+            'avg_latency_ms': round(agg['total_latency_ms'] / calls, 1) if calls else 0.0,
+            'p95_latency_ms': percentile_from_buckets(agg['latency_buckets'], 95),
+            'total_latency_s': round(agg['total_latency_ms'] / 1000, 1),
+            'prompt_tokens': agg['prompt_tokens'],
+            'response_tokens': agg['response_tokens'],
+            'avg_prompt_chars': agg['prompt_chars'] // calls if calls else 0,
+            'cost_usd': round(agg['cost_usd'], 4),
+        })
+    summary.sort(key=lambda s: s['total_latency_s'], reverse=True)
+    return summary
+
+
+def get_recent():
+    with _lock:
+        return list(_recent)
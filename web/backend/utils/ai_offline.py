@@ -0,0 +1,402 @@
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+
+import msgspec
+
+from . import ai_metrics
+from . import ai_schemas
+from .ai_router import router
+
+# Offline AI provider (AI_PROVIDER=offline) for load tests and CI.
+#
+# AI_OFFLINE_MODE selects the behaviour:
+#   synthetic - deterministic, schema-correct answers generated locally, after
+#               a delay drawn from AI_OFFLINE_LATENCY (see parse_latency).
+#   record    - forwards to AI_OFFLINE_UPSTREAM (default gemini) and appends
+#               every answer and its timing to the cassette file.
+#   replay    - answers from the cassette with the recorded timing. Prompts
+#               missing from it get a synthetic answer, or an error when
+#               AI_OFFLINE_REPLAY_MISS=error.
+# The cassette is a JSON-lines file at AI_OFFLINE_CASSETTE.
+
+DEFAULT_CASSETTE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'ai_cassette.jsonl')
+
+# Features whose JSON answers have a typed schema
+SCHEMAS = {
+    'analyze_resume': ai_schemas.ResumeAnalysis,
+    'simulate_ats_parsing': ai_schemas.AtsResult,
+    'analyze_market_trends': ai_schemas.MarketTrends,
+    'generate_interview_report': ai_schemas.InterviewReport,
+    'analyze_github_profile': ai_schemas.GitHubAudit,
+}
+
+# Example answers for the remaining JSON features, shaped like their prompts ask.
+# Integer fields are re-drawn per prompt (see _vary).
+TEMPLATES = {
+    'generate_mock_test': {
+        "questions": [
+            {"question": "Which data structure gives O(1) average lookup by key?",
+             "options": ["List", "Hash map", "Linked list", "Binary heap"],
+             "correct_answer": "Hash map"},
+            {"question": "What does the 'R' in REST stand for?",
+             "options": ["Remote", "Representational", "Reliable", "Recursive"],
+             "correct_answer": "Representational"},
+        ]
+    },
+    'generate_linkedin_content': {
+        "headline": "Software Engineer | Building reliable backend systems",
+        "about": "I design and ship backend services that scale.\n\nI enjoy turning vague requirements into simple, well-tested systems.",
+        "experience_bullets": ["Cut API latency by 40% by adding caching", "Led migration to containerised deploys"],
+    },
+    'generate_next_assessment_question': {
+        "status": "in_progress",
+        "question": "How would you debug a slow database query?",
+        "options": ["Add more RAM", "Inspect the query plan", "Restart the server", "Rewrite in another language"],
+        "answer": "Inspect the query plan",
+    },
+    'generate_updated_analysis': {
+        "ai_summary": "The assessment confirms solid fundamentals with room to grow in system design.",
+        "recommended_skills": ["System Design", "Docker"],
+        "recommended_courses": ["Designing Data-Intensive Applications"],
+        "how_to_improve": "Practice explaining trade-offs in design discussions.",
+    },
+    'generate_professional_summary': {
+        "summary": "Results-driven engineer with a track record of shipping scalable, well-tested services.",
+    },
+    'refine_experience_points': {
+        "bullet_points": ["Engineered a reporting pipeline serving 2,000 daily users",
+                          "Optimized build times by 35% through caching"],
+    },
+    'generate_cover_letter': {
+        "cover_letter_text": "Dear Hiring Manager,\n\nI am excited to apply for this role...\n\nSincerely,\nCandidate",
+    },
+    'optimize_linkedin_profile': {
+        "headline": "Backend Engineer | Python | Cloud",
+        "about": "I build services people rely on.",
+        "experience": [{"title": "Software Engineer", "company": "Acme", "location": "Remote",
+                        "dates": "2022 - Present", "description": "- Shipped features\n- Improved reliability"}],
+        "education": [{"degree": "B.Tech", "school": "State University", "location": "India", "dates": "2018 - 2022"}],
+        "skills": "Python, Flask, SQL, Docker",
+        "projects": [{"name": "TalentLink", "description": "Resume analysis platform."}],
+    },
+    'tailor_resume_to_job': {
+        "name": "Candidate", "email": "candidate@example.com", "phone": "+91 00000 00000",
+        "headline": "Backend Engineer", "about": "Engineer focused on reliable services.",
+        "skills": "Python, Flask, SQL",
+        "experience": [{"title": "Software Engineer", "company": "Acme", "location": "Remote",
+                        "dates": "2022 - Present", "description": "- Built APIs\n- Reduced costs"}],
+        "education": [{"school": "State University", "degree": "B.Tech", "dates": "2018 - 2022", "location": ""}],
+        "projects": [{"name": "TalentLink", "description": "Resume analysis platform."}],
+    },
+    'analyze_dream_job': {
+        "match_percentage": 62,
+        "current_standing": "Strong foundation, limited leadership experience.",
+        "missing_skills": ["Kubernetes", "Team Leadership"],
+        "required_experience": "Own a production service end to end.",
+        "roadmap_steps": [
+            {"step": "Step 1", "description": "Short term goal", "timeframe": "1-3 months"},
+            {"step": "Step 2", "description": "Mid term goal", "timeframe": "6-12 months"},
+            {"step": "Step 3", "description": "Long term goal", "timeframe": "1-2 years"},
+        ],
+        "bridge_visual_data": [50, 65, 80, 100],
+    },
+    'analyze_response': {
+        "score": 7, "sentiment": "positive",
+        "feedback": "Clear answer with a concrete example.",
+        "improvement_tip": "Quantify the result of your work.",
+        "keywords_detected": ["API", "testing"],
+        "star_adherence": 6, "star_feedback": "Result could be more specific.",
+    },
+    'generate_forecast': {
+        "target_role": "Senior Engineer",
+        "gap_analysis": {"missing_hard_skills": ["Kubernetes"], "missing_soft_skills": ["Mentoring"],
+                         "critical_projects_needed": ["Lead a service migration"]},
+        "future_resume": {"summary": "Senior engineer leading platform work.",
+                          "added_experience": [{"title": "Engineer II", "company": "Top Tier Tech Company (Hypothetical)",
+                                                "duration": "18 months", "key_achievements": ["Led a migration"]}],
+                          "projected_skills": ["Python", "Kubernetes"]},
+        "roadmap_timeline": [{"quarter": "Q1 2026", "milestone": "Master Kubernetes",
+                              "action_items": ["Take a course", "Build a project"]}],
+        "success_probability": 80,
+        "motivational_message": "Steady progress compounds.",
+    },
+    'add_external_app': {"score": 72, "reason": "Good overlap on core skills."},
+    'calculate_match': {"score": 72, "reason": "Good overlap on core skills."},
+    'api_co_writer_suggest': {"suggestions": ["Lead with impact", "Quantify the outcome", "Use a stronger verb"]},
+    'api_generate_reachout': {"message": "Hi! I admire your team's work and would love to connect."},
+    'api_skillfit_dialect_detect': {"detected_district": "General", "dialect_tone": "Formal",
+                                    "suggested_greeting": "Namaskara"},
+}
+
+TEXT_SENTENCES = [
+    "That is a solid answer.",
+    "You explained the trade-offs clearly.",
+    "Let's go a bit deeper.",
+    "Thanks for the detail on your approach.",
+    "Good use of a concrete example.",
+]
+
+QUESTIONS = [
+    "Can you walk me through a project you are proud of?",
+    "How do you handle disagreements within your team?",
+    "How would you design a rate limiter for an API?",
+    "Tell me about a time you had to learn something quickly.",
+    "What would you change about the last system you worked on?",
+]
+
+_lock = threading.Lock()
+_cassette = None
+
+
+def _mode():
+    return os.environ.get("AI_OFFLINE_MODE", "synthetic").lower()
+
+
+def model_name():
+    return f"offline-{_mode()}"
+
+
+def _cassette_path():
+    return os.environ.get("AI_OFFLINE_CASSETTE", DEFAULT_CASSETTE)
+
+
+def cassette_key(prompt, response_mime_type=None, stream=False):
+    kind = "stream" if stream else (response_mime_type or "text")
+    return hashlib.sha256(f"{kind}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def _rng(prompt):
+    seed = os.environ.get("AI_OFFLINE_SEED", "0")
+    return random.Random(hashlib.sha256(f"{seed}\x00{prompt}".encode("utf-8")).digest())
+
+
+def _feature():
+    record = ai_metrics.current()
+    return record.feature if record is not None else 'unknown'
+
+
+def parse_latency(spec):
+    """
+    Parses a latency spec (milliseconds) into a sampler taking a Random:
+      fixed:300            always 300 ms
+      uniform:100:900      uniform between 100 and 900 ms
+      lognormal:800:0.5    median 800 ms, sigma 0.5 (long right tail)
+      none                 no delay
+    """
+    parts = (spec or "none").split(":")
+    kind = parts[0].lower()
+    args = [float(p) for p in parts[1:]]
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "lognormal":
+        median, sigma = args[0], (args[1] if len(args) > 1 else 0.5)
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    return lambda rng: 0.0
+
+
+def _latency_ms(feature, rng):
+    spec = os.environ.get(f"AI_OFFLINE_LATENCY_{feature.upper()}") or \
+        os.environ.get("AI_OFFLINE_LATENCY", "lognormal:800:0.5")
+    return parse_latency(spec)(rng)
+
+
+def _sleep(latency_ms, timeout):
+    """
+    Sleeps for the modelled latency, giving up at the caller's timeout like
+    a real provider would.
+    """
+    delay = latency_ms / 1000.0
+    if timeout is not None and delay > timeout:
+        time.sleep(max(0.0, timeout))
+        raise TimeoutError(f"Offline provider latency {latency_ms:.0f} ms exceeded timeout")
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _fill(info, rng, name=""):
+    """
+    Builds a value for a msgspec type (see msgspec.inspect).
+    """
+    if isinstance(info, msgspec.inspect.StructType):
+        return {f.encode_name: _fill(f.type, rng, f.name) for f in info.fields}
+    if isinstance(info, msgspec.inspect.ListType):
+        return [_fill(info.item_type, rng, name) for _ in range(3)]
+    if isinstance(info, msgspec.inspect.IntType):
+        if name == "confidence_trend":
+            return rng.randint(4, 9)
+        return rng.randint(55, 92)
+    if isinstance(info, msgspec.inspect.StrType):
+        if name == "email":
+            return "candidate@example.com"
+        if name == "mermaid_career_path":
+            return "graph LR; A[Current Role] --> B[Next Step]; B --> C[Future Goal]"
+        return f"Synthetic {name.replace('_', ' ')} #{rng.randint(1, 99)}"
+    return None
+
+
+def _vary(value, rng):
+    if isinstance(value, dict):
+        return {k: _vary(v, rng) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_vary(v, rng) for v in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        # Keep scores in a plausible band around the template value
+        return max(0, min(100, value + rng.randint(-10, 10))) if value > 10 else value
+    return value
+
+
+def synthetic_response(prompt, response_mime_type=None, feature=None):
+    """
+    Deterministic answer for prompt: the same prompt (and AI_OFFLINE_SEED)
+    always gives the same text.
+    """
+    feature = feature or _feature()
+    rng = _rng(prompt)
+    if response_mime_type == 'application/json':
+        schema = SCHEMAS.get(feature)
+        if schema is not None:
+            value = _fill(msgspec.inspect.type_info(schema), rng)
+        else:
+            value = _vary(TEMPLATES.get(feature, {}), rng)
+        return json.dumps(value)
+
+    sentences = rng.sample(TEXT_SENTENCES, 2)
+    if feature == 'get_interview_question':
+        return f"{' '.join(sentences)} {rng.choice(QUESTIONS)}"
+    return f"{' '.join(sentences)} (synthetic response for {feature})"
+
+
+def _split(text, words_per_chunk=3):
+    words = text.split(" ")
+    return [" ".join(words[i:i + words_per_chunk]) + (" " if i + words_per_chunk < len(words) else "")
+            for i in range(0, len(words), words_per_chunk)]
+
+
+def _load_cassette():
+    global _cassette
+    with _lock:
+        if _cassette is None:
+            _cassette = {}
+            path = _cassette_path()
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            entry = json.loads(line)
+                            _cassette[entry['key']] = entry
+                print(f"DEBUG: Loaded {len(_cassette)} AI cassette entries from {path}.", flush=True)
+        return _cassette
+
+
+def _append(entry):
+    path = _cassette_path()
+    with _lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        if _cassette is not None:
+            _cassette[entry['key']] = entry
+
+
+def reset():
+    """Drops the loaded cassette so the file is re-read on next use."""
+    global _cassette
+    with _lock:
+        _cassette = None
+
+
+def _replay_miss(prompt, response_mime_type, feature):
+    if os.environ.get("AI_OFFLINE_REPLAY_MISS", "synthetic").lower() == "error":
+        raise LookupError(f"No cassette entry for '{feature}' prompt")
+    print(f"DEBUG: No cassette entry for '{feature}', using a synthetic answer.", flush=True)
+
+
+def _upstream():
+    return os.environ.get("AI_OFFLINE_UPSTREAM", "gemini")
+
+
+def call(prompt, response_mime_type=None, timeout=None):
+    """
+    Provider function registered with the router as 'offline'.
+    """
+    feature = _feature()
+    mode = _mode()
+
+    if mode == "record":
+        start = time.monotonic()
+        response = router.provider(_upstream())(prompt, response_mime_type, timeout)
+        _append({
+            'key': cassette_key(prompt, response_mime_type),
+            'feature': feature,
+            'latency_ms': round((time.monotonic() - start) * 1000, 1),
+            'response': response,
+        })
+        return response
+
+    if mode == "replay":
+        entry = _load_cassette().get(cassette_key(prompt, response_mime_type))
+        if entry is not None:
+            _sleep(entry['latency_ms'], timeout)
+            return entry['response']
+        _replay_miss(prompt, response_mime_type, feature)
+
+    _sleep(_latency_ms(feature, _rng(prompt)), timeout)
+    return synthetic_response(prompt, response_mime_type, feature)
+
+
+def stream(prompt, timeout=None):
+    """
+    Streaming provider function registered with the router as 'offline'.
+    Synthetic streams send the first chunk after a quarter of the modelled
+    latency and spread the rest evenly; replayed streams keep the recorded
+    chunk offsets.
+    """
+    feature = _feature()
+    mode = _mode()
+    start = time.monotonic()
+
+    if mode == "record":
+        chunks = []
+        upstream = router.streamer(_upstream())(prompt, timeout)
+        try:
+            for chunk in upstream:
+                chunks.append([round((time.monotonic() - start) * 1000, 1), chunk])
+                yield chunk
+        finally:
+            close = getattr(upstream, 'close', None)
+            if close is not None:
+                close()
+        _append({'key': cassette_key(prompt, stream=True), 'feature': feature, 'chunks': chunks})
+        return
+
+    timeline = None
+    if mode == "replay":
+        entry = _load_cassette().get(cassette_key(prompt, stream=True))
+        if entry is not None:
+            timeline = entry['chunks']
+        else:
+            _replay_miss(prompt, None, feature)
+
+    if timeline is None:
+        total = _latency_ms(feature, _rng(prompt))
+        chunks = _split(synthetic_response(prompt, None, feature))
+        first = total * 0.25
+        step = (total - first) / max(1, len(chunks) - 1)
+        timeline = [[first + i * step, chunk] for i, chunk in enumerate(chunks)]
+
+    for offset_ms, chunk in timeline:
+        wait_ms = offset_ms - (time.monotonic() - start) * 1000
+        remaining = None
+        if timeout is not None:
+            remaining = timeout - (time.monotonic() - start)
+        _sleep(max(0.0, wait_ms), remaining)
+        yield chunk
+
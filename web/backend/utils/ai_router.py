@@ -0,0 +1,299 @@
+import os
+import time
+import threading
+from collections import deque
+
+from . import ai_metrics
+from .ai_concurrency import AIQueueTimeout
+
+# Provider routing for AI calls.
+# Each provider gets a circuit breaker and a rolling window of latencies and
+# outcomes. Healthy providers are tried in order of observed latency/error
+# rate, and no attempt is started once the request deadline has passed.
+
+# Providers that may serve a request when the configured AI_PROVIDER fails.
+FALLBACKS = {
+    'gemini': ['ollama'],
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+WINDOW_SIZE = 100
+MIN_SAMPLES = 5
+
+
+class CircuitBreaker:
+    """
+    Opens after AI_BREAKER_FAILURES consecutive failures. While open, calls
+    are skipped until AI_BREAKER_COOLDOWN seconds pass; then a single probe
+    is let through (half-open) which either closes or re-opens the circuit.
+    """
+
+    def __init__(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _threshold(self):
+        return int(os.environ.get("AI_BREAKER_FAILURES", 3))
+
+    def _cooldown(self):
+        return float(os.environ.get("AI_BREAKER_COOLDOWN", 30))
+
+    def available(self, now):
+        if self.state == OPEN and now - self.opened_at >= self._cooldown():
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == HALF_OPEN:
+            return not self._probe_in_flight
+        return self.state == CLOSED
+
+    def try_acquire(self, now):
+        """
+        Claims the right to call the provider. In half-open state only one
+        probe is allowed at a time.
+        """
+        if not self.available(now):
+            return False
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def release(self):
+        """Gives up a claim without an outcome (the call never reached the provider)."""
+        self._probe_in_flight = False
+
+    def record_failure(self, now):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self._threshold():
+            self.state = OPEN
+            self.opened_at = now
+
+
+class ProviderHealth:
+    """
+    Rolling latency (successful calls only) and outcome window for one provider.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.latencies_ms = deque(maxlen=WINDOW_SIZE)
+        self.outcomes = deque(maxlen=WINDOW_SIZE)  # True = success
+        self.calls = 0
+        self.failures = 0
+
+    def percentile(self, pct):
+        if not self.latencies_ms:
+            return None
+        ordered = sorted(self.latencies_ms)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def score(self):
+        """
+        Lower is better. Unknown until MIN_SAMPLES successful calls were seen.
+        """
+        if len(self.latencies_ms) < MIN_SAMPLES:
+            return None
+        return self.percentile(95) * (1 + 2 * self.error_rate())
+
+
+class ProviderRouter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = {}
+        self._streamers = {}
+        self._health = {}
+        self.active_provider = None
+
+    def register(self, name, fn, stream_fn=None):
+        """
+        fn(prompt, response_mime_type, timeout) must return a response or raise.
+        stream_fn(prompt, timeout), if given, must return an iterator of text
+        chunks and raise on failure.
+        """
+        self._providers[name] = fn
+        if stream_fn is not None:
+            self._streamers[name] = stream_fn
+        self._health.setdefault(name, ProviderHealth())
+
+    def provider(self, name):
+        return self._providers[name]
+
+    def streamer(self, name):
+        return self._streamers[name]
+
+    def candidates(self):
+        """
+        Providers allowed to serve the current request, best first.
+        """
+        configured = os.environ.get("AI_PROVIDER", "gemini")
+        names = [configured] + [p for p in FALLBACKS.get(configured, []) if p != configured]
+        names = [n for n in names if n in self._providers]
+        now = time.monotonic()
+
+        with self._lock:
+            allowed = [n for n in names if self._health[n].breaker.available(now)]
+            probing = [n for n in allowed if self._health[n].breaker.state == HALF_OPEN]
+            scores = {n: self._health[n].score() for n in allowed}
+        # A half-open provider goes first so it gets its probe call, and the
+        # configured order holds until every provider has a score: otherwise a
+        # provider that went down before MIN_SAMPLES successes would always
+        # lose to the scored fallback and never be tried again.
+        rest = [n for n in allowed if n not in probing]
+        if all(scores[n] is not None for n in rest):
+            rest.sort(key=lambda n: scores[n])  # stable: ties keep the configured order
+        return probing + rest
+
+    def _record(self, name, ok, latency_ms):
+        with self._lock:
+            health = self._health[name]
+            health.calls += 1
+            health.outcomes.append(ok)
+            if ok:
+                health.latencies_ms.append(latency_ms)
+                health.breaker.record_success()
+                self.active_provider = name
+            else:
+                health.failures += 1
+                health.breaker.record_failure(time.monotonic())
+
+    def _release(self, name):
+        with self._lock:
+            self._health[name].breaker.release()
+
+    def call(self, prompt, response_mime_type=None, deadline=None):
+        """
+        Tries healthy providers in order until one answers or the deadline
+        (absolute time.monotonic() value) passes. Returns None on failure.
+        """
+        configured = os.environ.get("AI_PROVIDER", "gemini")
+        for name in self.candidates():
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("AI Router: request deadline exceeded.", flush=True)
+                    break
+
+            with self._lock:
+                if not self._health[name].breaker.try_acquire(time.monotonic()):
+                    continue
+
+            ai_metrics.note_attempt(name, fallback=name != configured)
+            start = time.monotonic()
+            try:
+                result = self._providers[name](prompt, response_mime_type, remaining)
+            except AIQueueTimeout as e:
+                # Local backpressure, not a provider failure: leave its health alone
+                print(f"AI Router: {name} busy ({e}).", flush=True)
+                self._release(name)
+                continue
+            except Exception as e:
+                print(f"AI Router: {name} failed ({e}).", flush=True)
+                result = None
+            latency_ms = (time.monotonic() - start) * 1000
+
+            if result:
+                self._record(name, True, latency_ms)
+                return result
+            self._record(name, False, latency_ms)
+        return None
+
+    def stream(self, prompt, deadline=None):
+        """
+        Streaming variant of call(): yields text chunks from the first provider
+        that produces one. Providers failing before their first chunk are
+        skipped like in call(); once text has been yielded there is no
+        switching and a later error is re-raised to the consumer. Closing the
+        generator closes the upstream stream as well.
+        """
+        configured = os.environ.get("AI_PROVIDER", "gemini")
+        for name in self.candidates():
+            if name not in self._streamers:
+                continue
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("AI Router: request deadline exceeded.", flush=True)
+                    break
+
+            with self._lock:
+                if not self._health[name].breaker.try_acquire(time.monotonic()):
+                    continue
+
+            ai_metrics.note_attempt(name, fallback=name != configured)
+            start = time.monotonic()
+            upstream = None
+            started = False
+            ok = False
+            busy = False
+            try:
+                upstream = iter(self._streamers[name](prompt, remaining))
+                for chunk in upstream:
+                    if not chunk:
+                        continue
+                    started = True
+                    yield chunk
+                ok = started
+            except GeneratorExit:
+                # Consumer stopped early (e.g. client disconnected)
+                ok = started
+                raise
+            except AIQueueTimeout as e:
+                # No slot for this provider; not counted against its health
+                print(f"AI Router: {name} busy ({e}).", flush=True)
+                busy = True
+                if started:
+                    raise
+            except Exception as e:
+                print(f"AI Router: {name} stream failed ({e}).", flush=True)
+                if started:
+                    raise
+            finally:
+                close = getattr(upstream, 'close', None)
+                if close is not None:
+                    close()
+                if busy:
+                    self._release(name)
+                else:
+                    self._record(name, ok, (time.monotonic() - start) * 1000)
+            if started:
+                return
+
+    def get_active_provider(self):
+        return self.active_provider or os.environ.get("AI_PROVIDER", "gemini")
+
+    def get_stats(self):
+        stats = {}
+        with self._lock:
+            for name, health in self._health.items():
+                p50 = health.percentile(50)
+                p95 = health.percentile(95)
+                stats[name] = {
+                    'state': health.breaker.state,
+                    'calls': health.calls,
+                    'failures': health.failures,
+                    'error_rate': round(health.error_rate(), 3),
+                    'p50_ms': round(p50, 1) if p50 is not None else None,
+                    'p95_ms': round(p95, 1) if p95 is not None else None,
+                }
+        return stats
+
+
+router = ProviderRouter()
@@ -0,0 +1,286 @@
+import re
+import threading
+
+import msgspec
+
+# Typed schemas for JSON returned by the AI providers.
+# Responses are decoded straight into these Structs (lax mode, so "85" is
+# accepted for an int), then handed back to callers as plain dicts with every
+# field present. Broken JSON is repaired locally instead of asking the model
+# again, and fields with the wrong shape fall back to their defaults.
+
+
+class RoadmapWeek(msgspec.Struct):
+    week: str = ""
+    topic: str = ""
+    description: str = ""
+    search_query: str = ""
+
+
+class ResumeAnalysis(msgspec.Struct):
+    name: str = "N/A"
+    email: str = "N/A"
+    contact_number: str = "N/A"
+    experience_level: str = "N/A"
+    predicted_field: str = "N/A"
+    resume_score: int = 0
+    actual_skills: list[str] = []
+    recommended_skills: list[str] = []
+    recommended_courses: list[str] = []
+    learning_roadmap: list[RoadmapWeek] = []
+    youtube_search_queries: list[str] = []
+    ai_summary: str = ""
+    quantifiable_achievements_suggestions: list[str] = []
+    formatting_analysis: str = "N/A"
+    mermaid_career_path: str = ""
+    matching_skills: list[str] = []
+    missing_skills: list[str] = []
+
+
+class QuestionFeedback(msgspec.Struct):
+    question: str = ""
+    answer_score: int = 0
+    feedback: str = ""
+
+
+class InterviewReport(msgspec.Struct):
+    overall_score: int = 0
+    communication_score: int = 0
+    technical_score: int = 0
+    behavioral_score: int = 0
+    problem_solving_score: int = 0
+    star_method_adherence: int = 0
+    sentiment_analysis: str = ""
+    strengths: list[str] = []
+    weaknesses: list[str] = []
+    keyword_usage: str = ""
+    improvement_tips: list[str] = []
+    confidence_trend: list[int] = []
+    question_breakdown: list[QuestionFeedback] = []
+
+
+class AtsResult(msgspec.Struct):
+    parsed_raw_text: str = ""
+    structural_score: int = 0
+    potential_issues: list[str] = []
+    top_keywords: list[str] = []
+    formatting_warnings: list[str] = []
+    ats_friendly_score: int = 0
+
+
+class MarketTrends(msgspec.Struct):
+    undersupplied_skills: list[str] = []
+    oversupplied_skills: list[str] = []
+    emerging_trends: list[str] = []
+    strategic_advice: str = ""
+    market_health_score: int = 0
+
+
+class ProjectHighlight(msgspec.Struct):
+    name: str = ""
+    insight: str = ""
+
+
+class GitHubAudit(msgspec.Struct):
+    coder_persona: str = ""
+    verified_skills: list[str] = []
+    code_quality_score: int = 0
+    quality_explanation: str = ""
+    project_highlights: list[ProjectHighlight] = []
+    improvement_tips: list[str] = []
+
+
+_decoders = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _count(schema_name, outcome):
+    with _lock:
+        stats = _stats.setdefault(schema_name, {
+            'decoded': 0,    # valid on the first try
+            'repaired': 0,   # needed repair_json
+            'salvaged': 0,   # some fields had the wrong shape and were reset
+            'failed': 0,     # nothing usable
+        })
+        stats[outcome] += 1
+
+
+def _decoder(schema):
+    decoder = _decoders.get(schema)
+    if decoder is None:
+        if schema is None:
+            decoder = msgspec.json.Decoder()
+        else:
+            decoder = msgspec.json.Decoder(schema, strict=False)
+        _decoders[schema] = decoder
+    return decoder
+
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.S)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+_DANGLING_KEY_RE = re.compile(r'(?:,|(?<=\{))\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+
+
+def repair_json(text):
+    """
+    Best-effort fix-up of model output: strips markdown fences and prose
+    around the JSON value, drops trailing commas, and closes strings, arrays
+    and objects left open by a truncated response. Returns a string that may
+    still be invalid.
+    """
+    if not text:
+        return ""
+    s = text.strip()
+    fenced = _FENCE_RE.search(s)
+    if fenced:
+        s = fenced.group(1).strip()
+
+    starts = [i for i in (s.find("{"), s.find("[")) if i != -1]
+    if not starts:
+        return s
+    s = s[min(starts):]
+
+    # Walk the text to find where the value ends or what is left open
+    stack = []
+    in_string = False
+    escaped = False
+    end = None
+    for i, ch in enumerate(s):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                end = i + 1
+                break
+
+    if end is not None:
+        s = s[:end]
+    else:
+        if in_string:
+            if escaped:
+                s = s[:-1]
+            s += '"'
+        s = s.rstrip()
+        if stack and stack[-1] == "}":
+            # A key without a value (or a half-written key) cannot be kept
+            if s.endswith(":") or _is_dangling_key(s):
+                s = _DANGLING_KEY_RE.sub("", s)
+        s = s.rstrip().rstrip(",").rstrip(":")
+        s += "".join(reversed(stack))
+
+    return _TRAILING_COMMA_RE.sub(r"\1", s)
+
+
+def _is_dangling_key(s):
+    """
+    True if s ends in an object key that has no colon yet, e.g. '{"a": 1, "b"'.
+    """
+    match = re.search(r'([,{])\s*"(?:[^"\\]|\\.)*"$', s)
+    return match is not None
+
+
+def _salvage(data, schema):
+    """
+    Keeps the fields of data that convert to the schema's types and resets
+    the rest to their defaults.
+    """
+    kept = {}
+    for field in msgspec.structs.fields(schema):
+        if field.encode_name not in data:
+            continue
+        value = data[field.encode_name]
+        # Scores like 85.5 are still worth keeping as 86, and a lone
+        # string where a list was asked for as a one-item list
+        candidates = [value]
+        if field.type is int and isinstance(value, float):
+            candidates.append(int(round(value)))
+        elif getattr(field.type, '__origin__', None) is list and isinstance(value, str):
+            candidates.append([value])
+        for candidate in candidates:
+            try:
+                msgspec.convert({field.encode_name: candidate}, schema, strict=False)
+            except msgspec.ValidationError:
+                continue
+            kept[field.encode_name] = candidate
+            break
+    return msgspec.convert(kept, schema, strict=False)
+
+
+def decode(raw, schema=None, name=None):
+    """
+    Decodes raw model output. With a schema the result is validated against
+    it and returned as a dict with all schema fields; without one any JSON
+    value is accepted. Returns None if nothing usable could be recovered.
+    Outcomes are counted per schema (see get_stats).
+    """
+    name = name or (schema.__name__ if schema is not None else 'untyped')
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if not raw:
+        _count(name, 'failed')
+        return None
+
+    outcome = 'decoded'
+    decoder = _decoder(schema)
+    try:
+        value = decoder.decode(raw)
+    except msgspec.ValidationError:
+        value = None
+        outcome = 'salvaged'
+    except msgspec.DecodeError:
+        value = None
+        outcome = 'repaired'
+
+    if outcome == 'repaired':
+        raw = repair_json(raw.decode("utf-8", errors="replace")).encode("utf-8")
+        try:
+            value = decoder.decode(raw)
+        except msgspec.ValidationError:
+            outcome = 'salvaged'
+        except msgspec.DecodeError:
+            _count(name, 'failed')
+            return None
+
+    if outcome == 'salvaged':
+        try:
+            data = msgspec.json.decode(raw)
+        except msgspec.DecodeError:
+            # Validation can trip before the decoder reaches a syntax error
+            try:
+                data = msgspec.json.decode(repair_json(raw.decode("utf-8", errors="replace")))
+            except msgspec.DecodeError:
+                _count(name, 'failed')
+                return None
+        if not isinstance(data, dict):
+            _count(name, 'failed')
+            return None
+        value = _salvage(data, schema)
+
+    _count(name, outcome)
+    return msgspec.to_builtins(value)
+
+
+def get_stats():
+    """
+    Decode outcome counters per schema, with a failure rate for each.
+    """
+    with _lock:
+        snapshot = {name: dict(s) for name, s in _stats.items()}
+    for s in snapshot.values():
+        total = s['decoded'] + s['repaired'] + s['salvaged'] + s['failed']
+        s['total'] = total
+        s['failure_rate'] = round(s['failed'] / total, 3) if total else 0.0
+    return snapshot
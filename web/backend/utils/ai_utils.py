@@ -11,13 +11,21 @@ except ImportError:
     ollama = None
 
 import os
+import sys
 import json
 import time
-import random
-from functools import wraps
+
+from . import ai_cache
+from . import ai_metrics
+from . import ai_offline
+from . import ai_schemas
+from .ai_concurrency import single_flight, provider_limiter, AIQueueTimeout
+from .ai_router import router
+from .prompt_budget import Section, fit
 
 # Initialize the client with the API key
 _client = None
+_ollama_client = None
 
 def get_client():
     global _client
@@ -35,132 +43,293 @@ def get_client():
     return _client
 
 
-def retry_with_backoff(retries=3, backoff_in_seconds=1):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            x = 0
-            while True:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if x == retries:
-                        print(f"Failed after {retries} retries: {e}")
-                        raise
-                    sleep = (backoff_in_seconds * 2 **
-                             x + random.uniform(0, 1))
-                    time.sleep(sleep)
-                    x += 1
-        return wrapper
-    return decorator
+def get_ollama_client():
+    global _ollama_client
+    if ollama is None:
+        return None
+    if _ollama_client is None:
+        # OLLAMA_HOST is picked up by the client itself when set
+        _ollama_client = ollama.Client(timeout=float(os.environ.get("OLLAMA_TIMEOUT", 120)))
+    return _ollama_client
 
 
 def clean_json_string(s):
     """
-    Cleans a string to extract valid JSON content, removing markdown blocks and whitespace.
+    Cleans a string to extract valid JSON content, removing markdown blocks,
+    trailing commas and unterminated brackets (see ai_schemas.repair_json).
     """
     if not s:
         return "{}"
-    s = s.strip()
-    # Remove markdown blocks if present
-    if s.startswith("```"):
-        # Find the first { and the last }
-        start = s.find("{")
-        end = s.rfind("}")
-        if start != -1 and end != -1:
-            s = s[start:end+1]
-    return s
+    return ai_schemas.repair_json(s)
 
 
-def _call_ollama(prompt, response_mime_type=None):
+def _call_ollama(prompt, response_mime_type=None, timeout=None):
     """
-    Helper function to call Ollama (local AI) with optional JSON parsing.
+    Calls Ollama (local AI) and returns the raw response text; JSON is
+    decoded by _call_ai. Raises on failure so the provider router can record it.
     """
-    if ollama is None:
-        print("Ollama library not installed. Please run 'pip install ollama'.")
-        return None
-        
-    try:
-        model = os.environ.get("OLLAMA_MODEL", "llama3.2")
-        print(f"DEBUG: Calling Ollama with model '{model}'...", flush=True)
-        
-        if response_mime_type == 'application/json':
-            response = ollama.generate(model=model, prompt=prompt, format='json')
-            raw_text = response['response']
-            print(f"DEBUG: Ollama response received, parsing JSON...", flush=True)
-            try:
-                return json.loads(clean_json_string(raw_text))
-            except json.JSONDecodeError:
-                print(f"ERROR: Ollama returned invalid JSON: {raw_text[:100]}...")
-                return None
-        else:
-            response = ollama.generate(model=model, prompt=prompt)
-            print("DEBUG: Ollama response received.", flush=True)
-            return response['response']
-    except Exception as e:
-        print(f"Ollama Error: {e}", flush=True)
-        return None
+    client = get_ollama_client()
+    if client is None:
+        raise RuntimeError("Ollama library not installed. Please run 'pip install ollama'.")
 
+    model = _get_model_name("ollama")
+    print(f"DEBUG: Calling Ollama with model '{model}'...", flush=True)
+    options = {'format': 'json'} if response_mime_type == 'application/json' else {}
+    with provider_limiter.slot("ollama", timeout=timeout):
+        response = client.generate(model=model, prompt=prompt, **options)
+    ai_metrics.note_usage(response.get('prompt_eval_count'), response.get('eval_count'))
+    print("DEBUG: Ollama response received.", flush=True)
+    return response['response']
 
-@retry_with_backoff()
-def _call_ai(prompt, response_mime_type=None):
+
+def _call_gemini_api(prompt, response_mime_type=None, timeout=None):
     """
-    Generic helper function to call AI API (Gemini or Ollama).
+    Calls the Gemini API and returns the raw response text. Raises on failure
+    so the provider router can record it and move on to the next provider.
     """
-    provider = os.environ.get("AI_PROVIDER", "gemini")
-    
-    # Track current provider for UI/Status purposes (optional)
-    os.environ["CURRENT_AI_PROVIDER"] = provider
-    
-    if provider == "ollama":
-        return _call_ollama(prompt, response_mime_type)
-        
-    try:
-        client = get_client()
-        if not client:
-            print("Gemini API Client not initialized or missing. Using Ollama fallback.")
-            os.environ["CURRENT_AI_PROVIDER"] = "ollama"
-            return _call_ollama(prompt, response_mime_type)
+    client = get_client()
+    if not client:
+        raise RuntimeError("Gemini API Client not initialized or missing.")
 
-        config = types.GenerateContentConfig(
-            response_mime_type=response_mime_type) if response_mime_type else None
+    config_args = {}
+    if response_mime_type:
+        config_args['response_mime_type'] = response_mime_type
+    if timeout is not None:
+        config_args['http_options'] = types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+    config = types.GenerateContentConfig(**config_args) if config_args else None
 
-        gemini_model = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash-lite")
-        print(f"DEBUG: Calling Gemini API with model '{gemini_model}'...", flush=True)
+    gemini_model = _get_model_name("gemini")
+    print(f"DEBUG: Calling Gemini API with model '{gemini_model}'...", flush=True)
+    with provider_limiter.slot("gemini", timeout=timeout):
         response = client.models.generate_content(
             model=gemini_model,
             contents=prompt,
             config=config
         )
+    _note_gemini_usage(response)
 
-        if response_mime_type == 'application/json':
-            print("DEBUG: Gemini response received, parsing JSON...", flush=True)
-            try:
-                return json.loads(clean_json_string(response.text))
-            except json.JSONDecodeError:
-                 print(f"ERROR: Gemini returned invalid JSON. Attempting Ollama fallback.")
-                 os.environ["CURRENT_AI_PROVIDER"] = "ollama"
-                 return _call_ollama(prompt, response_mime_type)
-        
-        print("DEBUG: Gemini response received.", flush=True)
-        return response.text
+    print("DEBUG: Gemini response received.", flush=True)
+    return response.text
+
+
+def _note_gemini_usage(response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        ai_metrics.note_usage(usage.prompt_token_count, usage.candidates_token_count)
+
+
+def _stream_ollama(prompt, timeout=None):
+    """
+    Streams plain-text chunks from Ollama as they are generated.
+    """
+    client = get_ollama_client()
+    if client is None:
+        raise RuntimeError("Ollama library not installed. Please run 'pip install ollama'.")
+
+    model = _get_model_name("ollama")
+    print(f"DEBUG: Streaming from Ollama with model '{model}'...", flush=True)
+    with provider_limiter.slot("ollama", timeout=timeout):
+        for part in client.generate(model=model, prompt=prompt, stream=True):
+            if part.get('done'):
+                ai_metrics.note_usage(part.get('prompt_eval_count'), part.get('eval_count'))
+            if part['response']:
+                yield part['response']
+
+
+def _stream_gemini_api(prompt, timeout=None):
+    """
+    Streams plain-text chunks from the Gemini API as they are generated.
+    """
+    client = get_client()
+    if not client:
+        raise RuntimeError("Gemini API Client not initialized or missing.")
+
+    config = None
+    if timeout is not None:
+        config = types.GenerateContentConfig(
+            http_options=types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+        )
+
+    gemini_model = _get_model_name("gemini")
+    print(f"DEBUG: Streaming from Gemini API with model '{gemini_model}'...", flush=True)
+    with provider_limiter.slot("gemini", timeout=timeout):
+        for chunk in client.models.generate_content_stream(
+            model=gemini_model,
+            contents=prompt,
+            config=config
+        ):
+            _note_gemini_usage(chunk)
+            if chunk.text:
+                yield chunk.text
+
+
+router.register("gemini", _call_gemini_api, _stream_gemini_api)
+router.register("ollama", _call_ollama, _stream_ollama)
+router.register("offline", ai_offline.call, ai_offline.stream)
+
+
+def _get_model_name(provider):
+    if provider == "ollama":
+        return os.environ.get("OLLAMA_MODEL", "llama3.2")
+    if provider == "offline":
+        return ai_offline.model_name()
+    return os.environ.get("GEMINI_MODEL", "gemini-2.0-flash-lite")
+
+
+def _caller_name():
+    """
+    Name of the function that issued the prompt (e.g. 'analyze_resume'),
+    skipping the _call_* and _stream_* helpers in between. Used for
+    per-feature cache TTLs and metrics.
+    """
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_name.startswith(('_call', '_stream')):
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else None
+
+
+def _call_ai(prompt, response_mime_type=None, feature=None, deadline=None, schema=None):
+    """
+    Generic helper function to call AI API (Gemini or Ollama).
+    Byte-identical prompts are answered from the response cache (see ai_cache)
+    and concurrent duplicates are coalesced (see ai_concurrency). Providers
+    are picked by the router (see ai_router); deadline is a budget in seconds
+    for the whole call and defaults to AI_REQUEST_DEADLINE.
+    JSON responses are decoded (and repaired if needed) locally, validated
+    against schema when one of the ai_schemas Structs is given.
+    """
+    feature = feature or _caller_name()
+    ttl = ai_cache.ttl_for(feature)
+    provider = os.environ.get("AI_PROVIDER", "gemini")
+    key = ai_cache.make_key(provider, _get_model_name(provider), response_mime_type, prompt)
+    record = ai_metrics.start(feature, prompt)
+
+    if ttl:
+        cached = ai_cache.get(key)
+        if cached is not None:
+            print(f"DEBUG: AI cache hit for '{feature}'.", flush=True)
+            record.cache = 'hit'
+            ai_metrics.finish(record, True)
+            return cached
+    else:
+        record.cache = 'bypass'
+
+    if deadline is None:
+        deadline = float(os.environ.get("AI_REQUEST_DEADLINE", 60))
+    expires = time.monotonic() + deadline
+    upstream = {'response_chars': 0}
+
+    def generate():
+        upstream['leader'] = True
+        raw = router.call(prompt, response_mime_type, expires)
+        upstream['response_chars'] = len(raw) if isinstance(raw, str) else 0
+        if raw and response_mime_type == 'application/json':
+            return ai_schemas.decode(raw, schema, name=feature if schema is None else None)
+        return raw
+
+    # Identical prompts already in flight share a single upstream call
+    try:
+        with ai_metrics.bound(record):
+            result = single_flight.do(key, generate, timeout=max(0.0, expires - time.monotonic()))
+    except AIQueueTimeout as e:
+        # Waited on an identical in-flight call past our deadline
+        print(f"AI call timed out: {e}", flush=True)
+        ai_metrics.finish(record, False)
+        return None
+    except Exception:
+        ai_metrics.finish(record, False)
+        raise
+    if not upstream.get('leader'):
+        record.cache = 'coalesced'
+    ai_metrics.finish(record, bool(result), upstream['response_chars'],
+                      _get_model_name(record.provider) if record.provider else None)
+    # The key names the configured provider: a fallback provider's answer is
+    # not cached under it. Coalesced callers leave caching to the leader.
+    if ttl and upstream.get('leader') and not record.fallback:
+        ai_cache.put(key, result, ttl)
+    return result
+
+
+def _stream_ai(prompt, feature=None, deadline=None):
+    """
+    Streaming counterpart of _call_ai for plain-text responses. Returns a
+    generator of text chunks as the provider produces them. A cached
+    response is yielded as a single chunk, and a stream that runs to
+    completion is cached. Streams are not coalesced; closing the generator
+    stops generation upstream.
+    """
+    # Resolved here: once the generator runs, the caller's frame is gone
+    return _stream_generate(prompt, feature or _caller_name(), deadline)
+
+
+def _stream_generate(prompt, feature, deadline):
+    ttl = ai_cache.ttl_for(feature)
+    provider = os.environ.get("AI_PROVIDER", "gemini")
+    key = ai_cache.make_key(provider, _get_model_name(provider), None, prompt)
+    record = ai_metrics.start(feature, prompt)
+
+    if ttl:
+        cached = ai_cache.get(key)
+        if cached is not None:
+            print(f"DEBUG: AI cache hit for '{feature}'.", flush=True)
+            record.cache = 'hit'
+            ai_metrics.finish(record, True, len(cached))
+            yield cached
+            return
+    else:
+        record.cache = 'bypass'
+
+    if deadline is None:
+        deadline = float(os.environ.get("AI_REQUEST_DEADLINE", 60))
+    expires = time.monotonic() + deadline
+
+    parts = []
+    completed = False
+    stream = router.stream(prompt, expires)
+    try:
+        while True:
+            # The provider runs inside next(), so bind the record around it
+            with ai_metrics.bound(record):
+                chunk = next(stream, None)
+            if chunk is None:
+                completed = True
+                break
+            parts.append(chunk)
+            yield chunk
     except Exception as e:
-        print(f"Gemini API Error: {e}. Attempting Ollama fallback.", flush=True)
-        os.environ["CURRENT_AI_PROVIDER"] = "ollama"
-        return _call_ollama(prompt, response_mime_type)
+        # Provider broke off mid-answer; keep what was sent, cache nothing
+        print(f"Error streaming AI response: {e}", flush=True)
+        return
+    finally:
+        stream.close()
+        ai_metrics.finish(record, bool(parts), sum(len(p) for p in parts),
+                          _get_model_name(record.provider) if record.provider else None)
+    if ttl and parts and completed and not record.fallback:
+        ai_cache.put(key, "".join(parts), ttl)
 
 
-def _call_gemini(prompt, response_mime_type=None):
+def _call_gemini(prompt, response_mime_type=None, feature=None, deadline=None, schema=None):
     """
     Legacy alias for _call_ai.
     """
-    return _call_ai(prompt, response_mime_type)
+    return _call_ai(prompt, response_mime_type, feature=feature, deadline=deadline, schema=schema)
+
+
+# Bump when the analyze_resume prompt or schema changes; stored analyses
+# from an older version are no longer reused for identical uploads
+ANALYZE_RESUME_PROMPT_VERSION = 1
 
 
 def analyze_resume(resume_text, job_description):
     """
     Analyzes a resume against a job description using the Gemini API.
     """
+    parts = fit('analyze_resume', [
+        Section('resume', resume_text, budget=3000, priority=2),
+        Section('job_description', job_description, budget=1500, priority=1),
+    ])
+    resume_text, job_description = parts['resume'], parts['job_description']
+
     prompt = f"""Analyze the following resume and return a JSON object with the following structure:
     {{
         "name": "<The candidate's name>",
@@ -216,12 +385,16 @@ def analyze_resume(resume_text, job_description):
     In the 'ai_summary', also provide a semantic match score (out of 100) between the resume and the job description, and suggest specific areas where the resume could be improved to better align with the job description's requirements, even if exact keywords are not present. Focus on conceptual alignment and thematic relevance.
     """
 
-    result = _call_gemini(prompt, response_mime_type='application/json')
+    result = _call_gemini(prompt, response_mime_type='application/json', schema=ai_schemas.ResumeAnalysis)
 
     if not result:
+        # Skills can still be found locally when the provider fails.
+        # analysis_error keeps this placeholder from being reused for later uploads.
+        from .skill_extractor import extract_skills
         return {
+            "analysis_error": True,
             "resume_score": 0,
-            "actual_skills": [],
+            "actual_skills": extract_skills(resume_text),
             "matching_skills": [],
             "missing_skills": [],
             "ai_summary": "Error during analysis. Please try again.",
@@ -253,14 +426,12 @@ def generate_job_description(job_title):
     return _call_gemini(prompt) or "Error generating job description."
 
 
-def get_interview_question(answer, stage="continue", resume_context=None,
+INTERVIEW_QUESTION_FALLBACK = "I'm sorry, I had an issue generating the next question. Let's try again."
+
+
+def _build_interview_prompt(answer, stage="continue", resume_context=None,
                             interview_type="mixed", difficulty="medium", agent="aura",
                             round_number=1, conversation_history=None):
-    """
-    Gets the next interview question from the Gemini API.
-    Supports adaptive difficulty, interview types, agent personas,
-    round-based progression, and conversation history for coherent follow-ups.
-    """
     if stage == "start":
         prompt = "You are an interviewer. Your first question is: 'Tell me about yourself.'"
     else:
@@ -332,7 +503,36 @@ def get_interview_question(answer, stage="continue", resume_context=None,
         
         Keep your response conversational but strictly adhere to your Persona's style. Never repeat a question from the history.
         """
-    return _call_gemini(prompt) or "I'm sorry, I had an issue generating the next question. Let's try again."
+    return prompt
+
+
+def get_interview_question(answer, stage="continue", resume_context=None,
+                           interview_type="mixed", difficulty="medium", agent="aura",
+                           round_number=1, conversation_history=None):
+    """
+    Gets the next interview question from the Gemini API.
+    Supports adaptive difficulty, interview types, agent personas,
+    round-based progression, and conversation history for coherent follow-ups.
+    """
+    prompt = _build_interview_prompt(
+        answer, stage, resume_context, interview_type, difficulty,
+        agent, round_number, conversation_history
+    )
+    return _call_gemini(prompt) or INTERVIEW_QUESTION_FALLBACK
+
+
+def stream_interview_question(answer, stage="continue", resume_context=None,
+                              interview_type="mixed", difficulty="medium", agent="aura",
+                              round_number=1, conversation_history=None):
+    """
+    Same as get_interview_question, but yields the text in chunks as the
+    provider generates it. Yields nothing if no provider could answer.
+    """
+    prompt = _build_interview_prompt(
+        answer, stage, resume_context, interview_type, difficulty,
+        agent, round_number, conversation_history
+    )
+    return _stream_ai(prompt, feature='get_interview_question')
 
 
 def generate_mock_test(topic, num_questions=5):
@@ -458,15 +658,20 @@ def refine_experience_points(role, raw_text):
 def generate_cover_letter(resume_text, job_description):
     """
     Generates a personalized cover letter based on resume and job description.
+    resume_text is the compact resume digest (see resume_digest.get_resume_digest).
     """
+    job_description = fit('generate_cover_letter', [
+        Section('job_description', job_description, budget=1000),
+    ])['job_description']
+
     prompt = f"""
     You are an expert career consultant. Write a highly persuasive, professional cover letter for a candidate based on their resume and the target job description.
     
     Resume Context:
-    {resume_text[:4000]}
+    {resume_text}
     
     Job Description:
-    {job_description[:2000]}
+    {job_description}
     
     Instructions:
     - Return ONLY a JSON object with a single key: "cover_letter_text".
@@ -535,7 +740,15 @@ def tailor_resume_to_job(resume_text, job_description):
     """
     Tailors a resume to a specific job description using Gemini.
     Returns a JSON object compatible with generate_resume_pdf_from_profile.
+    resume_text is the full extracted resume (not the digest): rewriting
+    needs every role's bullets, not just titles and dates.
     """
+    parts = fit('tailor_resume_to_job', [
+        Section('resume', resume_text, budget=3000, priority=2),
+        Section('job_description', job_description, budget=1500, priority=1),
+    ])
+    resume_text, job_description = parts['resume'], parts['job_description']
+
     prompt = f"""
     You are an expert Resume Writer and Career Strategist.
     Your task is to rewrite the provided resume to specifically target the given job description.
@@ -592,16 +805,40 @@ def tailor_resume_to_job(resume_text, job_description):
     return _call_gemini(prompt, response_mime_type='application/json')
 
 
-def simulate_ats_parsing(resume_text):
+def _layout_notes(layout):
+    """One line per laid-out page of a ResumeDocument.layout, plus how the text was obtained."""
+    if not layout:
+        return "Not available."
+    notes = [f"Page {n}: {page.get('columns', 1)} column(s), {page.get('text_boxes', 0)} text boxes, "
+             f"{page.get('lines', 0)} lines, {page.get('images', 0)} images, {page.get('figures', 0)} figures"
+             for n, page in enumerate(layout.get('pages') or [], 1)]
+    if layout.get('truncated'):
+        notes.append("Only the first pages were laid out; the resume is longer.")
+    if layout.get('ocr'):
+        notes.append("The PDF has no selectable text; this text was recovered by OCR from page images.")
+    return "\n    ".join(notes) or "Not available."
+
+
+def simulate_ats_parsing(resume_text, layout=None):
     """
     Simulates how an ATS system parses a resume and identifies potential issues.
+    resume_text is the text extracted from the uploaded PDF (not the digest,
+    which is rebuilt with clean headers) and layout its ResumeDocument.layout
+    statistics, so column and table problems can be judged.
     """
+    resume_text = fit('simulate_ats_parsing', [
+        Section('resume', resume_text, budget=3000),
+    ])['resume']
+
     prompt = f"""
     You are an expert in Applicant Tracking Systems (ATS).
     Analyze the following resume text as if you were a machine parsing it.
     
     Resume Text:
-    {resume_text[:5000]}
+    {resume_text}
+
+    PDF Layout (measured from the file):
+    {_layout_notes(layout)}
     
     Task:
     1. Identify 'Parse Failures': Sections where the text might be garbled due to columns, tables, or weird symbols.
@@ -619,22 +856,27 @@ def simulate_ats_parsing(resume_text):
         "ats_friendly_score": <Int>
     }}
     """
-    return _call_gemini(prompt, response_mime_type='application/json')
+    return _call_gemini(prompt, response_mime_type='application/json', schema=ai_schemas.AtsResult)
 
 
 def analyze_market_trends(job_descriptions_sample, user_skills_summary):
     """
     Analyzes the gap between market demand (jobs) and user supply (skills).
     """
+    parts = fit('analyze_market_trends', [
+        Section('job_descriptions', job_descriptions_sample, budget=2500, priority=1),
+        Section('user_skills', user_skills_summary, budget=1000),
+    ])
+
     prompt = f"""
     You are a Chief Labor Economist for a recruitment platform.
     
     Data Provided:
     1. Sample of Recent Job Postings (Market Demand):
-    {job_descriptions_sample[:10000]} ... (truncated)
+    {parts['job_descriptions']}
     
     2. Summary of User Skills (Talent Supply):
-    {user_skills_summary}
+    {parts['user_skills']}
     
     Task:
     Perform a Market Gap Analysis. Identify specific skills that are in high demand but low supply among our users.
@@ -648,14 +890,19 @@ def analyze_market_trends(job_descriptions_sample, user_skills_summary):
         "market_health_score": 75
     }}
     """
-    return _call_gemini(prompt, response_mime_type='application/json')
+    return _call_gemini(prompt, response_mime_type='application/json', schema=ai_schemas.MarketTrends)
 
 
 def generate_interview_report(transcript):
     """
     Generates a detailed performance report from an interview transcript.
     Includes per-category scoring, STAR method adherence, and per-question breakdown.
+    Long transcripts keep every turn, with long answers shortened.
     """
+    transcript = fit('generate_interview_report', [
+        Section('transcript', transcript, budget=5000, keep='lines'),
+    ])['transcript']
+
     prompt = f"""
     You are an expert Interview Coach and Assessment Specialist. Analyze the following interview transcript and provide a comprehensive report card.
     
@@ -682,12 +929,13 @@ def generate_interview_report(transcript):
     
     Return ONLY the JSON.
     """
-    return _call_gemini(prompt, response_mime_type='application/json')
+    return _call_gemini(prompt, response_mime_type='application/json', schema=ai_schemas.InterviewReport)
 
 
 def analyze_dream_job(resume_text, target_role):
     """
     Compares current resume against a target dream role.
+    resume_text is the compact resume digest (see resume_digest.get_resume_digest).
     """
     prompt = f"""
     You are a Strategic Career Planner. 
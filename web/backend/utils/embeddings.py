@@ -0,0 +1,185 @@
+import os
+import time
+import hashlib
+import threading
+import numpy as np
+
+# Text embeddings with a content-addressed disk cache.
+# Vectors are keyed by hash(model, text), so re-indexing unchanged jobs,
+# re-uploading the same resume or repeating a search never runs the model
+# again. The cache is a directory of append-only segments: each write adds
+# a <name>.vec.npy (float16 by default, 768 bytes for a 384-d vector) and a
+# <name>.keys.npy with the matching 32-byte keys. Segments are memory-mapped,
+# so workers share the pages and a lookup only reads the rows it needs.
+# Writers never modify a segment; small segments are merged once there are
+# more than MAX_SEGMENTS of them.
+
+# Chroma's default embedding function, which the existing collections were
+# built with
+MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+MAX_SEGMENTS = 64
+
+_lock = threading.Lock()
+_embedder = None
+_index = {}        # key -> (segment number, row)
+_segments = []     # memory-mapped vector arrays
+_loaded = set()    # segment names already in _index
+_counter = 0
+
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _enabled():
+    return os.environ.get("EMBEDDING_CACHE", "true").lower() in ('true', 'on', '1')
+
+
+def _dtype():
+    return np.float32 if os.environ.get("EMBEDDING_CACHE_DTYPE", "float16") == "float32" else np.float16
+
+
+def _get_dir():
+    default = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'embeddings')
+    return os.environ.get("EMBEDDING_CACHE_DIR", default)
+
+
+def make_key(text, model=None):
+    h = hashlib.sha256()
+    for part in (model or MODEL, text):
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\x00')
+    return h.digest()
+
+
+def _compute(texts):
+    """Runs the model. Returns a float32 array of shape (len(texts), dim)."""
+    global _embedder
+    if _embedder is None:
+        # local import: chromadb loads onnxruntime and the model on first use
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+        _embedder = DefaultEmbeddingFunction()
+    return np.asarray(_embedder(list(texts)), dtype=np.float32)
+
+
+def _refresh():
+    # Pick up segments written by other workers (or merged) since last look
+    path = _get_dir()
+    if not os.path.isdir(path):
+        return
+    for name in sorted(os.listdir(path)):
+        if not name.endswith('.keys.npy'):
+            continue
+        segment = name[:-len('.keys.npy')]
+        if segment in _loaded:
+            continue
+        try:
+            keys = np.load(os.path.join(path, name))
+            vectors = np.load(os.path.join(path, segment + '.vec.npy'), mmap_mode='r')
+        except Exception as e:
+            # Being replaced by a merge; the merged segment has the same keys
+            print(f"Embedding cache: skipping segment {segment} ({e})")
+            continue
+        number = len(_segments)
+        _segments.append(vectors)
+        _loaded.add(segment)
+        for row, key in enumerate(keys):
+            _index[bytes(key)] = (number, row)
+
+
+def _write_segment(keys, vectors):
+    global _counter
+    path = _get_dir()
+    os.makedirs(path, exist_ok=True)
+    _counter += 1
+    segment = f"{int(time.time() * 1000):013d}-{os.getpid()}-{_counter}"
+    # Vectors first: a segment exists once its keys file does
+    for suffix, array in (('.vec.npy', vectors.astype(_dtype())), ('.keys.npy', np.array(keys, dtype='S32'))):
+        tmp = os.path.join(path, f".{segment}{suffix}.tmp")
+        with open(tmp, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, os.path.join(path, segment + suffix))
+    return segment
+
+
+def _merge():
+    """Rewrites all segments as one, if no other worker is doing so."""
+    path = _get_dir()
+    lock = os.path.join(path, '.merge.lock')
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL)
+    except FileExistsError:
+        return
+    try:
+        _refresh()
+        old = [name[:-len('.keys.npy')] for name in os.listdir(path) if name.endswith('.keys.npy')]
+        keys = list(_index)
+        vectors = np.stack([_segments[s][r] for s, r in _index.values()]) if keys else None
+        if vectors is None:
+            return
+        merged = _write_segment(keys, vectors)
+        for segment in old:
+            for suffix in ('.keys.npy', '.vec.npy'):
+                try:
+                    os.remove(os.path.join(path, segment + suffix))
+                except FileNotFoundError:
+                    pass
+        _index.clear()
+        _segments.clear()
+        _loaded.clear()
+        _refresh()
+        print(f"DEBUG: Embedding cache merged {len(old)} segments into {merged}.", flush=True)
+    finally:
+        os.close(fd)
+        os.remove(lock)
+
+
+def embed(texts):
+    """
+    Embeddings of texts as a float32 array (one row per text), computing
+    only those not in the cache, in a single model call.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if not _enabled():
+        return _compute(texts)
+
+    keys = [make_key(text) for text in texts]
+    rows = [None] * len(texts)
+    with _lock:
+        if any(key not in _index for key in keys):
+            _refresh()
+        for i, key in enumerate(keys):
+            if key in _index:
+                segment, row = _index[key]
+                rows[i] = np.asarray(_segments[segment][row], dtype=np.float32)
+
+    missing = {}
+    for i, row in enumerate(rows):
+        if row is None:
+            missing.setdefault(keys[i], []).append(i)
+    _stats['hits'] += len(texts) - sum(len(v) for v in missing.values())
+    _stats['misses'] += len(missing)
+    if missing:
+        vectors = _compute([texts[positions[0]] for positions in missing.values()])
+        for vector, positions in zip(vectors, missing.values()):
+            for i in positions:
+                rows[i] = vector
+        with _lock:
+            try:
+                _write_segment(list(missing), vectors)
+                _refresh()
+                if len(_segments) > MAX_SEGMENTS:
+                    _merge()
+            except Exception as e:
+                print(f"Embedding cache write error: {e}")
+    return np.stack(rows)
+
+
+def get_stats():
+    return {
+        'model': MODEL,
+        'entries': len(_index),
+        'segments': len(_segments),
+        'hits': _stats['hits'],
+        'misses': _stats['misses'],
+    }
@@ -1,37 +1,129 @@
-from pdfminer.high_level import extract_text
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams, LTContainer, LTText, LTTextBox, LTImage, LTFigure
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
 from pdfminer.pdfparser import PDFParser
 from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+
+SCANNED_PDF_MESSAGE = "Error: This PDF appears to be a scanned image. Please upload a text-based PDF."
+
+
+def _page_count(document):
+    try:
+        count = resolve1(document.catalog['Pages']).get('Count')
+        if isinstance(count, int):
+            return count
+    except Exception:
+        pass
+    return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def _layout_text(item, out, stats):
+    # Same output as pdfminer's TextConverter, so text matches extract_text
+    if isinstance(item, LTContainer):
+        if isinstance(item, LTFigure):
+            stats['figures'] += 1
+        for child in item:
+            _layout_text(child, out, stats)
+    elif isinstance(item, LTText):
+        out.append(item.get_text())
+    elif isinstance(item, LTImage):
+        stats['images'] += 1
+    if isinstance(item, LTTextBox):
+        out.append("\n")
+        stats['text_boxes'] += 1
+        stats['box_x0'].append(item.x0)
+
+
+def parse_pdf(pdf_path, max_pages=None):
+    """
+    Parses a PDF once and returns its text together with the page count and
+    per-page layout statistics:
+        {'text', 'page_count', 'pages': [{'text', 'chars', 'lines',
+         'text_boxes', 'images', 'figures', 'columns'}], 'truncated'}
+    Only the first max_pages pages are laid out (all if None); page_count
+    is always the full count. Raises on unreadable files.
+    """
+    with open(pdf_path, 'rb') as f:
+        document = PDFDocument(PDFParser(f))
+        page_count = _page_count(document)
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+        pages = []
+        for i, page in enumerate(PDFPage.create_pages(document)):
+            if max_pages and i >= max_pages:
+                break
+            interpreter.process_page(page)
+            layout = device.get_result()
+            out = []
+            stats = {'text_boxes': 0, 'images': 0, 'figures': 0, 'box_x0': []}
+            _layout_text(layout, out, stats)
+            out.append("\f")
+            text = "".join(out)
+
+            # Text boxes starting in the right half next to ones on the left
+            # usually mean a two-column layout, which many ATS garble
+            left = any(x0 < layout.width * 0.25 for x0 in stats['box_x0'])
+            right = any(x0 > layout.width * 0.45 for x0 in stats['box_x0'])
+            pages.append({
+                'text': text,
+                'chars': len(text.strip()),
+                'lines': sum(1 for line in text.splitlines() if line.strip()),
+                'text_boxes': stats['text_boxes'],
+                'images': stats['images'],
+                'figures': stats['figures'],
+                'columns': 2 if left and right else 1,
+            })
+
+    return {
+        'text': "".join(p['text'] for p in pages),
+        'page_count': page_count,
+        'pages': pages,
+        'truncated': len(pages) < page_count,
+    }
 
 
 def get_pdf_page_count(pdf_path):
     try:
         with open(pdf_path, 'rb') as f:
-            parser = PDFParser(f)
-            document = PDFDocument(parser)
-            return len(list(PDFPage.create_pages(document)))
+            return _page_count(PDFDocument(PDFParser(f)))
     except:
         return 0
 
 
-def extract_text_from_pdf(pdf_path):
+def resume_text_from(parsed, pdf_path=None):
     """
-    Extracts text from a PDF file. Focuses on direct extraction for speed.
-    OCR is disabled to prevent hangs on Windows systems without Tesseract.
+    Resume text of a parse_pdf result. When the PDF has no selectable text
+    and pdf_path is given, the pages are OCR'd (see utils/ocr.py) and the
+    OCR stats are added to parsed as 'ocr'. Returns the scanned-image error
+    message if that is not possible either.
+    """
+    text = parsed['text']
+    if text and len(text.strip()) > 50:
+        return text
+    print("DEBUG: PDF appears to be an image or has no selectable text.", flush=True)
+    if pdf_path:
+        from . import ocr
+        result = ocr.ocr_pdf(pdf_path, parsed['page_count'])
+        if result and len(result['text'].strip()) > 50:
+            parsed['ocr'] = {k: v for k, v in result.items() if k != 'text'}
+            return result['text']
+    return SCANNED_PDF_MESSAGE
+
+
+def extract_text_from_pdf(pdf_path, max_pages=None):
+    """
+    Extracts text from a PDF file. Focuses on direct extraction for speed;
+    scanned PDFs are OCR'd in a process pool when Tesseract is installed.
     """
     print(f"DEBUG: Starting text extraction for {pdf_path}...", flush=True)
     try:
-        # Try direct text extraction
-        print("DEBUG: Trying direct text extraction...", flush=True)
-        direct_text = extract_text(pdf_path)
-        
-        if direct_text and len(direct_text.strip()) > 50:
-            print(f"DEBUG: Extraction successful ({len(direct_text)} chars).", flush=True)
-            return direct_text
-        
-        print("DEBUG: PDF appears to be an image or has no selectable text.", flush=True)
-        return "Error: This PDF appears to be a scanned image. Please upload a text-based PDF."
-
+        text = resume_text_from(parse_pdf(pdf_path, max_pages), pdf_path)
+        print(f"DEBUG: Extraction done ({len(text)} chars).", flush=True)
+        return text
     except Exception as e:
         print(f"DEBUG: Error during extraction: {e}", flush=True)
         return ""
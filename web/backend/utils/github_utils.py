@@ -1,6 +1,7 @@
 import requests
 import base64
 from .ai_utils import _call_gemini
+from .ai_schemas import GitHubAudit
 
 GITHUB_API_URL = "https://api.github.com"
 
@@ -87,7 +88,7 @@ def analyze_github_profile(username):
     }}
     """
     
-    result = _call_gemini(prompt, response_mime_type='application/json')
+    result = _call_gemini(prompt, response_mime_type='application/json', schema=GitHubAudit)
     if not result:
         return {"error": "AI analysis failed."}
     
@@ -71,8 +71,8 @@ class Homeostasis:
     @staticmethod
     def get_system_status():
         """Returns overall system health and maintenance status for the frontend."""
-        import os
-        ai_provider = os.environ.get("CURRENT_AI_PROVIDER", "ollama")
+        from .ai_router import router
+        ai_provider = router.get_active_provider()
         
         return {
             'health': SystemSetting.get_setting('system_health', 'nominal'),
@@ -0,0 +1,156 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import Counter
+
+# In-process keyword search over job postings (BM25).
+# An inverted index term -> {job_id: term frequency} over title,
+# requirements and description. Each worker builds it from the database
+# on first use, applies its own creates, edits and deletes as they happen,
+# and rebuilds every REFRESH_SECONDS to pick up other workers' changes.
+# Exact terms such as "terraform", "c++" or "cka" score here even when the
+# dense embedding of a posting barely reflects them.
+
+K1 = 1.2
+B = 0.75
+REFRESH_SECONDS = float(os.environ.get("KEYWORD_INDEX_REFRESH", 300))
+
+# Words kept together: "c++", "c#", "node.js", "ci/cd"
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#./-]*[a-z0-9+#]|[a-z0-9]")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our that the this to we will with
+you your who what which their they them can all any into per via
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}   # term -> {doc_id: tf}
+        self._terms = {}      # doc_id -> Counter of its terms
+        self._lengths = {}    # doc_id -> number of terms
+        self._total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._terms)
+
+    def add(self, doc_id, text):
+        """Indexes a document, replacing an earlier version with the same id."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            self._terms[doc_id] = terms
+            self._lengths[doc_id] = sum(terms.values())
+            self._total_len += self._lengths[doc_id]
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self._terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query, n_results=10, accept=None):
+        """
+        [(doc_id, score)] for the best n_results documents, best first;
+        only documents for which accept(doc_id) is true, if given.
+        """
+        with self._lock:
+            n = len(self._terms)
+            if not n:
+                return []
+            avg_len = self._total_len / n
+            scores = Counter()
+            for term, qtf in Counter(tokenize(query)).items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_len)
+                    scores[doc_id] += qtf * idf * tf * (self.k1 + 1) / norm
+        if accept is not None:
+            scores = Counter({doc_id: score for doc_id, score in scores.items() if accept(doc_id)})
+        return scores.most_common(n_results)
+
+
+def job_text(title, description, requirements=None):
+    return "\n".join(part for part in (title, requirements, description) if part)
+
+
+_job_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+
+
+def _build():
+    from ..models import JobPosting
+    index = BM25Index()
+    last = 0
+    while True:
+        # Keyset pages keep memory flat with many postings
+        rows = JobPosting.query.with_entities(JobPosting.id, JobPosting.title, JobPosting.description,
+                                              JobPosting.requirements) \
+            .filter(JobPosting.id > last).order_by(JobPosting.id).limit(1000).all()
+        for job_id, title, description, requirements in rows:
+            index.add(job_id, job_text(title, description, requirements))
+        if len(rows) < 1000:
+            break
+        last = rows[-1][0]
+    print(f"DEBUG: Keyword index built over {len(index)} jobs.", flush=True)
+    return index
+
+
+def get_job_index():
+    """
+    The worker's job index, built on first use and rebuilt every
+    REFRESH_SECONDS. Needs an application context.
+    """
+    global _job_index, _built_at
+    if _job_index is not None and time.monotonic() - _built_at < REFRESH_SECONDS:
+        return _job_index
+    with _build_lock:
+        if _job_index is None or time.monotonic() - _built_at >= REFRESH_SECONDS:
+            _job_index = _build()
+            _built_at = time.monotonic()
+    return _job_index
+
+
+def update_job(job_id, title, description, requirements=None):
+    """Applies a created or edited posting to this worker's index, if built."""
+    if _job_index is not None:
+        _job_index.add(job_id, job_text(title, description, requirements))
+
+
+def remove_job(job_id):
+    if _job_index is not None:
+        _job_index.remove(job_id)
+
+
+def reset():
+    """Forget the built index (tests switch databases)."""
+    global _job_index
+    _job_index = None
+
+
+def search_jobs(query, n_results=10, accept=None):
+    """[(job_id, score)] of postings matching query's keywords (see BM25Index.search)."""
+    return get_job_index().search(query, n_results, accept)
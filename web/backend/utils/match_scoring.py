@@ -0,0 +1,109 @@
+import numpy as np
+
+# Local resume/job match scores.
+# Jobs and the user's resume are sets of canonical skill ids (see
+# utils/skill_registry.py). All jobs are laid out as one boolean matrix
+# (jobs x skills) and scored against the user's skill vector in a few
+# vectorized operations:
+#   coverage - share of the job's required skills the user has, each
+#              skill weighted by how rare it is across jobs (a skill every
+#              posting asks for says less about fit than a niche one)
+#   jaccard  - overlap of the two skill sets, which also rewards resumes
+#              that are focused on what the job needs
+# score = 100 * (COVERAGE_WEIGHT * coverage + (1 - COVERAGE_WEIGHT) * jaccard)
+
+COVERAGE_WEIGHT = 0.8
+
+
+def score_jobs(user_skill_ids, jobs):
+    """
+    Scores jobs, a list of (job_id, skill_ids), against the user's skill
+    ids. Returns {job_id: {'score', 'coverage', 'jaccard', 'matched',
+    'missing'}}; matched and missing are skill ids, missing ordered rarest
+    first. Jobs without known skills get a score of None.
+    """
+    vocab = {}
+    rows, cols = [], []
+    for row, (_, skill_ids) in enumerate(jobs):
+        for skill_id in set(skill_ids or []):
+            rows.append(row)
+            cols.append(vocab.setdefault(skill_id, len(vocab)))
+
+    required = np.zeros((len(jobs), len(vocab)), dtype=bool)
+    required[rows, cols] = True
+    user_set = set(user_skill_ids or [])
+    user = np.zeros(len(vocab), dtype=bool)
+    user[[vocab[s] for s in user_set if s in vocab]] = True
+
+    # Inverse document frequency of each skill across jobs
+    df = required.sum(axis=0)
+    idf = np.log((1 + len(jobs)) / (1 + df)) + 1.0
+
+    matched = required & user
+    required_weight = required @ idf
+    coverage = np.divide(matched @ idf, required_weight,
+                         out=np.zeros(len(jobs)), where=required_weight > 0)
+    overlap = matched.sum(axis=1)
+    union = required.sum(axis=1) + len(user_set) - overlap
+    jaccard = np.divide(overlap, union, out=np.zeros(len(jobs)), where=union > 0)
+    scores = np.rint(100 * (COVERAGE_WEIGHT * coverage + (1 - COVERAGE_WEIGHT) * jaccard))
+
+    skill_at = np.array(list(vocab), dtype=np.int64)
+    rarest_first = np.argsort(-idf, kind='stable')
+    results = {}
+    for row, (job_id, _) in enumerate(jobs):
+        if not required_weight[row]:
+            results[job_id] = {'score': None, 'coverage': 0.0, 'jaccard': 0.0, 'matched': [], 'missing': []}
+            continue
+        order = rarest_first[required[row][rarest_first]]
+        results[job_id] = {
+            'score': int(scores[row]),
+            'coverage': round(float(coverage[row]), 3),
+            'jaccard': round(float(jaccard[row]), 3),
+            'matched': [int(s) for s in skill_at[order[user[order]]]],
+            'missing': [int(s) for s in skill_at[order[~user[order]]]],
+        }
+    return results
+
+
+def describe(match, names, limit=3):
+    """One-line reason for a score_jobs result; names maps skill ids to names."""
+    if match['score'] is None:
+        return "No recognised skills in this posting."
+    total = len(match['matched']) + len(match['missing'])
+    reason = f"You have {len(match['matched'])} of {total} key skills"
+    if match['missing']:
+        missing = names(match['missing'][:limit])
+        reason += "; missing " + ", ".join(missing)
+        if len(match['missing']) > limit:
+            reason += f" and {len(match['missing']) - limit} more"
+    return reason + "."
+
+
+def user_match_scores(user_data, job_ids=None):
+    """
+    Scores every job posting against a UserData row (its latest resume).
+    Returns {job_id: result} as score_jobs, limited to job_ids if given, with
+    a 'reason' added. IDF weights always come from all postings.
+    """
+    from ..models import JobPosting
+    from .skill_registry import get_registry, user_skill_ids, job_skill_ids
+
+    registry = get_registry()
+    jobs = JobPosting.query.with_entities(JobPosting.id, JobPosting.skill_ids).all()
+    stale = [job_id for job_id, skill_ids in jobs if skill_ids is None]
+    if stale:
+        # Postings stored before skills were normalized (see update_db_schema)
+        texts = {job.id: job for job in JobPosting.query.filter(JobPosting.id.in_(stale)).all()}
+        jobs = [(job_id, skill_ids if skill_ids is not None else
+                 job_skill_ids(texts[job_id].title, texts[job_id].description, texts[job_id].requirements,
+                               create=False))
+                for job_id, skill_ids in jobs]
+
+    results = score_jobs(user_skill_ids(user_data), jobs)
+    if job_ids is not None:
+        wanted = set(job_ids)
+        results = {job_id: r for job_id, r in results.items() if job_id in wanted}
+    for result in results.values():
+        result['reason'] = describe(result, registry.names)
+    return results
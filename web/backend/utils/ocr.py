@@ -0,0 +1,117 @@
+try:
+    import pytesseract
+    from pdf2image import convert_from_path
+except ImportError:
+    pytesseract = None
+    convert_from_path = None
+
+import os
+import time
+import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# OCR fallback for scanned resumes.
+# Pages are rendered (poppler) and recognised (tesseract) in a separate
+# process pool, so the CPU-heavy work never runs on the web worker's event
+# loop. The caller only polls for finished pages, yielding in between, and
+# stops waiting once the per-document time budget is spent.
+
+OCR_ENABLED = os.environ.get("OCR_ENABLED", "true").lower() == "true"
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", 2))
+OCR_MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", 3))
+OCR_DPI = int(os.environ.get("OCR_DPI", 200))
+# Pages are scaled down to at most this width in pixels, whatever their
+# size in the PDF (about 200 DPI for A4/Letter)
+OCR_MAX_WIDTH = int(os.environ.get("OCR_MAX_WIDTH", 1700))
+OCR_TIMEOUT = float(os.environ.get("OCR_TIMEOUT", 30))
+
+_pool = None
+
+
+def available():
+    return (OCR_ENABLED and pytesseract is not None and convert_from_path is not None
+            and shutil.which("tesseract") is not None and shutil.which("pdftoppm") is not None)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn, not fork: a forked copy of a monkey-patched (eventlet) worker
+        # would inherit its hub and open sockets
+        _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _ocr_page(pdf_path, page_number, dpi, max_width, deadline):
+    """
+    Runs in a pool process: renders one page (1-based) and returns its text.
+    poppler and tesseract are killed once the document's deadline (a
+    time.time() value) passes, so a page past the budget frees its pool
+    process instead of keeping it busy for later uploads.
+    """
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("time budget spent before the page started")
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number,
+                               grayscale=True, size=(max_width, None), timeout=remaining)
+    if not images:
+        return ""
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("time budget spent while rendering the page")
+    return pytesseract.image_to_string(images[0], timeout=remaining)
+
+
+def _wait(futures, deadline):
+    # Poll instead of blocking in result() so the event loop (eventlet under
+    # gunicorn) keeps serving other requests meanwhile
+    from ..extensions import socketio
+    sleep = socketio.sleep if socketio.server is not None else time.sleep
+    while time.monotonic() < deadline and not all(f.done() for f in futures):
+        sleep(0.05)
+
+
+def ocr_pdf(pdf_path, page_count, max_pages=None, timeout=None):
+    """
+    OCRs the first max_pages pages of a PDF in parallel within timeout
+    seconds. Returns {'text', 'pages', 'truncated', 'seconds'}; pages that
+    did not finish in time or failed are left out. Returns None if OCR is not
+    available here.
+    """
+    if not available():
+        return None
+    max_pages = max_pages or OCR_MAX_PAGES
+    timeout = timeout or OCR_TIMEOUT
+    pages = min(page_count or 1, max_pages)
+    started = time.monotonic()
+    # Wall-clock deadline: the pool processes compare it against their own clock
+    deadline = time.time() + timeout
+
+    pool = _get_pool()
+    futures = [pool.submit(_ocr_page, pdf_path, n, OCR_DPI, OCR_MAX_WIDTH, deadline)
+               for n in range(1, pages + 1)]
+    _wait(futures, started + timeout)
+
+    texts = []
+    for n, future in enumerate(futures, 1):
+        if not future.done():
+            # Queued pages are dropped; a running one stops at its own deadline
+            future.cancel()
+            print(f"DEBUG: OCR of page {n} of {pdf_path} exceeded the time budget.", flush=True)
+            continue
+        try:
+            texts.append(future.result())
+        except Exception as e:
+            print(f"DEBUG: OCR of page {n} of {pdf_path} failed: {e}", flush=True)
+
+    seconds = round(time.monotonic() - started, 2)
+    print(f"DEBUG: OCR finished {len(texts)}/{pages} pages in {seconds}s.", flush=True)
+    return {
+        'text': "\f".join(texts),
+        'pages': len(texts),
+        'truncated': len(texts) < (page_count or 1),
+        'complete': len(texts) == pages,  # every page asked for finished in time
+        'seconds': seconds,
+    }
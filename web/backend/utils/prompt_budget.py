@@ -0,0 +1,185 @@
+import os
+import threading
+
+# Token budgets for the variable parts of a prompt.
+# A prompt builder declares its sections (resume, job description,
+# transcript, chat history, ...) with a budget and a priority, and fit()
+# trims each section to its budget and then, if the prompt as a whole is
+# still over AI_PROMPT_MAX_TOKENS, trims the lowest-priority sections
+# further. Sizes before and after trimming are counted per feature.
+
+# Budget for all sections of one prompt together (the fixed instructions
+# of the template come on top of this)
+DEFAULT_MAX_TOKENS = int(os.environ.get("AI_PROMPT_MAX_TOKENS", 6000))
+
+TRIM_MARKER = "[...]"
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """
+    Rough token count: 4 bytes of UTF-8 per token. Overestimates English a
+    little and keeps non-Latin scripts from slipping under the budget.
+    """
+    if not text:
+        return 0
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+class Section:
+    """
+    One variable part of a prompt.
+    keep says which part survives trimming: 'head' (start of the text, e.g.
+    a resume), 'tail' (the most recent lines, e.g. chat history) or 'lines'
+    (every line, each shortened evenly, e.g. an interview transcript).
+    Higher priority sections are trimmed last.
+    """
+
+    def __init__(self, name, text, budget=None, priority=0, keep='head'):
+        self.name = name
+        self.text = text or ""
+        self.budget = budget
+        self.priority = priority
+        self.keep = keep
+
+
+def _cut(text, max_tokens):
+    """
+    Shortens a single piece of text to max_tokens at a word boundary.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    limit = max(1, len(text) * max_tokens // estimate_tokens(text) - 1)
+    cut = text[:limit]
+    if " " in cut[limit // 2:]:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "…"
+
+
+def _keep_head(lines, max_tokens):
+    kept, used = [], estimate_tokens(TRIM_MARKER)
+    for line in lines:
+        size = estimate_tokens(line) + 1
+        if used + size > max_tokens:
+            if not kept:
+                kept.append(_cut(line, max_tokens - used))
+            break
+        kept.append(line)
+        used += size
+    return "\n".join(kept + [TRIM_MARKER])
+
+
+def _keep_tail(lines, max_tokens):
+    kept, used = [], estimate_tokens(TRIM_MARKER)
+    for line in reversed(lines):
+        size = estimate_tokens(line) + 1
+        if used + size > max_tokens:
+            if not kept:
+                kept.append(_cut(line, max_tokens - used))
+            break
+        kept.append(line)
+        used += size
+    return "\n".join([TRIM_MARKER] + kept[::-1])
+
+
+def _keep_lines(lines, max_tokens):
+    # Largest per-line cap that fits, so short lines stay whole and only the
+    # long ones are shortened
+    available = max_tokens - len(lines)
+    sizes = sorted(estimate_tokens(line) for line in lines)
+    cap = 0
+    for i, size in enumerate(sizes):
+        remaining = len(sizes) - i
+        if size * remaining > available:
+            cap = available // remaining
+            break
+        available -= size
+    else:
+        return "\n".join(lines)
+    if cap < 10:
+        # Too many lines to keep them all readable: keep both ends
+        half = max_tokens // 2
+        return _keep_head(lines, half).rsplit("\n", 1)[0] + "\n" + _keep_tail(lines, max_tokens - half)
+    return "\n".join(_cut(line, cap) for line in lines)
+
+
+def trim(text, max_tokens, keep='head'):
+    """
+    Shortens text to about max_tokens, keeping the part given by keep.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if keep == 'tail':
+        return _keep_tail(lines, max_tokens)
+    if keep == 'lines':
+        return _keep_lines(lines, max_tokens)
+    return _keep_head(lines, max_tokens)
+
+
+def fit(feature, sections, max_tokens=None):
+    """
+    Trims sections to their own budgets and then, lowest priority first,
+    until they fit max_tokens together. Returns {name: text}.
+    """
+    max_tokens = max_tokens or DEFAULT_MAX_TOKENS
+    before = {s.name: estimate_tokens(s.text) for s in sections}
+    texts = {}
+    for s in sections:
+        texts[s.name] = trim(s.text, s.budget, s.keep) if s.budget else s.text
+    sizes = {name: estimate_tokens(text) for name, text in texts.items()}
+
+    over = sum(sizes.values()) - max_tokens
+    for s in sorted(sections, key=lambda s: s.priority):
+        if over <= 0:
+            break
+        target = max(0, sizes[s.name] - over)
+        texts[s.name] = trim(texts[s.name], target, s.keep)
+        over -= sizes[s.name] - estimate_tokens(texts[s.name])
+        sizes[s.name] = estimate_tokens(texts[s.name])
+
+    _record(feature, before, sizes)
+    return texts
+
+
+def _record(feature, before, after):
+    with _lock:
+        stats = _stats.setdefault(feature, {
+            'calls': 0,
+            'trimmed': 0,
+            'tokens_in': 0,
+            'tokens_out': 0,
+            'max_tokens_in': 0,
+            'sections': {},
+        })
+        tokens_in, tokens_out = sum(before.values()), sum(after.values())
+        stats['calls'] += 1
+        stats['trimmed'] += 1 if tokens_out < tokens_in else 0
+        stats['tokens_in'] += tokens_in
+        stats['tokens_out'] += tokens_out
+        stats['max_tokens_in'] = max(stats['max_tokens_in'], tokens_in)
+        for name, size in before.items():
+            dropped = size - after[name]
+            if dropped > 0:
+                stats['sections'][name] = stats['sections'].get(name, 0) + dropped
+
+
+def get_stats():
+    """
+    Section sizes per feature: average tokens before and after trimming,
+    how often trimming kicked in and how many tokens each section lost.
+    """
+    with _lock:
+        snapshot = {name: dict(s, sections=dict(s['sections'])) for name, s in _stats.items()}
+    for s in snapshot.values():
+        calls = s['calls']
+        s['avg_tokens_in'] = s['tokens_in'] // calls if calls else 0
+        s['avg_tokens_out'] = s['tokens_out'] // calls if calls else 0
+        s['trim_rate'] = round(s['trimmed'] / calls, 3) if calls else 0.0
+    return snapshot
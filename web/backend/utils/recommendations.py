@@ -0,0 +1,158 @@
+import os
+from datetime import datetime
+import numpy as np
+
+# Stored job recommendations.
+# Each upload's resume is embedded once and kept on its UserData row
+# (float32 bytes of the same text the resumes collection indexes, so it is
+# usually an embedding cache hit). Its top TOP_K jobs by cosine similarity
+# are stored in job_recommendations when the analysis finishes. Whenever jobs
+# are indexed (utils/vector_utils.py), their vectors are scored against every
+# user's latest resume embedding and enter the lists they beat, so showing
+# recommendations is a single indexed read: no PDF parsing, embedding or
+# vector search per page load.
+
+TOP_K = int(os.environ.get("RECOMMENDATIONS_PER_USER", 10))
+USER_PAGE = 1000
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def resume_embedding(user_data, resume_text=None):
+    """
+    Embedding of an upload's resume as a float32 vector, computed and
+    stored on first use. None if the resume text is not available.
+    """
+    from ..extensions import db
+    from .embeddings import embed
+    from .resume_store import get_resume_text
+    from .vector_utils import _resume_document
+
+    if user_data.embedding is not None:
+        return np.frombuffer(user_data.embedding, dtype=np.float32)
+    if resume_text is None:
+        resume_text = get_resume_text(user_data)
+    if not resume_text:
+        return None
+    skills = (user_data.analysis_result or {}).get('actual_skills') or []
+    _, text, _ = _resume_document(user_data.user_id, resume_text, [s for s in skills if isinstance(s, str)])
+    vector = np.asarray(embed([text])[0], dtype=np.float32)
+    user_data.embedding = vector.tobytes()
+    db.session.commit()
+    return vector
+
+
+def _applied(user_ids, job_ids=None):
+    from ..extensions import db
+    from ..models import JobApplication
+    query = db.session.query(JobApplication.user_id, JobApplication.job_id) \
+        .filter(JobApplication.user_id.in_(list(user_ids)))
+    if job_ids is not None:
+        query = query.filter(JobApplication.job_id.in_(list(job_ids)))
+    return set(query.all())
+
+
+def refresh_user(user_data, resume_text=None):
+    """
+    Replaces the user's stored recommendations with the TOP_K jobs nearest
+    to the resume of user_data (their latest upload), leaving out jobs the
+    user applied to. Returns the job ids, best first.
+    """
+    from ..extensions import db
+    from ..models import JobPosting, JobRecommendation
+    from .vector_utils import COLLECTIONS, get_backend
+
+    vector = resume_embedding(user_data, resume_text)
+    if vector is None:
+        return []
+    applied = [str(job_id) for _, job_id in _applied([user_data.user_id])]
+    hits = [(int(meta['job_id']), score) for _, score, meta
+            in get_backend().query(COLLECTIONS['jobs'], vector, TOP_K, exclude_ids=applied)]
+    # The vector index can still hold postings deleted while it was unavailable
+    existing = {job_id for (job_id,) in JobPosting.query.with_entities(JobPosting.id)
+                .filter(JobPosting.id.in_([job_id for job_id, _ in hits])).all()}
+    JobRecommendation.query.filter_by(user_id=user_data.user_id).delete()
+    for job_id, score in hits:
+        if job_id in existing:
+            db.session.add(JobRecommendation(user_id=user_data.user_id, job_id=job_id, score=score))
+    db.session.commit()
+    return [job_id for job_id, _ in hits if job_id in existing]
+
+
+def add_jobs(job_ids, vectors):
+    """
+    Scores newly indexed (or edited) jobs against the latest resume
+    embedding of every user, in pages of USER_PAGE users, and merges them
+    into the stored top-TOP_K lists: listed jobs are rescored, others are
+    added where they beat the user's lowest-ranked recommendation (unless
+    the user applied to them).
+    Returns the number of recommendations added.
+    """
+    from sqlalchemy import func
+    from ..extensions import db
+    from ..models import JobRecommendation, UserData
+    from .vector_utils import _batches, _keyset
+
+    job_ids = [int(job_id) for job_id in job_ids]
+    jobs = _unit(np.asarray(vectors, dtype=np.float32))
+    if not job_ids:
+        return 0
+    position = {job_id: j for j, job_id in enumerate(job_ids)}
+    now = datetime.utcnow()
+    added = 0
+
+    latest = db.session.query(func.max(UserData.id)).group_by(UserData.user_id)
+    query = db.session.query(UserData.user_id, UserData.embedding) \
+        .filter(UserData.id.in_(latest), UserData.embedding.isnot(None))
+    for page in _batches(_keyset(query, UserData.user_id, USER_PAGE), USER_PAGE):
+        # Embeddings from another model (different size) are skipped until re-uploaded
+        page = [(user_id, np.frombuffer(blob, dtype=np.float32)) for user_id, blob in page]
+        page = [(user_id, vector) for user_id, vector in page if vector.shape[0] == jobs.shape[1]]
+        if not page:
+            continue
+        scores = _unit(np.stack([vector for _, vector in page])) @ jobs.T
+
+        user_ids = [user_id for user_id, _ in page]
+        current = {}
+        for rec in JobRecommendation.query.filter(JobRecommendation.user_id.in_(user_ids)).all():
+            current.setdefault(rec.user_id, {})[rec.job_id] = rec
+        applied = _applied(user_ids, job_ids)
+
+        for i, (user_id, _) in enumerate(page):
+            recs = current.get(user_id, {})
+            row = scores[i]
+            for job_id, rec in recs.items():
+                if job_id in position:
+                    rec.score = float(row[position[job_id]])
+                    rec.updated_at = now
+            floor = min(rec.score for rec in recs.values()) if len(recs) >= TOP_K else -np.inf
+            new = [j for j in np.flatnonzero(row > floor)
+                   if job_ids[j] not in recs and (user_id, job_ids[j]) not in applied]
+            if not new:
+                continue
+            ranked = sorted([(rec.score, job_id) for job_id, rec in recs.items()] +
+                            [(float(row[j]), job_ids[j]) for j in new], reverse=True)
+            keep = {job_id: score for score, job_id in ranked[:TOP_K]}
+            for job_id, rec in recs.items():
+                if job_id not in keep:
+                    db.session.delete(rec)
+            for j in new:
+                if job_ids[j] in keep:
+                    db.session.add(JobRecommendation(user_id=user_id, job_id=job_ids[j],
+                                                     score=keep[job_ids[j]], updated_at=now))
+                    added += 1
+        db.session.commit()
+    return added
+
+
+def get_recommendations(user_id, limit=3):
+    """The user's stored recommended JobPostings they have not applied to, best first."""
+    from ..extensions import db
+    from ..models import JobApplication, JobPosting, JobRecommendation
+    applied = db.session.query(JobApplication.job_id).filter(JobApplication.user_id == user_id)
+    return JobPosting.query.join(JobRecommendation, JobRecommendation.job_id == JobPosting.id) \
+        .filter(JobRecommendation.user_id == user_id, JobRecommendation.job_id.notin_(applied)) \
+        .order_by(JobRecommendation.score.desc()).limit(limit).all()
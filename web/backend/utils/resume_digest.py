@@ -0,0 +1,217 @@
+import os
+import re
+
+# Compact, structured summary of a resume used in place of the raw PDF text
+# in prompts that only need an overview. Prompts that judge or rewrite the
+# resume itself (ATS simulation, tailoring) get the stored extracted text.
+# Built once per upload from the extracted text (plus the skills found by
+# analyze_resume) and stored on UserData.resume_digest.
+# Bump DIGEST_VERSION when the format changes; older digests are rebuilt
+# lazily by get_resume_digest.
+
+DIGEST_VERSION = 1
+
+# Roughly 500 tokens
+DIGEST_MAX_CHARS = int(os.environ.get("RESUME_DIGEST_MAX_CHARS", 2000))
+
+SECTION_ALIASES = {
+    'summary': ['summary', 'professional summary', 'profile', 'objective', 'career objective', 'about me', 'about'],
+    'experience': ['experience', 'work experience', 'professional experience', 'employment', 'employment history',
+                   'work history', 'internships', 'internship'],
+    'education': ['education', 'academic background', 'academics', 'qualifications'],
+    'skills': ['skills', 'technical skills', 'key skills', 'core competencies', 'technologies', 'tech stack'],
+    'projects': ['projects', 'academic projects', 'personal projects', 'key projects'],
+    'certifications': ['certifications', 'certificates', 'courses', 'licenses'],
+    'achievements': ['achievements', 'awards', 'honors', 'accomplishments', 'publications'],
+}
+_HEADINGS = {alias: name for name, aliases in SECTION_ALIASES.items() for alias in aliases}
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_RE = re.compile(r"(?:\+?\d[\d\s().-]{8,}\d)")
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+_DATE = rf"(?:{_MONTH}\s*\d{{2,4}}|\d{{1,2}}/\d{{2,4}}|\d{{4}})"
+_DATE_RANGE_RE = re.compile(rf"({_DATE})\s*(?:-|–|—|to)\s*({_DATE}|present|current|now|till date)", re.I)
+_METRIC_RE = re.compile(r"\d+(?:\.\d+)?\s?(?:%|x\b|\+|k\b|m\b|lakh|crore)|[$₹€£]\s?\d", re.I)
+_BULLET_RE = re.compile(r"^[\s•●▪‣◦\-*–·]+")
+_SKILL_SPLIT_RE = re.compile(r"[,|•;·/]|\s{2,}")
+
+
+def _clean(line):
+    return re.sub(r"\s+", " ", _BULLET_RE.sub("", line)).strip()
+
+
+def _heading(line):
+    key = line.lower().strip(" :-_|").strip()
+    if len(key) > 40:
+        return None
+    return _HEADINGS.get(key)
+
+
+def split_sections(text):
+    """
+    Returns (header_lines, {section: [lines]}) using common resume headings.
+    """
+    header, sections = [], {}
+    current = None
+    for raw in text.splitlines():
+        line = _clean(raw)
+        if not line:
+            continue
+        name = _heading(line)
+        if name:
+            current = name
+            sections.setdefault(name, [])
+            continue
+        if current is None:
+            header.append(line)
+        else:
+            sections[current].append(line)
+    return header, sections
+
+
+def _shorten(text, limit):
+    return text if len(text) <= limit else text[:limit - 1].rsplit(" ", 1)[0] + "…"
+
+
+def _roles(lines):
+    roles = []
+    for i, line in enumerate(lines):
+        match = _DATE_RANGE_RE.search(line)
+        if not match:
+            continue
+        title = _clean(line[:match.start()] + line[match.end():]).strip(" ,|()-–")
+        if not title and i > 0:
+            # Dates on their own line: the title is usually just above
+            title = lines[i - 1]
+        roles.append({'title': _shorten(title, 90), 'dates': match.group(0)})
+    return roles[:6]
+
+
+def _skills_from_section(lines):
+    skills = []
+    for line in lines:
+        # "Languages: Python, Java" -> "Python, Java"
+        if ":" in line:
+            line = line.split(":", 1)[1]
+        for part in _SKILL_SPLIT_RE.split(line):
+            part = part.strip(" .")
+            if part and len(part) <= 40 and part.lower() not in (s.lower() for s in skills):
+                skills.append(part)
+    return skills
+
+
+def build_digest(resume_text, analysis=None):
+    """
+    Structured digest of a resume. analysis is the analyze_resume result,
+    whose actual_skills are preferred over the skills section text.
+    """
+    resume_text = resume_text or ""
+    if resume_text.startswith("Error:"):
+        resume_text = ""
+    analysis = analysis or {}
+    header, sections = split_sections(resume_text)
+    head_text = " ".join(header[:8])
+
+    email = _EMAIL_RE.search(resume_text)
+    phone = _PHONE_RE.search(head_text) or _PHONE_RE.search(resume_text[:1000])
+    name = analysis.get('name') if analysis.get('name') not in (None, "", "N/A") else None
+    if not name:
+        for line in header[:3]:
+            if not _EMAIL_RE.search(line) and not any(ch.isdigit() for ch in line) and len(line.split()) <= 5:
+                name = line
+                break
+
+    skills = [s for s in analysis.get('actual_skills', []) if isinstance(s, str)]
+    if not skills:
+        from .skill_extractor import extract_skills
+        # Skills section first so its order wins, then the rest of the resume
+        skills_text = "\n".join(sections.get('skills', []))
+        skills = extract_skills(f"{skills_text}\n{resume_text}") or _skills_from_section(sections.get('skills', []))
+
+    metrics = []
+    for line in sections.get('experience', []) + sections.get('projects', []) + sections.get('achievements', []):
+        if _METRIC_RE.search(line):
+            metrics.append(_shorten(line, 160))
+
+    projects = [_shorten(line, 80) for line in sections.get('projects', [])
+                if len(line.split()) <= 8 and not _METRIC_RE.search(line)]
+
+    summary = " ".join(sections.get('summary', []))
+
+    return {
+        'version': DIGEST_VERSION,
+        'name': name or "",
+        'email': email.group(0) if email else "",
+        'phone': phone.group(0).strip() if phone else "",
+        'field': analysis.get('predicted_field', ""),
+        'level': analysis.get('experience_level', ""),
+        'summary': _shorten(summary, 300) if summary else "",
+        'skills': skills[:40],
+        'roles': _roles(sections.get('experience', [])),
+        'education': [_shorten(line, 120) for line in sections.get('education', [])[:3]],
+        'projects': projects[:5],
+        'certifications': [_shorten(line, 80) for line in sections.get('certifications', [])[:4]],
+        'metrics': metrics[:6],
+        'sections': sorted(sections),
+        'source_chars': len(resume_text),
+    }
+
+
+def render_digest(digest, max_chars=None):
+    """
+    Prompt-ready text for a digest. Sections are added in priority order and
+    stop once max_chars (default DIGEST_MAX_CHARS) is reached.
+    """
+    max_chars = max_chars or DIGEST_MAX_CHARS
+    contact = " | ".join(p for p in (digest.get('name'), digest.get('email'), digest.get('phone')) if p)
+    blocks = []
+    if contact:
+        blocks.append(f"Candidate: {contact}")
+    if digest.get('field') or digest.get('level'):
+        blocks.append(f"Field: {digest.get('field') or 'N/A'} | Level: {digest.get('level') or 'N/A'}")
+    if digest.get('summary'):
+        blocks.append(f"Summary: {digest['summary']}")
+    if digest.get('skills'):
+        blocks.append(f"Skills: {', '.join(digest['skills'])}")
+    if digest.get('roles'):
+        blocks.append("Experience:\n" + "\n".join(f"- {r['title']} ({r['dates']})" for r in digest['roles']))
+    if digest.get('education'):
+        blocks.append("Education:\n" + "\n".join(f"- {e}" for e in digest['education']))
+    if digest.get('metrics'):
+        blocks.append("Key achievements:\n" + "\n".join(f"- {m}" for m in digest['metrics']))
+    if digest.get('projects'):
+        blocks.append(f"Projects: {'; '.join(digest['projects'])}")
+    if digest.get('certifications'):
+        blocks.append(f"Certifications: {'; '.join(digest['certifications'])}")
+
+    text = ""
+    for block in blocks:
+        candidate = f"{text}\n{block}" if text else block
+        if len(candidate) > max_chars:
+            remaining = max_chars - len(text) - 1
+            if remaining > 80:
+                text = f"{text}\n{_shorten(block, remaining)}" if text else _shorten(block, remaining)
+            break
+        text = candidate
+    return text
+
+
+def get_resume_digest(user_data, upload_folder=None):
+    """
+    Prompt text for a UserData row's resume. Uses the stored digest when it
+    is current; otherwise builds it from the stored resume text and saves it.
+    """
+    digest = user_data.resume_digest
+    if not digest or digest.get('version') != DIGEST_VERSION:
+        from ..extensions import db
+        from .resume_store import get_resume_text
+
+        resume_text = get_resume_text(user_data, upload_folder)
+        digest = build_digest(resume_text, user_data.analysis_result)
+        user_data.resume_digest = digest
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to store resume digest: {e}")
+    return render_digest(digest)
@@ -0,0 +1,134 @@
+import os
+import hashlib
+
+# Extracted resume text, stored once per distinct file.
+# Uploads are hashed (SHA-256 of the file bytes) and the text, page count
+# and layout statistics from a single pdfminer pass (file_utils.parse_pdf)
+# are kept in the resume_documents table, so routes that need the resume
+# text read it from the database instead of parsing the PDF again.
+# Bump PARSER_VERSION when extraction changes; stored documents from
+# an older parser are re-extracted on their next use.
+# Scanned PDFs whose OCR was unavailable, failed or ran out of time are
+# stored with RETRY_VERSION instead, so they are extracted again too.
+
+PARSER_VERSION = 3
+RETRY_VERSION = 0
+
+# Pages laid out per upload; a resume rarely needs more and 100-page
+# uploads would otherwise tie up the worker
+MAX_PAGES = int(os.environ.get("RESUME_PDF_MAX_PAGES", 10))
+
+
+class ResumeReadError(ValueError):
+    """The uploaded file could not be parsed as a PDF."""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_upload(file_storage, path):
+    """
+    Writes an uploaded file to path, hashing it on the way so the file is
+    not read again. Returns the SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for block in iter(lambda: file_storage.stream.read(1024 * 1024), b''):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+
+def get_document(path, sha256=None):
+    """
+    ResumeDocument for the PDF at path, extracting and storing it if it is
+    not stored yet or was extracted by an older parser.
+    Returns None if the file does not exist; raises ResumeReadError if it
+    cannot be parsed.
+    """
+    from ..extensions import db
+    from ..models import ResumeDocument
+    from .file_utils import SCANNED_PDF_MESSAGE, parse_pdf, resume_text_from
+
+    if sha256 is None:
+        if not os.path.exists(path):
+            return None
+        sha256 = file_sha256(path)
+
+    document = ResumeDocument.query.filter_by(sha256=sha256).first()
+    if document is not None and document.parser_version == PARSER_VERSION:
+        return document
+    if not os.path.exists(path):
+        # File is gone; an outdated extraction beats none
+        return document
+
+    try:
+        parsed = parse_pdf(path, MAX_PAGES)
+    except Exception as e:
+        # Don't store the failure so the next use tries again
+        print(f"DEBUG: Error during extraction: {e}", flush=True)
+        raise ResumeReadError("Could not read the resume. Please upload a valid PDF.") from e
+
+    if document is None:
+        document = ResumeDocument(sha256=sha256)
+        db.session.add(document)
+    document.text = resume_text_from(parsed, path)
+    document.page_count = parsed['page_count']
+    document.layout = {
+        'pages': [{k: v for k, v in page.items() if k != 'text'} for page in parsed['pages']],
+        'truncated': parsed['truncated'],
+        'ocr': parsed.get('ocr'),
+    }
+    ocr = parsed.get('ocr')
+    if document.text == SCANNED_PDF_MESSAGE or (ocr and not ocr.get('complete', True)):
+        # Keep it for this use (and as a fallback if the file goes away),
+        # but don't let one slow or OCR-less worker decide it for good
+        document.parser_version = RETRY_VERSION
+    else:
+        document.parser_version = PARSER_VERSION
+    try:
+        db.session.commit()
+    except Exception as e:
+        # Most likely a concurrent upload of the same file stored it first
+        db.session.rollback()
+        print(f"Failed to store resume document {sha256[:12]}: {e}")
+        document = ResumeDocument.query.filter_by(sha256=sha256).first() or document
+    return document
+
+
+def get_user_document(user_data, upload_folder=None):
+    """
+    ResumeDocument of a UserData row's resume (None if the file is missing
+    or unreadable). Rows uploaded before documents were stored get their
+    hash filled in.
+    """
+    from flask import current_app
+    from ..extensions import db
+
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    path = os.path.join(upload_folder, user_data.resume_path or "")
+    try:
+        document = get_document(path, user_data.document_sha256)
+    except ResumeReadError:
+        return None
+    if document is None:
+        return None
+    if user_data.document_sha256 != document.sha256:
+        user_data.document_sha256 = document.sha256
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to link resume document: {e}")
+    return document
+
+
+def get_resume_text(user_data, upload_folder=None):
+    """Extracted text of a UserData row's resume ("" if the file is missing)."""
+    document = get_user_document(user_data, upload_folder)
+    return (document.text or "") if document is not None else ""
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter
+
+# Local skill extraction without an LLM round trip.
+# A taxonomy of canonical skills and their aliases (the "skills" section of
+# backend/config.json, plus skills the analyzer has reported for several
+# users) is compiled into an Aho-Corasick automaton. One pass over the text
+# finds every alias; matches must sit on word boundaries, overlapping
+# matches keep the longest ("React Native" over "React"), and each alias
+# maps back to its canonical name ("k8s" -> "Kubernetes").
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
+
+# Skills reported by analyze_resume for at least this many uploads join the
+# taxonomy; the matcher is rebuilt to pick up new ones every REFRESH seconds
+LEARNED_MIN_COUNT = int(os.environ.get("SKILL_LEARNED_MIN_COUNT", 2))
+REFRESH_SECONDS = float(os.environ.get("SKILL_TAXONOMY_REFRESH", 3600))
+
+# Characters that continue a word, so "Java" does not match inside
+# "JavaScript" and "C" does not match the start of "C++"
+_WORD_CHARS = set("+#_&")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch in _WORD_CHARS
+
+
+def normalize_key(name):
+    """Lookup key for a skill name: lowercase with single spaces."""
+    return _SPACE_RE.sub(" ", name or "").strip().lower()
+
+
+class SkillMatcher:
+    def __init__(self, taxonomy, case_sensitive=()):
+        """
+        taxonomy maps canonical names to lists of aliases. Names listed in
+        case_sensitive only match with that exact spelling ("Go", "R"), so
+        common English words are not mistaken for skills; their aliases
+        ("golang") still match in any case.
+        """
+        self.aliases = {}
+        self._case_sensitive = set(case_sensitive)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for canonical, aliases in taxonomy.items():
+            for alias in [canonical] + list(aliases):
+                key = normalize_key(alias)
+                if not key or key in self.aliases:
+                    continue
+                self.aliases[key] = canonical
+                exact = alias if alias == canonical and canonical in self._case_sensitive else None
+                self._add(key, canonical, exact)
+        self._build()
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def _add(self, key, canonical, exact):
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(key), canonical, exact))
+
+    def _build(self):
+        # Breadth-first so every fail link points at an already finished node
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0) if self._goto[fail].get(ch) != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """
+        All non-overlapping skill mentions in text as (start, end, canonical),
+        in order of appearance. Offsets refer to the whitespace-collapsed text.
+        """
+        original = _SPACE_RE.sub(" ", text or "")
+        lowered = original.lower()
+        if len(lowered) != len(original):
+            # A few characters change length when lowercased
+            lowered = "".join(ch.lower()[0] for ch in original)
+
+        matches = []
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, canonical, exact in out[node]:
+                start = i - length + 1
+                if start > 0 and _is_word_char(original[start - 1]) and _is_word_char(original[start]):
+                    continue
+                if i + 1 < len(original) and _is_word_char(original[i + 1]) and _is_word_char(original[i]):
+                    continue
+                if exact is not None and original[start:i + 1] != exact:
+                    continue
+                matches.append((start, i + 1, canonical))
+
+        # Longest match wins where mentions overlap
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        kept, covered = [], 0
+        for start, end, canonical in matches:
+            if start >= covered:
+                kept.append((start, end, canonical))
+                covered = end
+        return kept
+
+    def extract(self, text):
+        """Canonical skills mentioned in text, each once, in order of appearance."""
+        seen = {}
+        for _, _, canonical in self.find(text):
+            seen.setdefault(canonical, None)
+        return list(seen)
+
+    def normalize(self, name):
+        """Canonical name for a skill name or alias, or None if unknown."""
+        return self.aliases.get(normalize_key(name))
+
+
+def load_taxonomy():
+    """(taxonomy, case_sensitive) from the skills section of config.json."""
+    if not os.path.exists(CONFIG_PATH):
+        return {}, []
+    with open(CONFIG_PATH, 'r') as f:
+        config = json.load(f)
+    return config.get('skills', {}), config.get('case_sensitive_skills', [])
+
+
+def learned_skills(known, min_count=None):
+    """
+    Skills analyze_resume reported for at least min_count uploads that the
+    taxonomy does not know yet. Needs an application context; returns []
+    without one.
+    """
+    min_count = min_count or LEARNED_MIN_COUNT
+    try:
+        from ..models import UserData
+        rows = UserData.query.with_entities(UserData.analysis_result) \
+            .order_by(UserData.uploaded_at.desc()).limit(5000).all()
+    except Exception:
+        return []
+    counts, spelling = Counter(), {}
+    for (result,) in rows:
+        skills = (result or {}).get('actual_skills') or []
+        for skill in {s.strip() for s in skills if isinstance(s, str)}:
+            key = normalize_key(skill)
+            if 2 <= len(key) <= 40 and key not in known:
+                counts[key] += 1
+                spelling.setdefault(key, skill)
+    return [spelling[key] for key, count in counts.items() if count >= min_count]
+
+
+_matcher = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def get_matcher():
+    """
+    The process-wide matcher, built on first use and rebuilt every
+    REFRESH_SECONDS to include newly learned skills.
+    """
+    global _matcher, _built_at
+    if _matcher is not None and time.monotonic() - _built_at < REFRESH_SECONDS:
+        return _matcher
+    with _lock:
+        if _matcher is None or time.monotonic() - _built_at >= REFRESH_SECONDS:
+            taxonomy, case_sensitive = load_taxonomy()
+            known = {normalize_key(alias) for name, aliases in taxonomy.items() for alias in [name] + aliases}
+            taxonomy = dict(taxonomy)
+            for skill in learned_skills(known):
+                taxonomy.setdefault(skill, [])
+            _matcher = SkillMatcher(taxonomy, case_sensitive)
+            _built_at = time.monotonic()
+    return _matcher
+
+
+def extract_skills(text):
+    return get_matcher().extract(text)
+
+
+def normalize_skill(name):
+    return get_matcher().normalize(name)
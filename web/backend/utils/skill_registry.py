@@ -0,0 +1,198 @@
+import threading
+from collections import Counter
+
+from .skill_extractor import load_taxonomy, normalize_key, normalize_skill, extract_skills
+
+# Canonical skill ids.
+# Every skill has a row in the skills table and each of its spellings
+# (lowercase, single spaces) a row in skill_aliases, seeded from the
+# taxonomy in config.json. Each worker loads the alias -> id map once and
+# adds to it as it goes, so resumes and job postings are stored with lists
+# of small integer ids ("JS", "javascript" and "JavaScript" all map to the
+# same id) and aggregations count ids instead of rescanning skill strings.
+
+
+class SkillRegistry:
+    def __init__(self):
+        self._ids = {}    # normalized alias -> skill id
+        self._names = {}  # skill id -> canonical name
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        from ..extensions import db
+        from ..models import Skill, SkillAlias
+
+        self._names = dict(db.session.query(Skill.id, Skill.name).all())
+        self._ids = dict(db.session.query(SkillAlias.alias, SkillAlias.skill_id).all())
+
+        # Taxonomy entries (or aliases) added to config.json since the last load
+        taxonomy, _ = load_taxonomy()
+        added = False
+        for canonical, aliases in taxonomy.items():
+            keys = [key for key in (normalize_key(a) for a in [canonical] + list(aliases)) if key]
+            skill_id = self._ids.get(normalize_key(canonical))
+            if skill_id is None:
+                skill = Skill(name=canonical)
+                db.session.add(skill)
+                db.session.flush()
+                skill_id = skill.id
+                self._names[skill_id] = canonical
+            for key in keys:
+                if key not in self._ids:
+                    db.session.add(SkillAlias(alias=key, skill_id=skill_id))
+                    self._ids[key] = skill_id
+                    added = True
+        if added:
+            try:
+                db.session.commit()
+            except Exception as e:
+                # Another worker seeded concurrently; take what it stored
+                db.session.rollback()
+                print(f"Skill registry seeding raced: {e}")
+                self._names = dict(db.session.query(Skill.id, Skill.name).all())
+                self._ids = dict(db.session.query(SkillAlias.alias, SkillAlias.skill_id).all())
+        print(f"DEBUG: Skill registry loaded ({len(self._names)} skills, {len(self._ids)} aliases).", flush=True)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _lookup(self, key):
+        # Added by another worker after this one loaded
+        from ..models import Skill, SkillAlias
+        alias = SkillAlias.query.filter_by(alias=key).first()
+        if alias is None:
+            return None
+        if alias.skill_id not in self._names:
+            skill = Skill.query.get(alias.skill_id)
+            self._names[alias.skill_id] = skill.name if skill else key
+        return alias.skill_id
+
+    def _create(self, name, key):
+        from ..extensions import db
+        from ..models import Skill, SkillAlias
+        with self._lock:
+            if key in self._ids:
+                return self._ids[key]
+            try:
+                skill = Skill.query.filter_by(name=name).first()
+                if skill is None:
+                    skill = Skill(name=name)
+                    db.session.add(skill)
+                    db.session.flush()
+                db.session.add(SkillAlias(alias=key, skill_id=skill.id))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Failed to add skill '{name}': {e}")
+                return self._lookup(key)
+            self._names[skill.id] = skill.name
+            return skill.id
+
+    def skill_id(self, name, create=True):
+        """
+        Id of a skill name or alias. Skills the registry has not seen are
+        added when create is True; otherwise None is returned for them.
+        Adding a skill commits the session, so call this before staging
+        other changes.
+        """
+        if not isinstance(name, str):
+            return None
+        key = normalize_key(name)
+        if not key or len(key) > 100:
+            return None
+        skill_id = self._ids.get(key)
+        if skill_id is None:
+            canonical = normalize_skill(name)
+            if canonical:
+                skill_id = self._ids.get(normalize_key(canonical))
+        if skill_id is None:
+            skill_id = self._lookup(key)
+        if skill_id is None and create:
+            skill_id = self._create(" ".join(name.split())[:100], key)
+        if skill_id is not None:
+            self._ids[key] = skill_id
+        return skill_id
+
+    def skill_ids(self, names, create=True):
+        """Ids of a list of skill names, without duplicates, in order."""
+        ids = {}
+        for name in names or []:
+            skill_id = self.skill_id(name, create)
+            if skill_id is not None:
+                ids.setdefault(skill_id, None)
+        return list(ids)
+
+    def ids_in_text(self, text, create=True):
+        """Ids of the skills mentioned in free text (see skill_extractor)."""
+        return self.skill_ids(extract_skills(text), create)
+
+    def name(self, skill_id):
+        return self._names.get(skill_id)
+
+    def names(self, skill_ids):
+        return [self._names[i] for i in skill_ids or [] if i in self._names]
+
+    def count(self, id_lists, top=None):
+        """[(name, count)] over lists of skill ids, most common first."""
+        counts = Counter()
+        for ids in id_lists:
+            counts.update(set(ids or []))
+        return [(self._names.get(i, str(i)), n) for i, n in counts.most_common(top)]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """The process-wide registry, loaded on first use. Needs an app context."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SkillRegistry()
+    return _registry
+
+
+def reset():
+    """Forget the loaded registry (tests switch databases)."""
+    global _registry
+    _registry = None
+
+
+def user_skill_ids(user_data, create=False):
+    """Skill ids of a UserData row, resolved from its analysis if not stored yet."""
+    if user_data.skill_ids is not None:
+        return user_data.skill_ids
+    skills = (user_data.analysis_result or {}).get('actual_skills') or []
+    return get_registry().skill_ids(skills if isinstance(skills, list) else [], create)
+
+
+def job_skill_ids(title, description, requirements=None, create=True):
+    """Skill ids of a job posting, from its title, requirements and description."""
+    text = "\n".join(part for part in (title, requirements, description) if part)
+    return get_registry().ids_in_text(text, create)
+
+
+def backfill():
+    """
+    Fills in skill_ids for UserData rows and job postings stored before
+    they were normalized. Returns the number of rows updated.
+    """
+    from ..extensions import db
+    from ..models import JobPosting, UserData
+
+    registry = get_registry()
+    updated = 0
+    for user_data in UserData.query.all():
+        if user_data.skill_ids is None:
+            user_data.skill_ids = user_skill_ids(user_data, create=True)
+            updated += 1
+    for job in JobPosting.query.all():
+        if job.skill_ids is None:
+            job.skill_ids = job_skill_ids(job.title, job.description, job.requirements)
+            updated += 1
+    db.session.commit()
+    print(f"DEBUG: Normalized skills of {updated} rows ({len(registry)} skills).", flush=True)
+    return updated
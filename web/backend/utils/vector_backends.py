@@ -0,0 +1,323 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+# Storage behind utils/vector_utils.py.
+# A backend holds named collections of (id, embedding, metadata) and answers
+# nearest-neighbour queries. vector_utils computes the embeddings itself
+# (utils/embeddings.py), so backends only store and search vectors.
+# VECTOR_BACKEND picks one of BACKENDS:
+#   chroma - Chroma PersistentClient under backend/chroma_db (default)
+#   numpy  - in-process index of memory-mapped .npy files under
+#            backend/data/vector_index; no server, no SQLite locks
+# Queries can be restricted with a where dict (metadata key -> value, or a
+# list of accepted values) and a set of ids to leave out, applied inside
+# the index so n_results valid hits come back from one call.
+
+
+class VectorBackend:
+    name = None
+
+    def upsert(self, collection, ids, embeddings, metadatas, documents):
+        """Adds or replaces documents (ids are strings)."""
+        raise NotImplementedError
+
+    def query(self, collection, embedding, n_results, where=None, exclude_ids=None):
+        """
+        Up to n_results [(id, score, metadata)], best first; score is cosine
+        similarity. Only documents whose metadata matches every where clause
+        and whose id is not in exclude_ids are considered.
+        """
+        raise NotImplementedError
+
+    def delete(self, collection, ids):
+        raise NotImplementedError
+
+    def count(self, collection):
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    name = 'chroma'
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'chroma_db')
+        self._client = None
+        self._collections = {}
+
+    def _collection(self, name):
+        # NOTE:
+        # Chroma can be slow to initialize (or hang if the underlying sqlite is locked).
+        # We avoid import-time initialization and lazily create the client/collections on demand.
+        if name not in self._collections:
+            import chromadb  # local import so the module can load even if chromadb init is slow
+            if self._client is None:
+                self._client = chromadb.PersistentClient(path=self.path)
+            self._collections[name] = self._client.get_or_create_collection(name=name)
+        return self._collections[name]
+
+    def upsert(self, collection, ids, embeddings, metadatas, documents):
+        self._collection(collection).upsert(ids=list(ids), embeddings=np.asarray(embeddings).tolist(),
+                                            metadatas=list(metadatas), documents=list(documents))
+
+    def query(self, collection, embedding, n_results, where=None, exclude_ids=None):
+        # Chroma filters metadata but cannot leave out ids: ask for enough
+        # extra hits to cover every excluded id instead
+        exclude = set(exclude_ids or ())
+        kwargs = {'where': _chroma_where(where)} if where else {}
+        results = self._collection(collection).query(query_embeddings=[np.asarray(embedding).tolist()],
+                                                     n_results=n_results + len(exclude), **kwargs)
+        if not results['ids'] or not results['ids'][0]:
+            return []
+        distances = results.get('distances') or [[0.0] * len(results['ids'][0])]
+        # Collections use the default l2 space: squared distance between the
+        # unit-length MiniLM embeddings, 2 - 2 * cosine
+        hits = [(doc_id, 1.0 - float(distance) / 2, metadata) for doc_id, distance, metadata
+                in zip(results['ids'][0], distances[0], results['metadatas'][0]) if doc_id not in exclude]
+        return hits[:n_results]
+
+    def delete(self, collection, ids):
+        self._collection(collection).delete(ids=list(ids))
+
+    def count(self, collection):
+        return self._collection(collection).count()
+
+
+def _accepted(value):
+    return set(value) if isinstance(value, (list, tuple, set, frozenset)) else {value}
+
+
+def _chroma_where(where):
+    clauses = [{key: {'$in': sorted(value)}} if isinstance(value, (list, tuple, set, frozenset)) else {key: value}
+               for key, value in where.items()]
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class NumpyIndex:
+    """
+    One collection as a directory:
+        manifest.json     {'dim', 'file', 'ids', 'metadatas'}; ids[row] is
+                          None for a deleted (tombstoned) row
+        vectors-<n>.npy   float32 (capacity x dim) of unit-length rows
+    Rows are appended in place past the rows any reader knows about; an
+    update appends the new version and tombstones the old row. Growing or
+    compacting writes a new vectors file, then swaps the manifest, so
+    workers that still map the old file keep reading a consistent copy.
+    Searches are one matrix-vector product (cosine similarity) plus
+    argpartition over the live rows that pass the filters.
+    """
+
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = []
+        self._metadatas = []
+        self._rows = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._columns = {}
+        self._vectors = None
+        self._file = None
+        self._dim = None
+
+    def _manifest_path(self):
+        return os.path.join(self.path, 'manifest.json')
+
+    def _reload(self):
+        # Cheap when nothing changed: one stat() per call
+        try:
+            stat = os.stat(self._manifest_path())
+        except FileNotFoundError:
+            return
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if version == self._version:
+            return
+        with open(self._manifest_path()) as f:
+            manifest = json.load(f)
+        if manifest['file'] != self._file:
+            self._vectors = np.load(os.path.join(self.path, manifest['file']), mmap_mode='r')
+            self._file = manifest['file']
+        self._dim = manifest['dim']
+        self._ids = manifest['ids']
+        self._metadatas = manifest['metadatas']
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if doc_id is not None}
+        self._alive = np.array([doc_id is not None for doc_id in self._ids], dtype=bool)
+        self._columns = {}
+        self._version = version
+
+    @contextmanager
+    def _write_lock(self):
+        # One writer at a time across threads and worker processes
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, '.lock'), 'w') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save_manifest(self, file, ids, metadatas):
+        tmp = self._manifest_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'dim': self._dim, 'file': file, 'ids': ids, 'metadatas': metadatas}, f)
+        os.replace(tmp, self._manifest_path())
+
+    def _rewrite(self, ids, metadatas, rows, new_vectors, capacity):
+        # New file holding the given existing rows followed by new_vectors
+        generation = int(self._file.split('-')[1].split('.')[0]) + 1 if self._file else 1
+        file = f"vectors-{generation}.npy"
+        out = np.lib.format.open_memmap(os.path.join(self.path, file), mode='w+',
+                                        dtype=np.float32, shape=(capacity, self._dim))
+        if rows:
+            out[:len(rows)] = self._vectors[rows]
+        out[len(rows):len(rows) + len(new_vectors)] = new_vectors
+        out.flush()
+        del out
+        old = self._file
+        self._save_manifest(file, ids, metadatas)
+        if old:
+            os.remove(os.path.join(self.path, old))
+
+    def upsert(self, ids, embeddings, metadatas):
+        vectors = _normalize(embeddings)
+        last = {doc_id: i for i, doc_id in enumerate(ids)}
+        if len(last) < len(ids):
+            # Same id twice in one call: the last one wins
+            keep = sorted(last.values())
+            ids, metadatas, vectors = [ids[i] for i in keep], [metadatas[i] for i in keep], vectors[keep]
+        with self._write_lock():
+            self._reload()
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index ({self._dim})")
+
+            all_ids, all_metadatas = list(self._ids), list(self._metadatas)
+            for doc_id in ids:
+                row = self._rows.get(doc_id)
+                if row is not None:
+                    all_ids[row] = all_metadatas[row] = None
+            capacity = self._vectors.shape[0] if self._vectors is not None else 0
+            dead = sum(1 for doc_id in all_ids if doc_id is None)
+
+            if len(all_ids) + len(ids) <= capacity and dead <= self.COMPACT_RATIO * max(len(all_ids), 64):
+                # Append in place; readers only look at rows their manifest lists
+                out = np.load(os.path.join(self.path, self._file), mmap_mode='r+')
+                out[len(all_ids):len(all_ids) + len(ids)] = vectors
+                out.flush()
+                del out
+                self._save_manifest(self._file, all_ids + list(ids), all_metadatas + list(metadatas))
+            else:
+                keep = [row for row, doc_id in enumerate(all_ids) if doc_id is not None]
+                live = len(keep) + len(ids)
+                self._rewrite([all_ids[row] for row in keep] + list(ids),
+                              [all_metadatas[row] for row in keep] + list(metadatas),
+                              keep, vectors, max(1024, 2 * live))
+            self._reload()
+
+    def delete(self, ids):
+        with self._write_lock():
+            self._reload()
+            rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+            if not rows:
+                return
+            all_ids, all_metadatas = list(self._ids), list(self._metadatas)
+            for row in rows:
+                all_ids[row] = all_metadatas[row] = None
+            self._save_manifest(self._file, all_ids, all_metadatas)
+            self._reload()
+
+    def _mask(self, where, exclude_ids):
+        # Rows passing the filters; metadata columns are cached per manifest
+        mask = self._alive.copy()
+        for key, value in (where or {}).items():
+            if key not in self._columns:
+                self._columns[key] = [(m or {}).get(key) for m in self._metadatas]
+            accepted = _accepted(value)
+            mask &= np.fromiter((v in accepted for v in self._columns[key]), dtype=bool, count=len(mask))
+        rows = [self._rows[doc_id] for doc_id in exclude_ids or () if doc_id in self._rows]
+        mask[rows] = False
+        return mask
+
+    def query(self, embedding, n_results, where=None, exclude_ids=None):
+        with self._lock:
+            self._reload()
+            ids, metadatas, vectors = self._ids, self._metadatas, self._vectors
+            alive = self._mask(where, exclude_ids) if where or exclude_ids else self._alive
+        live = int(alive.sum())
+        if not live or n_results <= 0:
+            return []
+        scores = np.asarray(vectors[:len(ids)] @ _normalize(embedding), dtype=np.float32)
+        scores[~alive] = -np.inf
+        k = min(n_results, live)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(ids[row], float(scores[row]), metadatas[row]) for row in top]
+
+    def count(self):
+        with self._lock:
+            self._reload()
+            return int(self._alive.sum())
+
+
+class NumpyBackend(VectorBackend):
+    name = 'numpy'
+
+    def __init__(self, path=None):
+        default = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'vector_index')
+        self.path = path or os.environ.get("VECTOR_INDEX_DIR", default)
+        self._indexes = {}
+
+    def _index(self, collection):
+        if collection not in self._indexes:
+            self._indexes[collection] = NumpyIndex(os.path.join(self.path, collection))
+        return self._indexes[collection]
+
+    def upsert(self, collection, ids, embeddings, metadatas, documents):
+        self._index(collection).upsert(list(ids), embeddings, list(metadatas))
+
+    def query(self, collection, embedding, n_results, where=None, exclude_ids=None):
+        return self._index(collection).query(embedding, n_results, where, exclude_ids)
+
+    def delete(self, collection, ids):
+        self._index(collection).delete(list(ids))
+
+    def count(self, collection):
+        return self._index(collection).count()
+
+
+BACKENDS = {
+    'chroma': ChromaBackend,
+    'numpy': NumpyBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """The process-wide backend named by VECTOR_BACKEND, created on first use."""
+    global _backend
+    if _backend is None:
+        name = os.environ.get("VECTOR_BACKEND", "chroma").lower()
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown VECTOR_BACKEND '{name}' (expected one of {', '.join(BACKENDS)})")
+        _backend = BACKENDS[name]()
+    return _backend
@@ -1,136 +1,477 @@
 import os
+import json
+import time
+import hashlib
+from datetime import datetime
 
-# NOTE:
-# Chroma can be slow to initialize (or hang if the underlying sqlite is locked).
-# We avoid import-time initialization and lazily create the client/collections on demand.
-_chroma_client = None
-_job_collection = None
-_resume_collection = None
+# Documents per vector DB call when indexing in bulk; each call embeds its
+# whole batch in one pass
+BATCH_SIZE = int(os.environ.get("VECTOR_BATCH_SIZE", 256))
 
+# Collections per kind of document, in the configured backend
+# (utils/vector_backends.py: Chroma or the built-in NumPy index)
+COLLECTIONS = {'jobs': 'job_postings', 'resumes': 'resumes'}
 
-def _get_db_path():
-    # Saving to 'chroma_db' folder in the web/backend directory
-    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'chroma_db')
+# Resumes are indexed as up to MAX_RESUME_CHUNKS chunks of about
+# CHUNK_CHARS characters each (consecutive windows of a section overlap by
+# CHUNK_OVERLAP); a resume search looks at no more than n * MAX_RESUME_CHUNKS hits
+MAX_RESUME_CHUNKS = int(os.environ.get("RESUME_MAX_CHUNKS", 8))
+CHUNK_CHARS = 1000
+CHUNK_OVERLAP = 200
 
+# JobPosting columns stored in each job's metadata, usable as search filters
+JOB_FILTERS = ('organization_id', 'location', 'is_ai_round_enabled')
 
-def _ensure_collections():
-    global _chroma_client, _job_collection, _resume_collection
-    if _job_collection is not None and _resume_collection is not None:
-        return _job_collection, _resume_collection
+# Reciprocal rank fusion constant; larger values flatten the head of each list
+RRF_K = 60
 
-    import chromadb  # local import so the module can load even if chromadb init is slow
 
-    if _chroma_client is None:
-        _chroma_client = chromadb.PersistentClient(path=_get_db_path())
+def get_backend():
+    from .vector_backends import get_backend as _get_backend
+    return _get_backend()
 
-    _job_collection = _chroma_client.get_or_create_collection(name="job_postings")
-    _resume_collection = _chroma_client.get_or_create_collection(name="resumes")
-    return _job_collection, _resume_collection
 
-def add_job_to_vector_db(job_id, title, description):
+def _entry_collection(kind):
+    # What has been indexed is tracked per backend
+    return f"{get_backend().name}:{COLLECTIONS[kind]}"
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def job_filters(job):
+    """The filterable fields (JOB_FILTERS) of a JobPosting."""
+    return {key: getattr(job, key) for key in JOB_FILTERS}
+
+
+def _job_document(job_id, title, description, filters=None):
+    metadata = {"job_id": job_id, "title": title}
+    # Unset fields are left out (Chroma metadata cannot hold None)
+    metadata.update((key, value) for key, value in (filters or {}).items() if value is not None)
+    return str(job_id), f"{title}. {description}", metadata
+
+
+def _resume_document(user_id, resume_text, skills):
+    # Create a rich text representation for semantic search
+    text = f"Skills: {', '.join(skills)}. Resume Content: {resume_text[:1000]}"
+    return f"{user_id}:0", text, {"user_id": user_id, "chunk": 0}
+
+
+def _windows(text):
+    step = CHUNK_CHARS - CHUNK_OVERLAP
+    return [text[start:start + CHUNK_CHARS] for start in range(0, max(len(text) - CHUNK_OVERLAP, 1), step)]
+
+
+def _resume_chunks(user_id, resume_text, skills):
     """
-    Adds a job posting to the vector database.
+    A resume as (id, text, metadata) documents with ids "<user_id>:<n>".
+    Chunk 0 is the skills summary plus the start of the resume (the text
+    recommendations embed, see utils/recommendations.py). Longer resumes
+    add their sections (utils/resume_digest.split_sections), packed
+    together up to CHUNK_CHARS and long ones split into overlapping
+    windows. Chunks past MAX_RESUME_CHUNKS are dropped.
     """
-    text = f"{title}. {description}"
+    from .resume_digest import split_sections
+    chunks = [_resume_document(user_id, resume_text, skills)[1]]
+    if len(resume_text) > CHUNK_CHARS:
+        header, sections = split_sections(resume_text)
+        blocks = [" ".join(header)] + [f"{name.title()}: {' '.join(lines)}" for name, lines in sections.items()]
+        current = ""
+        for block in blocks:
+            if not block.strip():
+                continue
+            for window in _windows(block):
+                if current and len(current) + len(window) + 1 > CHUNK_CHARS:
+                    chunks.append(current)
+                    current = ""
+                current = f"{current}\n{window}" if current else window
+        if current:
+            chunks.append(current)
+    return [(f"{user_id}:{n}", text, {"user_id": user_id, "chunk": n})
+            for n, text in enumerate(chunks[:MAX_RESUME_CHUNKS])]
+
+
+def _content_hash(text, metadata):
+    from .embeddings import MODEL
+    h = hashlib.sha256()
+    for part in (MODEL, text, json.dumps(metadata, sort_keys=True)):
+        h.update(part.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def _indexed_hashes(kind, ids):
+    # What is in the index already, per the vector_index_entries table.
+    # Outside an app context nothing is known and everything is written.
+    from flask import has_app_context
+    if not has_app_context():
+        return {}
+    from ..models import VectorIndexEntry
+    rows = VectorIndexEntry.query.with_entities(VectorIndexEntry.doc_id, VectorIndexEntry.content_hash) \
+        .filter(VectorIndexEntry.collection == _entry_collection(kind), VectorIndexEntry.doc_id.in_(ids)).all()
+    return dict(rows)
+
+
+def _record_hashes(kind, hashes):
+    from flask import has_app_context
+    if not has_app_context():
+        return
+    from ..extensions import db
+    from ..models import VectorIndexEntry
     try:
-        job_collection, _ = _ensure_collections()
-        job_collection.add(
-            documents=[text],
-            metadatas=[{"job_id": job_id, "title": title}],
-            ids=[str(job_id)]
-        )
-        print(f"Indexed Job {job_id} in Vector DB.")
-        return True
+        collection = _entry_collection(kind)
+        entries = {e.doc_id: e for e in VectorIndexEntry.query.filter(
+            VectorIndexEntry.collection == collection, VectorIndexEntry.doc_id.in_(list(hashes))).all()}
+        for doc_id, content_hash in hashes.items():
+            entry = entries.get(doc_id)
+            if entry is None:
+                db.session.add(VectorIndexEntry(collection=collection, doc_id=doc_id, content_hash=content_hash))
+            else:
+                entry.content_hash = content_hash
+                entry.indexed_at = datetime.utcnow()
+        db.session.commit()
     except Exception as e:
-        print(f"Error indexing job {job_id}: {e}")
-        return False
+        # Only costs a redundant upsert next time
+        db.session.rollback()
+        print(f"Failed to record indexed {kind}: {e}")
 
-def add_resume_to_vector_db(user_id, resume_text, skills):
+
+def _add_jobs_to_recommendations(job_ids, vectors):
+    from ..extensions import db
+    from .recommendations import add_jobs
+    try:
+        add_jobs(job_ids, vectors)
+    except Exception as e:
+        # The lists catch up at the user's next upload
+        db.session.rollback()
+        print(f"Failed to update recommendations for {len(job_ids)} jobs: {e}")
+
+
+def _add_jobs_in_background(app, job_ids, vectors):
+    with app.app_context():
+        _add_jobs_to_recommendations(job_ids, vectors)
+
+
+def _update_recommendations(job_ids, vectors):
+    # Merge freshly indexed jobs into users' stored recommendations. Scoring
+    # a job against every user's resume is O(users), so a request (recruiter
+    # posting or editing a job) hands it to a background task; bulk
+    # re-indexing outside a request is already off the request path.
+    from flask import current_app, has_app_context, has_request_context
+    if not has_app_context():
+        return
+    if has_request_context():
+        from ..extensions import socketio
+        socketio.start_background_task(_add_jobs_in_background, current_app._get_current_object(),
+                                       list(job_ids), vectors)
+    else:
+        _add_jobs_to_recommendations(job_ids, vectors)
+
+
+def _upsert(kind, documents, batch_size, force=False):
     """
-    Adds a user's resume summary to the vector database.
+    Upserts (id, text, metadata) tuples in batches of batch_size, one
+    backend call per batch. Documents whose text and metadata are unchanged
+    since they were last indexed are skipped unless force is set; the rest
+    are embedded in one pass per batch, through the embedding cache.
+    Returns throughput stats: {'count', 'skipped', 'failed', 'batches',
+    'seconds', 'per_second'}.
     """
-    # Create a rich text representation for semantic search
-    text = f"Skills: {', '.join(skills)}. Resume Content: {resume_text[:1000]}"
+    from .embeddings import embed
+    batch_size = batch_size or BATCH_SIZE
+    started = time.monotonic()
+    count = skipped = failed = batches = 0
+    for batch in _batches(documents, batch_size):
+        batches += 1
+        try:
+            hashes = {doc_id: _content_hash(text, metadata) for doc_id, text, metadata in batch}
+            if not force:
+                indexed = _indexed_hashes(kind, list(hashes))
+                changed = [doc for doc in batch if indexed.get(doc[0]) != hashes[doc[0]]]
+                skipped += len(batch) - len(changed)
+                batch = changed
+                if not batch:
+                    continue
+            ids, texts, metadatas = zip(*batch)
+            vectors = embed(texts)
+            get_backend().upsert(COLLECTIONS[kind], ids, vectors, metadatas, texts)
+            _record_hashes(kind, {doc_id: hashes[doc_id] for doc_id in ids})
+            count += len(batch)
+            if kind == "jobs":
+                _update_recommendations(ids, vectors)
+        except Exception as e:
+            failed += len(batch)
+            print(f"Error indexing {len(batch)} {kind} (first id {batch[0][0]}): {e}")
+    seconds = time.monotonic() - started
+    stats = {
+        'count': count,
+        'skipped': skipped,
+        'failed': failed,
+        'batches': batches,
+        'seconds': round(seconds, 2),
+        'per_second': round(count / seconds, 1) if seconds > 0 else float(count),
+    }
+    if batches > 1 or failed:
+        print(f"DEBUG: Indexed {count} {kind} in {batches} batches, {stats['seconds']}s "
+              f"({stats['per_second']}/s, {skipped} unchanged, {failed} failed).", flush=True)
+    return stats
+
+
+def upsert_jobs(jobs, batch_size=None, force=False):
+    """
+    Adds or replaces job postings in the vector database.
+    jobs is any iterable of (job_id, title, description[, filters]),
+    consumed lazily; filters is a job_filters() dict.
+    """
+    return _upsert("jobs", (_job_document(*job) for job in jobs), batch_size, force)
+
+
+def upsert_resumes(resumes, batch_size=None, force=False):
+    """
+    Adds or replaces resumes in the vector database, as chunks (see
+    _resume_chunks); chunks a user's previous resume had beyond the new
+    one's, and entries from before resumes were chunked, are removed.
+    resumes is any iterable of (user_id, resume_text, skills).
+    Stats count chunks.
+    """
+    stale = []
+
+    def documents():
+        for user_id, resume_text, skills in resumes:
+            chunks = _resume_chunks(user_id, resume_text, skills)
+            stale.append(str(user_id))
+            stale.extend(f"{user_id}:{n}" for n in range(len(chunks), MAX_RESUME_CHUNKS))
+            yield from chunks
+
+    stats = _upsert("resumes", documents(), batch_size, force)
     try:
-        _, resume_collection = _ensure_collections()
-        # Check if exists and update, or add
-        existing = resume_collection.get(ids=[str(user_id)])
-        if existing['ids']:
-             resume_collection.update(
-                documents=[text],
-                metadatas=[{"user_id": user_id}],
-                ids=[str(user_id)]
-            )
-        else:
-            resume_collection.add(
-                documents=[text],
-                metadatas=[{"user_id": user_id}],
-                ids=[str(user_id)]
-            )
+        _delete("resumes", stale, batch_size)
+    except Exception as e:
+        print(f"Error removing stale resume chunks: {e}")
+    return stats
+
+
+def add_job_to_vector_db(job_id, title, description, filters=None):
+    """
+    Adds (or updates) a job posting in the vector database, with its
+    job_filters() as metadata.
+    """
+    stats = upsert_jobs([(job_id, title, description, filters)])
+    if stats['count']:
+        print(f"Indexed Job {job_id} in Vector DB.")
+    return bool(stats['count'])
+
+def add_resume_to_vector_db(user_id, resume_text, skills):
+    """
+    Adds (or updates) a user's resume summary in the vector database.
+    """
+    stats = upsert_resumes([(user_id, resume_text, skills)])
+    if stats['count']:
         print(f"Indexed User {user_id} Resume in Vector DB.")
+    return bool(stats['count'])
+
+def _delete(kind, doc_ids, batch_size=None):
+    # Removes documents (missing ones are ignored) and their recorded hashes
+    from flask import has_app_context
+    for batch in _batches(doc_ids, batch_size or BATCH_SIZE):
+        get_backend().delete(COLLECTIONS[kind], batch)
+        if has_app_context():
+            from ..extensions import db
+            from ..models import VectorIndexEntry
+            VectorIndexEntry.query.filter(VectorIndexEntry.collection == _entry_collection(kind),
+                                          VectorIndexEntry.doc_id.in_(batch)).delete(synchronize_session=False)
+            db.session.commit()
+
+def remove_job_from_vector_db(job_id):
+    """
+    Removes a deleted job posting from the vector database.
+    """
+    try:
+        _delete('jobs', [str(job_id)])
         return True
     except Exception as e:
-        print(f"Error indexing resume for user {user_id}: {e}")
+        print(f"Error removing job {job_id} from Vector DB: {e}")
         return False
 
-def search_jobs_by_resume(resume_text, n_results=5):
+def _search(kind, query_text, n_results, where=None, exclude_ids=None):
+    from .embeddings import embed
+    # Truncate the query text: the model (MiniLM) only reads about 512 tokens
+    vector = embed([query_text[:2000]])[0]
+    return get_backend().query(COLLECTIONS[kind], vector, n_results, where=where,
+                               exclude_ids=[str(doc_id) for doc_id in exclude_ids or ()])
+
+def _check_filters(where):
+    unknown = set(where or ()) - set(JOB_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown job filter(s): {', '.join(sorted(unknown))}")
+
+def filter_jobs(query, where):
+    """Applies job filters (see search_jobs) to a JobPosting query."""
+    from ..models import JobPosting
+    _check_filters(where)
+    for key, value in (where or {}).items():
+        column = getattr(JobPosting, key)
+        query = query.filter(column.in_(list(value)) if isinstance(value, (list, tuple, set)) else column == value)
+    return query
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Merges ranked id lists: each id scores sum(1 / (k + rank)) over the
+    lists it appears in. Returns ids best first.
     """
-    Semantically searches for jobs matching the resume text.
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def search_jobs(query_text, n_results=5, where=None, exclude_ids=None):
+    """
+    Hybrid job search: semantic (vector) and keyword (BM25, see
+    utils/keyword_index.py) results fused by reciprocal rank.
+    where restricts results to jobs whose JOB_FILTERS fields match, e.g.
+    {'organization_id': 3, 'location': ['Remote', 'Pune'],
+    'is_ai_round_enabled': True}; job ids in exclude_ids (such as jobs the
+    user applied to) are left out. Both are applied inside each index, so
+    up to n_results jobs come back whatever they filter out.
     Returns a list of job_ids.
     """
+    from flask import has_app_context
+    _check_filters(where)
+    exclude = {int(job_id) for job_id in exclude_ids or ()}
+    depth = max(3 * n_results, 20)
+    rankings = []
     try:
-        job_collection, _ = _ensure_collections()
-        # Truncate resume text if too long for the model (limit is usually 512 tokens for MiniLM, 
-        # Chroma handles truncation but good to be safe)
-        query_text = resume_text[:2000] 
-        
-        results = job_collection.query(
-            query_texts=[query_text],
-            n_results=n_results
-        )
-        
-        if not results['metadatas']:
-            return []
-            
-        # Extract job_ids from metadata
-        job_ids = [int(meta['job_id']) for meta in results['metadatas'][0]]
-        return job_ids
+        rankings.append([int(meta['job_id']) for _, _, meta in _search('jobs', query_text, depth, where, exclude)])
     except Exception as e:
         print(f"Vector search error: {e}")
-        return []
+    if has_app_context():
+        try:
+            from ..models import JobPosting
+            from .keyword_index import search_jobs as keyword_search
+            accept = None
+            if where:
+                allowed = {job_id for (job_id,) in filter_jobs(JobPosting.query.with_entities(JobPosting.id), where)}
+                accept = lambda job_id: job_id in allowed and job_id not in exclude
+            elif exclude:
+                accept = lambda job_id: job_id not in exclude
+            rankings.append([job_id for job_id, _ in keyword_search(query_text, depth, accept)])
+        except Exception as e:
+            print(f"Keyword search error: {e}")
+    return reciprocal_rank_fusion(rankings)[:n_results]
 
-def search_resumes_by_job_description(job_description, n_results=5):
+def search_jobs_by_resume(resume_text, n_results=5, where=None, exclude_ids=None):
     """
-    Semantically searches for resumes matching a job description.
+    Searches for jobs matching the resume text (see search_jobs).
+    Returns a list of job_ids.
+    """
+    return search_jobs(resume_text, n_results, where, exclude_ids)
+
+def aggregate_by_user(hits, top_m=1):
+    """
+    Ranks users by their resume chunks among hits ([(id, score, metadata)],
+    best first): each user scores the mean of their top_m best chunk scores,
+    missing ones counting as 0 (top_m=1 is max-sim). Returns user_ids, best first.
+    """
+    chunk_scores = {}
+    for _, score, metadata in hits:
+        chunk_scores.setdefault(int(metadata['user_id']), []).append(score)
+    scores = {user_id: sum(sorted(values, reverse=True)[:top_m]) / top_m
+              for user_id, values in chunk_scores.items()}
+    return sorted(scores, key=scores.get, reverse=True)
+
+def search_resumes_by_job_description(job_description, n_results=5, top_m=1):
+    """
+    Semantically searches for resumes matching a job description, over
+    every chunk of each resume (see aggregate_by_user).
     Returns a list of user_ids.
     """
     try:
-        _, resume_collection = _ensure_collections()
-        query_text = job_description[:2000]
-        
-        results = resume_collection.query(
-            query_texts=[query_text],
-            n_results=n_results
-        )
-        
-        if not results['metadatas']:
-            return []
-            
-        # Extract user_ids from metadata
-        user_ids = [int(meta['user_id']) for meta in results['metadatas'][0]]
-        return user_ids
+        # Enough chunks for n_results users even if each matches with all of its chunks
+        hits = _search('resumes', job_description, n_results * MAX_RESUME_CHUNKS)
+        return aggregate_by_user(hits, top_m)[:n_results]
     except Exception as e:
         print(f"Resume vector search error: {e}")
         return []
 
-def index_all_jobs(app):
+def _keyset(query, key, batch_size):
+    """
+    Rows of query in pages of batch_size ordered by key (its first column).
+    Unlike a server-side cursor this leaves the connection free between
+    pages, so indexing can commit as it goes.
+    """
+    last = None
+    while True:
+        page = query.filter(key > last) if last is not None else query
+        rows = page.order_by(key).limit(batch_size).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1][0]
+
+
+def reindex_jobs(batch_size=None, force=False):
     """
-    Utility to re-index all jobs from SQL to Chroma.
-    Call this once to populate the DB.
+    Upserts every job posting, streaming rows from SQL in batches; postings
+    unchanged since they were last indexed are skipped unless force is set.
+    Needs an application context. Returns upsert_jobs' stats.
     """
     from ..models import JobPosting
+    batch_size = batch_size or BATCH_SIZE
+    query = JobPosting.query.with_entities(JobPosting.id, JobPosting.title, JobPosting.description,
+                                           *(getattr(JobPosting, key) for key in JOB_FILTERS))
+    rows = _keyset(query, JobPosting.id, batch_size)
+    jobs = ((job_id, title, description, dict(zip(JOB_FILTERS, filters)))
+            for job_id, title, description, *filters in rows)
+    return upsert_jobs(jobs, batch_size, force)
+
+
+def reindex_resumes(batch_size=None, force=False):
+    """
+    Upserts the latest analyzed resume of every user, streaming rows (with
+    the stored resume text) from SQL in batches. Needs an application
+    context. Returns upsert_resumes' stats.
+    """
+    from sqlalchemy import func
+    from ..extensions import db
+    from ..models import ResumeDocument, UserData
+    from .resume_store import get_resume_text
+    batch_size = batch_size or BATCH_SIZE
+
+    latest = db.session.query(func.max(UserData.id)).group_by(UserData.user_id)
+    # Uploads from before resume text was stored get linked to it first
+    for user_data in UserData.query.filter(UserData.id.in_(latest), UserData.document_sha256.is_(None)).all():
+        get_resume_text(user_data)
+
+    query = db.session.query(UserData.user_id, UserData.analysis_result, ResumeDocument.text) \
+        .join(ResumeDocument, ResumeDocument.sha256 == UserData.document_sha256) \
+        .filter(UserData.id.in_(latest))
+    rows = _keyset(query, UserData.user_id, batch_size)
+
+    def resumes():
+        for user_id, analysis_result, text in rows:
+            skills = (analysis_result or {}).get('actual_skills') or []
+            if text and analysis_result:
+                yield user_id, text, [s for s in skills if isinstance(s, str)]
+
+    return upsert_resumes(resumes(), batch_size, force)
+
+
+def index_all_jobs(app, force=False):
+    """
+    Utility to re-index all jobs from SQL to the vector DB.
+    Call this once to populate the DB (with force=True if the vector DB
+    was wiped, since unchanged postings are otherwise skipped).
+    """
     with app.app_context():
-        jobs = JobPosting.query.all()
-        print(f"Found {len(jobs)} jobs to index.")
-        for job in jobs:
-            add_job_to_vector_db(job.id, job.title, job.description)
+        stats = reindex_jobs(force=force)
+        print(f"Indexed {stats['count']} jobs in {stats['seconds']}s ({stats['per_second']}/s).")
+        return stats
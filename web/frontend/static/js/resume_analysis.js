@@ -91,33 +91,72 @@ document.addEventListener('DOMContentLoaded', function() {
             
             try {
                 const result = JSON.parse(xhr.responseText);
-                if (xhr.status === 200) {
-                    if (result.redirect_url) {
-                        // Delay redirect slightly to show logs
-                        setTimeout(() => {
-                            window.location.href = result.redirect_url;
-                        }, 2000);
-                    } else {
-                        throw new Error('No redirect URL provided.');
-                    }
+                if (xhr.status === 202 && result.job_id) {
+                    // Analysis runs in the background; wait for it to finish
+                    waitForJob(result.job_id, result.status_url);
+                    return;
+                } else if (xhr.status === 200 && result.redirect_url) {
+                    finish(result);
                 } else {
-                    if (neuralOverlay) neuralOverlay.classList.add('d-none');
-                    if (errorMessage) {
-                        errorMessage.textContent = result.error || 'An unknown error occurred.';
-                        errorMessage.style.display = 'block';
-                    }
+                    fail(result.error || 'An unknown error occurred.');
                 }
             } catch (e) {
-                if (neuralOverlay) neuralOverlay.classList.add('d-none');
-                if (errorMessage) {
-                    errorMessage.textContent = 'Server processing failed.';
-                    errorMessage.style.display = 'block';
-                }
+                fail('Server processing failed.');
             }
-            
-            if (submitButton) submitButton.disabled = false;
         });
 
+        function finish(result) {
+            if (result.message && parsingStatus) parsingStatus.textContent = result.message;
+            // Delay redirect slightly to show logs
+            setTimeout(() => {
+                window.location.href = result.redirect_url;
+            }, 2000);
+        }
+
+        function fail(message) {
+            if (neuralOverlay) neuralOverlay.classList.add('d-none');
+            if (errorMessage) {
+                errorMessage.textContent = message;
+                errorMessage.style.display = 'block';
+            }
+            if (submitButton) submitButton.disabled = false;
+        }
+
+        function waitForJob(jobId, statusUrl) {
+            let settled = false;
+            let socket = null;
+            let poller = null;
+
+            function handle(data) {
+                if (settled || data.job_id !== jobId) return;
+                if (parsingStatus && data.status === 'running') {
+                    parsingStatus.textContent = `Stage: ${data.stage} (${data.progress}%)`;
+                }
+                if (data.status === 'done' || data.status === 'failed') {
+                    settled = true;
+                    clearInterval(poller);
+                    if (socket) socket.disconnect();
+                    if (data.status === 'done') finish(data);
+                    else fail(data.error || 'Could not analyze the resume.');
+                }
+            }
+
+            function poll() {
+                fetch(statusUrl).then(r => r.json()).then(handle).catch(() => {});
+            }
+
+            if (window.io) {
+                socket = io();
+                socket.on('resume_analysis_progress', handle);
+                socket.on('resume_analysis_done', handle);
+                socket.on('resume_analysis_failed', handle);
+                // The job may have finished before the socket joined the room
+                socket.on('connect', poll);
+            }
+            // Fallback for when events are missed or sockets are unavailable
+            poller = setInterval(poll, 5000);
+        }
+
         xhr.addEventListener('error', function() {
             console.log("DEBUG: XHR Network Error");
             if (neuralOverlay) neuralOverlay.classList.add('d-none');
@@ -1,3 +1,4 @@
+import sys
 from backend import create_app
 from backend.utils.vector_utils import index_all_jobs
 
@@ -5,5 +6,6 @@ app = create_app()
 
 if __name__ == "__main__":
     print("Indexing all jobs to Vector DB...")
-    index_all_jobs(app)
+    # --force rewrites postings already indexed, e.g. after wiping chroma_db
+    index_all_jobs(app, force='--force' in sys.argv)
     print("Indexing complete.")
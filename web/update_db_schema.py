@@ -34,4 +34,15 @@ if __name__ == "__main__":
         add_column_if_not_exists('users', 'google_id', 'VARCHAR(100)')
         add_column_if_not_exists('users', 'linkedin_id', 'VARCHAR(100)')
         add_column_if_not_exists('mock_interviews', 'score', 'INTEGER')
+        add_column_if_not_exists('user_data', 'resume_digest', 'JSON')
+        add_column_if_not_exists('user_data', 'document_sha256', 'VARCHAR(64)')
+        add_column_if_not_exists('user_data', 'analysis_key', 'VARCHAR(64)')
+        add_column_if_not_exists('user_data', 'reused_from_id', 'INTEGER')
+        add_column_if_not_exists('user_data', 'skill_ids', 'JSON')
+        add_column_if_not_exists('job_postings', 'skill_ids', 'JSON')
+        add_column_if_not_exists('user_data', 'embedding', 'BLOB')
+        with app.app_context():
+            db.create_all()  # new tables such as resume_documents
+            from backend.utils.skill_registry import backfill
+            backfill()
         print("Done.")